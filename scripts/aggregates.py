@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""Streaming cohort aggregates of key compiled outcomes, by trial condition
+(`num_trials` and `trials_per_block`), kept up to date as participants are
+compiled.
+
+Each variable's aggregate holds a count, mean and sum of squared deviations
+(Welford's algorithm), the minimum and maximum, and a quantile sketch: a
+histogram of logarithmically sized bins, giving quantiles within a relative
+accuracy (1% by default). Every part can be updated one value at a time
+(and a value removed again, when a participant is recompiled) and merged
+with another aggregate, so summaries never need the compiled data, and
+aggregates of separately compiled shards can be combined. Aggregates are
+saved as JSON beside the compiled output (see `get_aggregates_path`).
+"""
+import os
+import json
+import math
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    from scripts import compile_data
+except ImportError:  # run as a script
+    import compile_data
+
+
+AGGREGATE_VARIABLES = [
+    'avg_accuracy',
+    'rt_avg',
+    'nogo_error_prev_rt_avg',
+    'nogo_error_next_rt_avg',
+    'auc_accuracy',
+    'auc_effort',
+    'auc_discomfort',
+    'auc_boredom',
+    'time_experiment_ms',
+]
+CONDITION_COLUMNS = ['num_trials', 'trials_per_block']
+RELATIVE_ACCURACY = 0.01
+# values smaller than this (in magnitude) are counted as zero by sketches
+MIN_SKETCH_VALUE = 1e-9
+QUANTILES = OrderedDict([('q25', 0.25), ('median', 0.5), ('q75', 0.75)])
+SUMMARY_COLUMNS = CONDITION_COLUMNS + [
+    'variable', 'n', 'mean', 'sd', 'min'] + list(QUANTILES) + ['max']
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class QuantileSketch(object):
+    """Count values in logarithmically sized bins (of positive and negative
+    values), so that any quantile is estimated within a relative accuracy.
+    Sketches with the same accuracy are merged by adding bin counts.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zero_count = 0
+        self.positive = {}
+        self.negative = {}
+
+    def _get_bins(self, value):
+        """Take value. Return tuple of its bins dict and bin key (None for
+        zeros).
+        """
+        if abs(value) < MIN_SKETCH_VALUE:
+            return None, None
+        key = int(math.ceil(math.log(abs(value)) / self._log_gamma))
+        return (self.positive if value > 0 else self.negative), key
+
+    def add(self, value, count=1):
+        bins, key = self._get_bins(value)
+        if bins is None:
+            self.zero_count += count
+        else:
+            bins[key] = bins.get(key, 0) + count
+            if not bins[key]:
+                del bins[key]
+        self.count += count
+
+    def remove(self, value):
+        self.add(value, -1)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Sketches must have the same relative accuracy')
+        for bins, other_bins in [(self.positive, other.positive),
+                                 (self.negative, other.negative)]:
+            for key, count in other_bins.items():
+                bins[key] = bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _get_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Take quantile (from 0 to 1). Return its estimate (None if empty).
+        """
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._get_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._get_value(key)
+        return self._get_value(max(self.positive))
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'positive': dict((str(k), c) for k, c in self.positive.items()),
+            'negative': dict((str(k), c) for k, c in self.negative.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['relative_accuracy'])
+        sketch.zero_count = state['zero_count']
+        sketch.positive = dict(
+            (int(k), c) for k, c in state['positive'].items())
+        sketch.negative = dict(
+            (int(k), c) for k, c in state['negative'].items())
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + \
+            sum(sketch.negative.values())
+        return sketch
+
+
+class RunningStats(object):
+    """Aggregate a variable's values one at a time: count, mean and sum of
+    squared deviations from the mean (Welford), minimum, maximum and a
+    `QuantileSketch`.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        if _is_missing(value):
+            return
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.sketch.add(value)
+
+    def remove(self, value):
+        """Take a value added earlier, and remove it. If it was the minimum
+        or maximum, that is estimated from the quantile sketch instead.
+        """
+        if _is_missing(value):
+            return
+        value = float(value)
+        if self.count <= 1:
+            self.__init__(self.sketch.relative_accuracy)
+            return
+        mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(self.m2 - (value - mean) * (value - self.mean), 0.0)
+        self.mean = mean
+        self.count -= 1
+        self.sketch.remove(value)
+        if value <= self.min:
+            self.min = self.sketch.quantile(0)
+        if value >= self.max:
+            self.max = self.sketch.quantile(1)
+
+    def merge(self, other):
+        """Take another `RunningStats`, and add its values (Chan et al.'s
+        parallel algorithm).
+        """
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def sd(self):
+        if self.count < 2:
+            return None
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'mean': self.mean, 'm2': self.m2,
+            'min': self.min, 'max': self.max, 'sketch': self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        for name in ['count', 'mean', 'm2', 'min', 'max']:
+            setattr(stats, name, state[name])
+        stats.sketch = QuantileSketch.from_dict(state['sketch'])
+        return stats
+
+
+class CohortAggregates(object):
+    """`RunningStats` of compiled variables, by trial condition.
+    """
+
+    def __init__(self, variables=None, relative_accuracy=RELATIVE_ACCURACY):
+        self.variables = list(variables or AGGREGATE_VARIABLES)
+        self.relative_accuracy = relative_accuracy
+        self.conditions = {}
+
+    def _get_condition(self, participant):
+        """Take compiled participant data. Return tuple of the trial
+        condition's values (None if the participant has none).
+        """
+        condition = tuple(participant.get(c) for c in CONDITION_COLUMNS)
+        if any(_is_missing(value) for value in condition):
+            return None
+        return tuple(int(value) for value in condition)
+
+    def _get_stats(self, condition):
+        if condition not in self.conditions:
+            self.conditions[condition] = OrderedDict(
+                (v, RunningStats(self.relative_accuracy))
+                for v in self.variables)
+        return self.conditions[condition]
+
+    def add(self, participant):
+        """Take compiled participant data (a dict, or dataframe row), and add
+        it to its condition's aggregates.
+        """
+        condition = self._get_condition(participant)
+        if condition is None:
+            return
+        for variable, stats in self._get_stats(condition).items():
+            stats.add(participant.get(variable))
+
+    def remove(self, participant):
+        """Take compiled participant data added earlier, and remove it.
+        """
+        condition = self._get_condition(participant)
+        if condition is None or condition not in self.conditions:
+            return
+        for variable, stats in self.conditions[condition].items():
+            stats.remove(participant.get(variable))
+
+    def merge(self, other):
+        """Take another `CohortAggregates` (of the same variables), and add
+        its aggregates, e.g., of another shard of participants.
+        """
+        if other.variables != self.variables:
+            raise ValueError('Aggregates must have the same variables')
+        for condition, other_stats in other.conditions.items():
+            for variable, stats in self._get_stats(condition).items():
+                stats.merge(other_stats[variable])
+
+    def summarize(self):
+        """Return pandas dataframe with a row per condition and variable:
+        count, mean, standard deviation, minimum, quartiles and maximum.
+        """
+        rows = []
+        for condition in sorted(self.conditions):
+            for variable, stats in self.conditions[condition].items():
+                row = dict(zip(CONDITION_COLUMNS, condition))
+                row.update({
+                    'variable': variable, 'n': stats.count,
+                    'mean': stats.mean if stats.count else None,
+                    'sd': stats.sd, 'min': stats.min, 'max': stats.max,
+                })
+                for name, q in QUANTILES.items():
+                    row[name] = stats.sketch.quantile(q)
+                rows.append(row)
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+    def to_dict(self):
+        return {
+            'variables': self.variables,
+            'relative_accuracy': self.relative_accuracy,
+            'conditions': [
+                {'condition': list(condition),
+                 'stats': dict((v, s.to_dict()) for v, s in stats.items())}
+                for condition, stats in sorted(self.conditions.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        aggregates = cls(state['variables'], state['relative_accuracy'])
+        for condition_state in state['conditions']:
+            stats = aggregates._get_stats(tuple(condition_state['condition']))
+            for variable in aggregates.variables:
+                stats[variable] = RunningStats.from_dict(
+                    condition_state['stats'][variable])
+        return aggregates
+
+    @classmethod
+    def from_dataframe(cls, df, **kwargs):
+        """Take pandas dataframe of compiled data. Return `CohortAggregates`
+        of its rows.
+        """
+        aggregates = cls(**kwargs)
+        for participant in df.to_dict(orient='records'):
+            aggregates.add(participant)
+        return aggregates
+
+    def save(self, path):
+        """Write aggregates to JSON (replacing the file once written, see
+        `compile_data.save_json`).
+        """
+        compile_data.save_json(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def get_aggregates_path(output_path):
+    """Take compiled output path. Return the path of its aggregates (e.g.,
+    ``compiled-aggregates.json`` for ``compiled.csv``).
+    """
+    return '{}-aggregates.json'.format(os.path.splitext(output_path)[0])
+
+
+def _read_compiled_csv(output_path, columns):
+    columns = set(columns)
+    return pd.read_csv(output_path, usecols=lambda c: c in columns,
+                       dtype={'id': str}, float_precision='round_trip')
+
+
+def load_aggregates(output_path):
+    """Take compiled output path. Return its saved `CohortAggregates`, or
+    aggregates of its rows if none were saved (empty if there is no output).
+    """
+    aggregates_path = get_aggregates_path(output_path)
+    if os.path.exists(aggregates_path):
+        return CohortAggregates.load(aggregates_path)
+    if not os.path.exists(output_path):
+        return CohortAggregates()
+    return CohortAggregates.from_dataframe(_read_compiled_csv(
+        output_path, CONDITION_COLUMNS + AGGREGATE_VARIABLES))
+
+
+def read_compiled_values(output_path, participant_ids):
+    """Take compiled output path and participant IDs. Return dict of those
+    participants' aggregated values (and conditions), keyed by ID, for
+    replacing them when they are compiled again.
+    """
+    if not os.path.exists(output_path):
+        return {}
+    df = _read_compiled_csv(
+        output_path, ['id'] + CONDITION_COLUMNS + AGGREGATE_VARIABLES)
+    if 'id' not in df.columns:
+        return {}
+    df = df[df['id'].isin(participant_ids)]
+    return dict(
+        (participant['id'], participant)
+        for participant in df.to_dict(orient='records'))
+
+
+def merge_aggregates(paths):
+    """Take list of saved aggregates paths (e.g., of several shards). Return
+    merged `CohortAggregates`.
+    """
+    aggregates = CohortAggregates()
+    for path in paths:
+        aggregates.merge(CohortAggregates.load(path))
+    return aggregates
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Performance breakdowns of SART trials by stimulus digit and font size.
+
+Trials are integer-coded by group (digit, or font size rank) and block, and
+every group's trial count, accuracy, commission and omission errors and
+average RT are reduced from the parsed trial arrays with bincounts, for the
+whole experiment and each block at once. Cost is linear in the number of
+trials, however many groups there are.
+
+Font sizes are set in millimetres by the task (see ``STIMULI.FONT_SIZES`` in
+``public/js/settings.js``) and recorded in screen pixels, so they differ
+between participants' displays; they are ranked within each participant
+instead (``font1`` is the smallest).
+"""
+import numpy as np
+import pandas as pd
+
+
+FONT_SIZE_PATTERN = r'^\s*([0-9]*\.?[0-9]+)'
+DIGIT_PATTERN = r'^[1-9]$'
+
+
+def parse_font_sizes(font_sizes):
+    """Take sequence of recorded font sizes (e.g., ``'91.33px'``). Return
+    array of their sizes (NaN where unparseable).
+    """
+    return pd.Series(font_sizes).astype(str).str.extract(
+        FONT_SIZE_PATTERN, expand=False).astype(float).values
+
+
+def code_digits(stimuli):
+    """Take sequence of stimuli. Return array of digit codes (the digit, or
+    0 for other stimuli).
+    """
+    stimuli = pd.Series(stimuli).astype(str).str.strip()
+    digits = stimuli.where(stimuli.str.match(DIGIT_PATTERN))
+    return pd.to_numeric(digits).fillna(0).values.astype(np.int64)
+
+
+def code_font_sizes(sizes):
+    """Take array of font sizes. Return tuple of array of font size codes
+    (each size's rank, from 1, or 0 where missing) and array of the distinct
+    sizes, smallest first.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    is_size = ~np.isnan(sizes)
+    distinct_sizes, ranks = np.unique(sizes[is_size], return_inverse=True)
+    codes = np.zeros(len(sizes), np.int64)
+    codes[is_size] = ranks + 1
+    return codes, distinct_sizes
+
+
+def reduce_groups(codes, block_ids, num_codes, num_blocks, is_correct,
+                  commissions, omissions, rts_ms):
+    """Take arrays of group codes (from 0) and block numbers (from 0), their
+    numbers, and boolean arrays of correct trials, commission and omission
+    errors and array of RTs to average (NaN to leave out). Return dict of
+    blocks-by-codes arrays, keyed by metric (``num_trials``, ``accuracy``,
+    ``commission_errors``, ``omission_errors`` and ``rt_avg``); the last row
+    holds totals over all blocks. Accuracy and RT averages are NaN for
+    groups without trials or RTs.
+    """
+    keys = np.asarray(block_ids, np.int64) * num_codes + codes
+    size = num_blocks * num_codes
+    has_rt = ~np.isnan(rts_ms)
+
+    def count(weights=None):
+        counts = np.bincount(keys, weights, minlength=size).astype(float)
+        counts = counts.reshape(num_blocks, num_codes)
+        return np.vstack([counts, counts.sum(axis=0)])
+
+    num_trials = count()
+    num_rts = count(has_rt.astype(float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'num_trials': num_trials,
+            'accuracy': count(is_correct.astype(float)) / num_trials,
+            'commission_errors': count(commissions.astype(float)),
+            'omission_errors': count(omissions.astype(float)),
+            'rt_avg': count(np.where(has_rt, rts_ms, 0)) / num_rts,
+        }
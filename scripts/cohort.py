@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Cohort-level summaries of compiled data: means of key SART outcomes, with
+bootstrap confidence intervals, by trial condition (`num_trials` and
+`trials_per_block`).
+
+Every condition is resampled at once: participants are sorted by condition
+and each resample draws, for every row, a random row of the same condition,
+giving one index matrix for all conditions. The sums (and counts) of all
+variables, for all conditions, then come from a single matrix product of the
+resample counts of each row. Resamples are drawn in chunks, each with its
+own seed (derived from the summary's seed), so results don't depend on how
+the chunks are spread over worker processes.
+"""
+import warnings
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+
+CONDITION_COLUMNS = ['num_trials', 'trials_per_block']
+COHORT_VARIABLES = [
+    'avg_accuracy',
+    'nogo_error_prev_rt_avg',
+    'nogo_error_next_rt_avg',
+    'effort_slope',
+    'discomfort_slope',
+    'boredom_slope',
+    'auc_accuracy',
+    'auc_effort',
+    'auc_discomfort',
+    'auc_boredom',
+]
+NUM_RESAMPLES = 10000
+CHUNK_SIZE = 500
+CONFIDENCE = 0.95
+SUMMARY_COLUMNS = CONDITION_COLUMNS + [
+    'variable', 'n', 'mean', 'se', 'ci_low', 'ci_high']
+
+
+def _bootstrap_means_chunk(values, group_starts, group_sizes, num_resamples,
+                           seed):
+    """Take participant-by-variable array of values (sorted by group, NaN
+    where missing), start positions and sizes of the groups, number of
+    resamples and a random seed. Return resample-by-group-by-variable array
+    of resampled means.
+    """
+    num_rows, num_variables = values.shape
+    num_groups = len(group_starts)
+    random_state = np.random.RandomState(seed)
+
+    # resample index matrix: a random row of each row's group
+    row_starts = np.repeat(group_starts, group_sizes)
+    row_sizes = np.repeat(group_sizes, group_sizes)
+    indices = row_starts + (random_state.random_sample(
+        (num_resamples, num_rows)) * row_sizes).astype(int)
+    offsets = num_rows * np.arange(num_resamples)[:, np.newaxis]
+    counts = np.bincount(
+        (indices + offsets).ravel(), minlength=num_resamples * num_rows)
+    counts = counts.reshape(num_resamples, num_rows).astype(float)
+
+    # each row's values and presence (1 or 0), in its group's columns
+    row_groups = np.repeat(np.arange(num_groups), group_sizes)
+    is_present = ~np.isnan(values)
+    group_columns = np.zeros((num_rows, 2, num_groups, num_variables))
+    group_columns[np.arange(num_rows), 0, row_groups] = np.where(
+        is_present, values, 0)
+    group_columns[np.arange(num_rows), 1, row_groups] = is_present
+
+    sums, num_values = counts.dot(group_columns.reshape(num_rows, -1)) \
+        .reshape(num_resamples, 2, num_groups, num_variables) \
+        .transpose(1, 0, 2, 3)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / num_values
+
+
+def _bootstrap_means_task(args):
+    return _bootstrap_means_chunk(*args)
+
+
+def bootstrap_means(values, groups, num_resamples=NUM_RESAMPLES, seed=None,
+                    workers=1, chunk_size=CHUNK_SIZE):
+    """Take participant-by-variable array of values (NaN where missing) and
+    array of each participant's group, number of resamples, random seed and
+    number of worker processes. Return tuple of sorted unique groups and
+    resample-by-group-by-variable array of bootstrap means (each resample
+    drawn within each group).
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind='mergesort')
+    unique_groups, group_starts, group_sizes = np.unique(
+        groups[order], return_index=True, return_counts=True)
+    values = values[order]
+
+    chunk_sizes = [chunk_size] * (num_resamples // chunk_size)
+    if num_resamples % chunk_size:
+        chunk_sizes.append(num_resamples % chunk_size)
+    seeds = np.random.RandomState(seed).randint(
+        2 ** 31 - 1, size=len(chunk_sizes))
+    tasks = [(values, group_starts, group_sizes, size, chunk_seed)
+             for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        chunks = [_bootstrap_means_chunk(*task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            chunks = pool.map(_bootstrap_means_task, tasks)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    return unique_groups, np.concatenate(chunks)
+
+
+def summarize_cohort(df, variables=None, num_resamples=NUM_RESAMPLES,
+                     seed=None, workers=1, confidence=CONFIDENCE):
+    """Take pandas dataframe of compiled data, variable names (by default,
+    `COHORT_VARIABLES` present in the data), number of resamples, random
+    seed, number of worker processes and confidence level. Return pandas
+    dataframe with a row per condition and variable: the number of
+    participants with data, their mean, its bootstrap standard error and
+    percentile confidence interval.
+    """
+    if variables is None:
+        variables = [v for v in COHORT_VARIABLES if v in df.columns]
+    if not variables or not set(CONDITION_COLUMNS) <= set(df.columns):
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    df = df.dropna(subset=CONDITION_COLUMNS)
+    if not len(df.index):
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    conditions = df[CONDITION_COLUMNS].astype(int)
+    groups = (conditions['num_trials'].astype(str) + '/' +
+              conditions['trials_per_block'].astype(str)).values
+    values = df[variables].astype(float).values
+    unique_groups, resampled_means = bootstrap_means(
+        values, groups, num_resamples, seed, workers)
+
+    alpha = (1 - confidence) / 2.0
+    # (conditions where a variable is always missing give all-NaN means)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        ci_lows, ci_highs = np.nanpercentile(
+            resampled_means, [100 * alpha, 100 * (1 - alpha)], axis=0)
+        ses = np.nanstd(resampled_means, axis=0, ddof=1)
+
+    rows = []
+    for i, group in enumerate(unique_groups):
+        is_group = (groups == group)
+        num_trials, trials_per_block = [int(n) for n in group.split('/')]
+        for j, variable in enumerate(variables):
+            group_values = values[is_group, j]
+            group_values = group_values[~np.isnan(group_values)]
+            rows.append({
+                'num_trials': num_trials,
+                'trials_per_block': trials_per_block,
+                'variable': variable,
+                'n': len(group_values),
+                'mean': group_values.mean() if len(group_values) else None,
+                'se': ses[i, j],
+                'ci_low': ci_lows[i, j],
+                'ci_high': ci_highs[i, j],
+            })
+    summary_df = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    return summary_df.sort_values(CONDITION_COLUMNS + ['variable']) \
+        .reset_index(drop=True)
+
+
+def summarize_compiled_csv(compiled_csv_path, output_path=None, **kwargs):
+    """Take compiled CSV path (and optionally a summary CSV path to write).
+    Read only the condition and summary variable columns, and summarize
+    them (see `summarize_cohort`). Return pandas dataframe.
+    """
+    variables = kwargs.pop('variables', None) or COHORT_VARIABLES
+    columns = set(CONDITION_COLUMNS + variables)
+    df = pd.read_csv(compiled_csv_path, usecols=lambda c: c in columns)
+    kwargs['variables'] = [v for v in variables if v in df.columns]
+    summary_df = summarize_cohort(df, **kwargs)
+    if output_path:
+        summary_df.to_csv(output_path, index=False)
+    return summary_df
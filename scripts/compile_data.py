@@ -5,51 +5,350 @@ participant's data and creates/updates a file in jsSART's ``data``
 directory.
 """
 import os
-import glob
+import io
+import sys
+import csv
 import json
+import heapq
 import re
+import itertools
+import importlib
+import numbers
+import shutil
+import tempfile
+import traceback
+import time
+import datetime
+import argparse
+import multiprocessing
+from collections import OrderedDict, namedtuple
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import resource
+except ImportError:  # e.g., Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+
+class _LazyModule(object):
+    """A stand-in for a module that is imported on first attribute access,
+    so that heavy dependencies don't slow down quick commands.
+    """
+
+    def __init__(self, name, on_import=None):
+        self.__dict__['_name'] = name
+        self.__dict__['_on_import'] = on_import
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._on_import:
+                self._on_import(module)
+            self.__dict__['_module'] = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+
+def _set_pandas_options(pandas):
+    pandas.options.mode.chained_assignment = None  # no false-positive warnings
 
-import pandas as pd
-import numpy as np
-from scipy import stats
-from tqdm import tqdm
+
+pd = _LazyModule('pandas', on_import=_set_pandas_options)
+np = _LazyModule('numpy')
+stats = _LazyModule('scipy.stats')
+
+
+def tqdm(*args, **kwargs):
+    """Return a tqdm progress bar (imported on first use).
+    """
+    from tqdm import tqdm as progress_bar
+    return progress_bar(*args, **kwargs)
 
 
 PROJECT_DIR = os.path.abspath(os.path.join(__file__, '..', '..'))
 DATA_DIR = os.path.join(PROJECT_DIR, 'data')
 DECODER = json.JSONDecoder()
 ROUND_NDIGITS = 9
+RESPONSE_CACHE_SIZE = 4096
+# compiled rows held in memory before a compile over its memory budget
+# spills them to disk (resident memory isn't given back once spilled, so
+# spilling every participant wouldn't bring it back under budget)
+SPILL_MIN_ROWS = 100
+
+# scoring parameters (defaults)
+ANTICIPATION_THRESHOLD_MS = 100
+MAX_ADJACENT_ROWS = 4
+NUM_SURVEY_QUESTIONS = 3
+NOGO_STIMULUS = '3'
+ROLLING_WINDOW_TRIALS = 50
+EVENT_WINDOW_TRIALS = 4  # before and after events (see `events.py`)
+
+# performance breakdowns by stimulus digit and font size (see
+# `summarize_breakdowns`)
+STIMULUS_DIGITS = range(1, 10)
+NUM_FONT_SIZES = 5  # as shown by the task (see `public/js/settings.js`)
+BREAKDOWN_METRICS = [
+    ('num_trials', 'int'),
+    ('accuracy', 'float'),
+    ('commission_errors', 'int'),
+    ('omission_errors', 'int'),
+    ('rt_avg', 'float'),
+]
+SCORING_DEFAULTS = {
+    'anticipation_threshold': ANTICIPATION_THRESHOLD_MS,
+    'event_window_next': EVENT_WINDOW_TRIALS,
+    'event_window_prev': EVENT_WINDOW_TRIALS,
+    'max_adjacent_rows': MAX_ADJACENT_ROWS,
+    'num_survey_questions': NUM_SURVEY_QUESTIONS,
+    'nogo_stimulus': NOGO_STIMULUS,
+    'rolling_window': ROLLING_WINDOW_TRIALS,
+}
+
+# scoring engine (see `ENGINES`)
+DEFAULT_ENGINE = 'reference'
+
+# SART and survey trial types (jsPsych plugins)
+SART_TRIAL_TYPE = 'multi-stim-multi-response'
+SURVEY_TRIAL_TYPE = 'survey-multi-choice'
+
+# raw data columns, as written by the server (see `app.js`)
+RAW_DATA_COLUMNS = [
+    'internal_node_id', 'trial_index', 'trial_type', 'time_elapsed',
+    'participant_id',
+    'num_trials', 'trials_per_block', 'practice_condition',
+    'stimulus', 'key_press', 'rt',
+    'correct', 'response', 'expected', 'font_size',
+    'responses',  # jspsych-survey-*
+]
+EXP_STAGES = ['practice', 'experiment', 'follow_up']
 
-# pandas options
-pd.options.mode.chained_assignment = None  # no false-positive warnings
+try:
+    string_types = basestring
+except NameError:  # Python 3
+    string_types = str
 
 
 def get_csv_paths(basedir, exp_stage):
     """Take base data directory and experiment stage. Return list of file paths.
+
+    Compressed CSVs are included, and the base data directory may be an
+    archive of the data tree (see ``sources.py``).
     """
-    glob_path = os.path.join(basedir, exp_stage, '*.csv')
-    return glob.glob(glob_path)
+    return _import_script('sources').list_csvs(basedir, exp_stage)
 
 
 def get_csv_as_dataframe(path):
     """Take CSV path. Return pandas dataframe.
+
+    Reaction times are parsed once on load and kept in an ``rt_ms`` column.
+    Compressed and archived CSVs are decompressed as they are parsed (see
+    ``sources.py``).
+    """
+    with _import_script('sources').open_csv(path) as f:
+        df = pd.read_csv(f,
+                         index_col='trial_index',
+                         converters={'participant_id': lambda x: str(x)}
+                         )
+    df['rt_ms'] = _parse_rts(df['rt'])
+    return df
+
+
+def _is_missing_value(value):
+    return value is None or value == ''
+
+
+def _get_record_value_as_text(value):
+    """Take a jsPsych data value and return it as text, as written to CSV.
+    """
+    if _is_missing_value(value):
+        return ''
+    if isinstance(value, string_types):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(',', ':'))
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _get_record_column(values):
+    """Take list of jsPsych data values for one column. Return array of
+    values typed the way pandas types the same column read from CSV.
+    """
+    present = [v for v in values if not _is_missing_value(v)]
+    if not present:
+        return np.full(len(values), np.nan)
+
+    if all(isinstance(v, bool) for v in present):
+        if len(present) == len(values):
+            return np.array(values, dtype=bool)
+        return np.array(
+            [np.nan if _is_missing_value(v) else v for v in values],
+            dtype=object)
+
+    if all(isinstance(v, numbers.Real) for v in present):
+        return pd.to_numeric(pd.Series(
+            [np.nan if _is_missing_value(v) else v for v in values])).values
+
+    return np.array(
+        [np.nan if _is_missing_value(v) else _get_record_value_as_text(v)
+         for v in values], dtype=object)
+
+
+def get_records_as_dataframe(records):
+    """Take list of jsPsych trial data records (dicts), as posted to the
+    server. Return pandas dataframe, typed as by `get_csv_as_dataframe`.
+    """
+    columns = OrderedDict()
+    for column in RAW_DATA_COLUMNS:
+        values = [record.get(column) for record in records]
+        if column == 'participant_id':
+            columns[column] = np.array(
+                [_get_record_value_as_text(v) for v in values], dtype=object)
+        else:
+            columns[column] = _get_record_column(values)
+
+    df = pd.DataFrame(columns, columns=RAW_DATA_COLUMNS)
+    df = df.set_index('trial_index')
+    df['rt_ms'] = _parse_rts(df['rt'])
+    return df
+
+
+class LRUCache(object):
+    """A bounded mapping that discards the least recently used items and
+    counts cache hits and misses.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items[key] = value  # now most recently used
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._items.pop(key, None)
+        self._items[key] = value
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._items),
+            'maxsize': self.maxsize,
+            'hit_rate': float(self.hits) / lookups if lookups else None,
+        }
+
+
+# survey responses repeat (e.g., Likert options), so decode each once
+RESPONSE_CACHE = LRUCache(RESPONSE_CACHE_SIZE)
+
+
+def decode_response(string):
+    """Take JSON string representing a survey response. Return decoded dict.
+
+    Note: decoded responses are cached and shared, so must not be modified.
     """
-    return pd.read_csv(path,
-                       index_col='trial_index',
-                       converters={'participant_id': lambda x: str(x)}
-                       )
+    resp_json = RESPONSE_CACHE.get(string)
+    if resp_json is None:
+        resp_json = DECODER.decode(string)
+        RESPONSE_CACHE.set(string, resp_json)
+    return resp_json
+
+
+def response_cache_info():
+    """Return dict of survey response cache statistics (hits, misses, size,
+    maxsize and hit rate).
+    """
+    return RESPONSE_CACHE.info()
 
 
 def get_response_from_json(string, question_number=0):
     """Take JSON string representing a survey response and decode.
     Return target question answer string.
     """
-    resp_json = DECODER.decode(string)
+    resp_json = decode_response(string)
     target_question = "Q{}".format(question_number)
     resp = resp_json[target_question] if target_question in resp_json else None
     return resp
 
 
+def get_responses_from_json(responses, question_number=0):
+    """Take pandas series of survey response JSON strings (e.g., a
+    ``responses`` column) and decode each distinct string once.
+    Return pandas series of target question answer strings.
+    """
+    responses = pd.Series(responses)
+    answers = {}
+    for string in pd.unique(responses.dropna().values):
+        answers[string] = get_response_from_json(string, question_number)
+    return responses.map(lambda x: answers.get(x))
+
+
+def _format_survey_response(response, is_likert=False):
+    """Take survey response string and tidy it. Return response string.
+    """
+    if response is not None:
+        response = response.strip()
+
+    if is_likert and response and response[0].isdigit():
+        # we only want the numeric response
+        response = response[0]
+
+    return response
+
+
+def get_responses_by_node_id(df):
+    """Take a data frame and decode its survey responses in bulk.
+    Return dict of response strings, keyed by internal node ID.
+    """
+    has_response = df['responses'].notnull().values
+    node_ids = df['internal_node_id'].values[has_response]
+    answers = get_responses_from_json(df['responses'].values[has_response])
+
+    responses = {}
+    for inid, answer in zip(node_ids, answers.values):
+        responses.setdefault(inid, answer)
+    return responses
+
+
 def get_response_via_node_id(df, inid, is_likert=False):
     """Take a data frame and internal node ID (inid).
     Return a jsPsych survey response string.
@@ -59,25 +358,21 @@ def get_response_via_node_id(df, inid, is_likert=False):
     # get row and then response text
     response_str = df[df['internal_node_id'] == inid]['responses'].values
     if response_str:
-        response = get_response_from_json(response_str[0]).strip()
-
-    if is_likert and response and response[0].isdigit():
-        # we only want the numeric response
-        response = response[0]
+        response = get_response_from_json(response_str[0])
 
-    return response
+    return _format_survey_response(response, is_likert)
 
 
-def extract_sart_blocks(df, with_survey=False):
+def extract_sart_blocks(df, with_survey=False,
+                        num_survey_questions=NUM_SURVEY_QUESTIONS):
     """Take pandas data frame and find SART trial blocks.
     Return list of pandas data frames.
     """
     blocks = []
-    NUM_SURVEY_QUESTIONS = 3
 
     # the type of trial(s) to target
-    mc_trial_type = "survey-multi-choice"
-    block_trial_types = ["multi-stim-multi-response"]
+    mc_trial_type = SURVEY_TRIAL_TYPE
+    block_trial_types = [SART_TRIAL_TYPE]
     if with_survey:
         block_trial_types.append(mc_trial_type)
 
@@ -90,7 +385,7 @@ def extract_sart_blocks(df, with_survey=False):
             # skip if first trial type is a survey (NOTE: should only be last)
             continue
         elif series['trial_type'] in block_trial_types and \
-                num_mc_trials < NUM_SURVEY_QUESTIONS:
+                num_mc_trials < num_survey_questions:
             if not first_trial_idx:
                 first_trial_idx = index
             last_trial_idx = index
@@ -109,6 +404,32 @@ def extract_sart_blocks(df, with_survey=False):
     return blocks
 
 
+def _get_kernels():
+    """Return the selected kernel backend (see ``kernels.py``).
+    """
+    return _import_script('kernels').get_backend()
+
+
+def extract_sart_blocks_fast(df, with_survey=False,
+                             num_survey_questions=NUM_SURVEY_QUESTIONS):
+    """Take pandas data frame and find SART trial blocks, as
+    `extract_sart_blocks` does, scanning arrays of trial types with a
+    segmentation kernel rather than iterating over rows. Return list of
+    pandas data frames.
+    """
+    trial_types = df['trial_type'].values.astype(object)
+    is_mc_trial = (trial_types == SURVEY_TRIAL_TYPE)
+    is_block_trial = (trial_types == SART_TRIAL_TYPE)
+    if with_survey:
+        is_block_trial |= is_mc_trial
+
+    first_indices, last_indices = _get_kernels().segment_blocks(
+        df.index.values.astype(np.int64), is_mc_trial, is_block_trial,
+        num_survey_questions)
+    return [df.loc[first:last]
+            for first, last in zip(first_indices, last_indices)]
+
+
 def _get_arousal_ratings(df):
     """Take 2-row pandas data frame and return mind-and-body and feeling
     ratings for evaluation of valence and arousal questions.
@@ -130,8 +451,9 @@ def _get_arousal_ratings(df):
     return mind_body, feeling
 
 
-def compile_practice_data(df):
-    """Take pandas dataframe and compile key variables. Return dict.
+def compile_practice_data(df, engine=DEFAULT_ENGINE):
+    """Take pandas dataframe (and scoring engine name) and compile key
+    variables. Return dict.
     """
     compiled_data = {}
 
@@ -151,14 +473,15 @@ def compile_practice_data(df):
 
     # time taken to complete practice blocks
     num_practice_blk2s = 0
-    practice_blocks = extract_sart_blocks(df)
+    practice_blocks = get_engine(engine).extract_sart_blocks(df)
     for i, blk in enumerate(practice_blocks):
         blk_start_ms = int(blk.ix[blk.first_valid_index()]['time_elapsed'])
         blk_end_ms = int(blk.ix[blk.last_valid_index()]['time_elapsed'])
         time_practice_blk_ms = blk_end_ms - blk_start_ms
         if i > 0:
             # record as practice block #2 trials
-            time_blk_key = 'time_practice_blk2_{}_ms'.format(i)
+            time_blk_key = VARIABLES.get_family_name(
+                'time_practice_blk2', i, 'ms')
             compiled_data[time_blk_key] = time_practice_blk_ms
             num_practice_blk2s += 1
         else:
@@ -186,28 +509,63 @@ def _format_rts(rts):
     return list(rts_strf)
 
 
-def _is_anticipation_error(rt):
+def _parse_rts(rts):
+    """Take a sequence of reaction time JSON strings and return a float array
+    holding each trial's first non-negative reaction time (NaN if none).
+    """
+    rts = list(rts)
+    strings = pd.Series(rts, dtype=object).astype(str).str.strip('[] ')
+    is_multi = strings.str.contains(',').values
+    rts_ms = pd.to_numeric(
+        strings.where(~is_multi), errors='coerce').values.astype(float)
+
+    # fall back to JSON decoding for multi-response arrays
+    for i in np.flatnonzero(is_multi):
+        valid_rts = [rt for rt in DECODER.decode(rts[i]) if rt >= 0]
+        rts_ms[i] = valid_rts[0] if valid_rts else np.nan
+
+    # exclude non-response RTs
+    with np.errstate(invalid='ignore'):
+        rts_ms[rts_ms < 0] = np.nan
+    return rts_ms
+
+
+def _get_parsed_rts(df):
+    """Take pandas data frame and return parsed reaction times, using the
+    ``rt_ms`` column added on load where available.
+    """
+    if 'rt_ms' in df:
+        return df['rt_ms'].values
+    return _parse_rts(df['rt'])
+
+
+def _get_anticipation_errors(rts_ms, threshold=ANTICIPATION_THRESHOLD_MS):
+    """Take array of parsed reaction times and return boolean array (true if
+    anticipation error, i.e., a response faster than `threshold` ms).
+    """
+    with np.errstate(invalid='ignore'):
+        return np.asarray(rts_ms, dtype=float) < threshold
+
+
+def _is_anticipation_error(rt, threshold=ANTICIPATION_THRESHOLD_MS):
     """Take reaction time JSON string and determine whether it represents an
-    anticipation error (<100ms response).
+    anticipation error (<100ms response, by default).
     """
-    is_error = False
-    rt_ms = _format_rts([rt])
-    if rt_ms and rt_ms[0] < 100 and rt_ms[0] > -1:
-        is_error = True
-    return is_error
+    return bool(_get_anticipation_errors(_parse_rts([rt]), threshold)[0])
 
 
-def _add_anticipation_errors(df):
+def _add_anticipation_errors(df, threshold=ANTICIPATION_THRESHOLD_MS):
     """Add anticipation errors to pandas data frame and re-calculate
     `correct` column.
     """
     df['anticipate_error'] = pd.Series(
-        df['rt'].apply(_is_anticipation_error), index=df.index)
+        _get_anticipation_errors(_get_parsed_rts(df), threshold),
+        index=df.index)
     df.ix[df.anticipate_error, 'correct'] = False
     return df
 
 
-def _calculate_go_errors(df, err_type):
+def _calculate_go_errors(df, err_type, nogo_stimulus=NOGO_STIMULUS):
     """Take pandas data frame and return boolean list (true if go error).
     """
     errors = []
@@ -215,21 +573,19 @@ def _calculate_go_errors(df, err_type):
         error = False
         if series['stimulus'].isdigit() and not series['correct'] and \
                 not series['anticipate_error']:
-            if err_type == 'go' and series['stimulus'] != '3':
+            if err_type == 'go' and series['stimulus'] != nogo_stimulus:
                 error = True
-            elif err_type == 'no_go' and series['stimulus'] == '3':
+            elif err_type == 'no_go' and series['stimulus'] == nogo_stimulus:
                 error = True
         errors.append(error)
     return pd.Series(errors, index=df.index)
 
 
-def _calculate_nogo_error_rt_avgs(df):
+def _calculate_nogo_error_rt_avgs(df, max_adjacent_rows=MAX_ADJACENT_ROWS):
     """Take pandas dataframe representing raw SART trails data,
     calculate reaction time average before and after no-go errors and
     return before and after RT averages.
     """
-    MAX_ADJACENT_ROWS = 4
-
     def get_adjacent_row_rts(idx, direction):
         row_idx = idx
         next_num_rows = 0
@@ -240,7 +596,8 @@ def _calculate_nogo_error_rt_avgs(df):
             break_row_idx = df.first_valid_index()
 
         row_rts = []
-        while next_num_rows < MAX_ADJACENT_ROWS and row_idx != break_row_idx:
+        while next_num_rows < max_adjacent_rows and \
+                row_idx != break_row_idx:
             # adjacent row index
             if direction == 'next':
                 row_idx += 1
@@ -301,7 +658,20 @@ def _get_correct_rts(df):
     return rts
 
 
-def summarize_block_performance(df):
+def _get_rt_variability(rts):
+    """Take reaction times. Return tuple of their (sample) standard deviation
+    and coefficient of variation, or Nones for fewer than two RTs.
+    """
+    if len(rts) < 2:
+        return None, None
+    rt_sd = np.std(rts, ddof=1)
+    return (round(rt_sd, ROUND_NDIGITS),
+            round(rt_sd / np.mean(rts), ROUND_NDIGITS))
+
+
+def summarize_block_performance(
+        df, anticipation_threshold=ANTICIPATION_THRESHOLD_MS,
+        max_adjacent_rows=MAX_ADJACENT_ROWS, nogo_stimulus=NOGO_STIMULUS):
     """Take pandas dataframe representing raw SART trails data and
     summarize performance. Return dict.
     """
@@ -312,7 +682,7 @@ def summarize_block_performance(df):
     performance['num_trials'] = num_trials
 
     # add anticipation errors and re-calculate `correct` column
-    df = _add_anticipation_errors(df)
+    df = _add_anticipation_errors(df, anticipation_threshold)
 
     # number of anticipation errors
     antipations = list(df['anticipate_error'].values)
@@ -326,25 +696,129 @@ def summarize_block_performance(df):
     performance['accuracy'] = round(accuracy, ROUND_NDIGITS)
 
     # number of go errors
-    df['go_error'] = _calculate_go_errors(df, 'go')
+    df['go_error'] = _calculate_go_errors(df, 'go', nogo_stimulus)
     go_errors = list(df['go_error'].values)
     performance['go_num_errors'] = go_errors.count(True)
     go_errors_prop = (float(go_errors.count(True)) / num_trials)
     performance['go_errors'] = round(go_errors_prop, ROUND_NDIGITS)
 
     # number of no-go errors
-    df['nogo_error'] = _calculate_go_errors(df, 'no_go')
+    df['nogo_error'] = _calculate_go_errors(df, 'no_go', nogo_stimulus)
     nogo_errors = list(df['nogo_error'].values)
     performance['nogo_num_errors'] = nogo_errors.count(True)
     nogo_errors_prop = (float(nogo_errors.count(True)) / num_trials)
     performance['nogo_errors'] = round(nogo_errors_prop, ROUND_NDIGITS)
 
-    # average reaction time (RT)
+    # average reaction time (RT) and its variability
     correct_rts = _get_correct_rts(df)
     performance['rt_avg'] = round(np.mean(correct_rts), ROUND_NDIGITS)
+    performance['rt_sd'], performance['rt_cv'] = _get_rt_variability(
+        correct_rts)
+
+    # average RTs before and after no-go errors
+    nogo_adjacent_rts = _calculate_nogo_error_rt_avgs(df, max_adjacent_rows)
+    performance['nogo_prev4_avg'] = nogo_adjacent_rts['prev4_avg']
+    performance['nogo_num_prev4_rts'] = nogo_adjacent_rts['num_prev4_rts']
+    performance['nogo_next4_avg'] = nogo_adjacent_rts['next4_avg']
+    performance['nogo_num_next4_rts'] = nogo_adjacent_rts['num_next4_rts']
+
+    return performance
+
+
+def _calculate_nogo_error_rt_avgs_fast(df, rts_ms, nogo_errors,
+                                      max_adjacent_rows=MAX_ADJACENT_ROWS):
+    """Take pandas dataframe representing raw SART trials data, its parsed
+    reaction times and boolean array of no-go errors. Calculate reaction time
+    averages before and after no-go errors, as `_calculate_nogo_error_rt_avgs`
+    does, with a kernel over the trial indices. Return dict.
+    """
+    prev4_rts, next4_rts = _get_kernels().get_nogo_adjacent_rts(
+        df.index.values.astype(np.int64), np.asarray(rts_ms, dtype=float),
+        np.flatnonzero(nogo_errors), max_adjacent_rows)
+
+    prev4_avg = round(np.mean(prev4_rts), ROUND_NDIGITS) if len(prev4_rts) \
+        else None
+    next4_avg = round(np.mean(next4_rts), ROUND_NDIGITS) if len(next4_rts) \
+        else None
+
+    return {
+        "prev4_avg": prev4_avg,
+        "num_prev4_rts": len(prev4_rts),
+        "next4_avg": next4_avg,
+        "num_next4_rts": len(next4_rts)
+    }
+
+
+def _get_error_masks(df, rts_ms,
+                     anticipation_threshold=ANTICIPATION_THRESHOLD_MS,
+                     nogo_stimulus=NOGO_STIMULUS):
+    """Take pandas dataframe representing raw SART trials data and its parsed
+    reaction times. Return tuple of boolean arrays: anticipation errors,
+    truthy (correct, as the reference engine reads it) trials, and go and
+    no-go errors.
+    """
+    anticipated = _get_anticipation_errors(rts_ms, anticipation_threshold)
+    # as with the reference engine, non-boolean values (e.g., NaN) are truthy
+    is_truthy = df['correct'].values.astype(bool) & ~anticipated
+
+    stimuli = df['stimulus']
+    is_digit = stimuli.str.isdigit().fillna(False).values.astype(bool)
+    is_error = is_digit & ~is_truthy & ~anticipated
+    is_nogo_stimulus = (stimuli.values == nogo_stimulus)
+    return (anticipated, is_truthy, is_error & ~is_nogo_stimulus,
+            is_error & is_nogo_stimulus)
+
+
+def summarize_block_performance_fast(
+        df, anticipation_threshold=ANTICIPATION_THRESHOLD_MS,
+        max_adjacent_rows=MAX_ADJACENT_ROWS, nogo_stimulus=NOGO_STIMULUS):
+    """Take pandas dataframe representing raw SART trials data and
+    summarize performance, as `summarize_block_performance` does, using
+    array operations on the parsed reaction times. The dataframe is left
+    unchanged. Return dict.
+    """
+    performance = {}
+
+    # number of trials
+    num_trials = len(df.index.values)
+    performance['num_trials'] = num_trials
+
+    # anticipation errors are never correct
+    rts_ms = _get_parsed_rts(df)
+    anticipated, is_truthy, go_errors, nogo_errors = _get_error_masks(
+        df, rts_ms, anticipation_threshold, nogo_stimulus)
+    is_correct = (df['correct'].values == True) & ~anticipated  # noqa: E712
+
+    # number of anticipation errors
+    num_anticipated = int(anticipated.sum())
+    performance['anticipated_num_errors'] = num_anticipated
+    performance['anticipated'] = round(
+        float(num_anticipated) / num_trials, ROUND_NDIGITS)
+
+    # overall accuracy
+    performance['accuracy'] = round(
+        float(is_correct.sum()) / num_trials, ROUND_NDIGITS)
+
+    # number of go and no-go errors
+    num_go_errors = int(go_errors.sum())
+    performance['go_num_errors'] = num_go_errors
+    performance['go_errors'] = round(
+        float(num_go_errors) / num_trials, ROUND_NDIGITS)
+
+    num_nogo_errors = int(nogo_errors.sum())
+    performance['nogo_num_errors'] = num_nogo_errors
+    performance['nogo_errors'] = round(
+        float(num_nogo_errors) / num_trials, ROUND_NDIGITS)
+
+    # average reaction time (RT) and its variability
+    correct_rts = rts_ms[is_truthy & ~np.isnan(rts_ms)]
+    performance['rt_avg'] = round(np.mean(correct_rts), ROUND_NDIGITS)
+    performance['rt_sd'], performance['rt_cv'] = _get_rt_variability(
+        correct_rts)
 
     # average RTs before and after no-go errors
-    nogo_adjacent_rts = _calculate_nogo_error_rt_avgs(df)
+    nogo_adjacent_rts = _calculate_nogo_error_rt_avgs_fast(
+        df, rts_ms, nogo_errors, max_adjacent_rows)
     performance['nogo_prev4_avg'] = nogo_adjacent_rts['prev4_avg']
     performance['nogo_num_prev4_rts'] = nogo_adjacent_rts['num_prev4_rts']
     performance['nogo_next4_avg'] = nogo_adjacent_rts['next4_avg']
@@ -353,19 +827,60 @@ def summarize_block_performance(df):
     return performance
 
 
-def summarize_sart_chunk(df):
+def _calculate_ratings_proportions_fast(ratings):
+    """Given a list of ratings integers, calculate the proportions of
+    increases, decreases and no-changes, as `_calculate_ratings_proportions`
+    does, with a change counting kernel. Return dict.
+    """
+    possible_changes = float(len(ratings) - 1)
+    ups, downs, sames = _get_kernels().count_rating_changes(
+        np.asarray(ratings, dtype=float))
+    return {
+        'ups': round(ups / possible_changes, ROUND_NDIGITS),
+        'downs': round(downs / possible_changes, ROUND_NDIGITS),
+        'sames': round(sames / possible_changes, ROUND_NDIGITS)
+    }
+
+
+Engine = namedtuple('Engine', [
+    'extract_sart_blocks', 'summarize_block_performance',
+    'calculate_ratings_proportions'])
+
+
+def get_engine(name):
+    """Take scoring engine name (see `ENGINES`). Return `Engine`.
+    """
+    if name not in ENGINES:
+        raise ValueError('Unknown engine: {} (expected one of: {})'.format(
+            name, ', '.join(sorted(ENGINES))))
+    return ENGINES[name]
+
+
+def summarize_sart_chunk(df, engine=DEFAULT_ENGINE, **scoring):
     """Take pandas dataframe representing raw SART chunk data and create a
-    complete summary. Return dict.
+    complete summary. Scoring parameters are passed on to the scoring
+    engine's `summarize_block_performance`. Return dict.
     """
     summary = {}
 
     # summarize performance
-    sart_trials = df.loc[df['trial_type'] == 'multi-stim-multi-response']
-    performance = summarize_block_performance(sart_trials)
+    sart_trials = df.loc[df['trial_type'] == SART_TRIAL_TYPE]
+    performance = get_engine(engine).summarize_block_performance(
+        sart_trials, **scoring)
     summary.update(performance)
 
     # affective ratings
-    survey_questions = df.loc[df['trial_type'] == 'survey-multi-choice'].\
+    summary.update(summarize_chunk_ratings(df))
+    return summary
+
+
+def summarize_chunk_ratings(df):
+    """Take pandas dataframe representing raw SART chunk data. Return dict of
+    its affective ratings and the time (in minutes) they were given at,
+    which don't depend on how the chunk's trials are scored.
+    """
+    summary = {}
+    survey_questions = df.loc[df['trial_type'] == SURVEY_TRIAL_TYPE].\
         copy().reset_index()
 
     for rating_type, i in [('effort', 0), ('discomfort', 1), ('boredom', 2)]:
@@ -381,6 +896,347 @@ def summarize_sart_chunk(df):
     return summary
 
 
+def summarize_anticipation_thresholds(df, thresholds,
+                                      nogo_stimulus=NOGO_STIMULUS):
+    """Take pandas dataframe representing raw SART trials data and a list of
+    anticipation thresholds (ms). Score every threshold in a single pass over
+    the parsed reaction times. Return dict of performance dicts, keyed by
+    threshold.
+    """
+    num_trials = len(df.index.values)
+    thresholds = list(thresholds)
+
+    rts_ms = _get_parsed_rts(df)
+    recorded_correct = (df['correct'] == True).values
+    is_digit = df['stimulus'].astype(str).str.isdigit().values
+    is_nogo = (df['stimulus'] == nogo_stimulus).values
+
+    # one row per threshold, one column per trial
+    threshold_col = np.array(thresholds, dtype=float)[:, np.newaxis]
+    anticipated = _get_anticipation_errors(rts_ms[np.newaxis, :],
+                                           threshold_col)
+    correct = recorded_correct & ~anticipated
+    errors = is_digit & ~correct & ~anticipated
+    go_errors = errors & ~is_nogo
+    nogo_errors = errors & is_nogo
+
+    num_anticipated = anticipated.sum(axis=1)
+    num_correct = correct.sum(axis=1)
+    num_go_errors = go_errors.sum(axis=1)
+    num_nogo_errors = nogo_errors.sum(axis=1)
+
+    performances = {}
+    for i, threshold in enumerate(thresholds):
+        performances[threshold] = {
+            'num_trials': num_trials,
+            'anticipated_num_errors': int(num_anticipated[i]),
+            'anticipated': round(
+                float(num_anticipated[i]) / num_trials, ROUND_NDIGITS),
+            'accuracy': round(
+                float(num_correct[i]) / num_trials, ROUND_NDIGITS),
+            'go_num_errors': int(num_go_errors[i]),
+            'nogo_num_errors': int(num_nogo_errors[i]),
+        }
+    return performances
+
+
+def compile_anticipation_thresholds(df, thresholds, blocks=None,
+                                    num_survey_questions=NUM_SURVEY_QUESTIONS,
+                                    nogo_stimulus=NOGO_STIMULUS):
+    """Take pandas dataframe and a list of anticipation thresholds (ms).
+    Compile block anticipation and accuracy variables, along with their
+    derived averages (go, no-go and anticipation error rates, and
+    accuracy), for every threshold. Return dict of dicts, keyed by
+    threshold.
+    """
+    thresholds = list(thresholds)
+    num_trials = float(df['num_trials'].values[0])
+    if blocks is None:
+        blocks = extract_sart_blocks(
+            df, with_survey=True, num_survey_questions=num_survey_questions)
+
+    block_performances = []
+    for block in blocks:
+        sart_trials = block.loc[block['trial_type'] == SART_TRIAL_TYPE]
+        block_performances.append(summarize_anticipation_thresholds(
+            sart_trials, thresholds, nogo_stimulus))
+
+    compiled = {}
+    for threshold in thresholds:
+        compiled_data = {}
+        accuracies = []
+        num_block_trials = []
+        num_anticipation_errors = 0
+        num_go_errors = 0
+        num_nogo_errors = 0
+        for i, performances in enumerate(block_performances, start=1):
+            performance = performances[threshold]
+            blk_names = VARIABLES.get_family_names('blk', i)
+            for key in ['anticipated', 'accuracy']:
+                compiled_data[blk_names[key]] = performance[key]
+
+            accuracies.append(performance['accuracy'])
+            num_block_trials.append(performance['num_trials'])
+            num_anticipation_errors += performance['anticipated_num_errors']
+            num_go_errors += performance['go_num_errors']
+            num_nogo_errors += performance['nogo_num_errors']
+
+        avg_go_errors = num_go_errors / num_trials
+        compiled_data['avg_go_errors'] = round(avg_go_errors, ROUND_NDIGITS)
+        avg_nogo_errors = num_nogo_errors / num_trials
+        compiled_data['avg_nogo_errors'] = round(
+            avg_nogo_errors, ROUND_NDIGITS)
+        avg_anticipation_errors = num_anticipation_errors / num_trials
+        compiled_data['avg_anticipation_errors'] = round(
+            avg_anticipation_errors, ROUND_NDIGITS)
+        avg_accuracy = (1 - avg_go_errors - avg_nogo_errors -
+                        avg_anticipation_errors)
+        compiled_data['avg_accuracy'] = round(avg_accuracy, ROUND_NDIGITS)
+        if accuracies:
+            average_accuracy = np.average(accuracies, weights=num_block_trials)
+            compiled_data['avg_blk_accuracy'] = round(
+                average_accuracy, ROUND_NDIGITS)
+        compiled[threshold] = compiled_data
+
+    return compiled
+
+
+def _get_correct_trial_rts(trials,
+                           anticipation_threshold=ANTICIPATION_THRESHOLD_MS):
+    """Take pandas dataframe representing raw SART trials data. Return array
+    of RTs of correct (not anticipated) trials.
+    """
+    rts_ms = _get_parsed_rts(trials)
+    anticipated = _get_anticipation_errors(rts_ms, anticipation_threshold)
+    is_correct = (trials['correct'].values == True) & ~anticipated  # noqa
+    return rts_ms[is_correct & ~np.isnan(rts_ms)]
+
+
+def get_vigilance_curves(trials, window=ROLLING_WINDOW_TRIALS,
+                         anticipation_threshold=ANTICIPATION_THRESHOLD_MS):
+    """Take pandas dataframe representing raw SART trials data (e.g., every
+    block's trials, in order) and a window size (number of trials). Return
+    pandas dataframe of trailing rolling-window curves, with one row per
+    full window: the time elapsed (minutes) at the window's last trial, and
+    the window's correct-trial RT mean (`rt_avg`), coefficient of variation
+    (`rt_cv`) and `accuracy`.
+
+    Windows are summed from cumulative sums, in time linear in the number of
+    trials.
+    """
+    if window < 1:
+        raise ValueError('Window must be at least 1 trial: {}'.format(window))
+
+    rts_ms = _get_parsed_rts(trials)
+    anticipated = _get_anticipation_errors(rts_ms, anticipation_threshold)
+    is_correct = (trials['correct'].values == True) & ~anticipated  # noqa
+    has_rt = is_correct & ~np.isnan(rts_ms)
+
+    # shift RTs by their mean, for numerically stable sums of squares
+    shift = rts_ms[has_rt].mean() if has_rt.any() else 0.0
+    shifted_rts = np.where(has_rt, rts_ms - shift, 0.0)
+
+    def get_window_sums(values):
+        sums = np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+        return sums[window:] - sums[:-window]
+
+    num_rts = get_window_sums(has_rt)
+    rt_sums = get_window_sums(shifted_rts)
+    rt_square_sums = get_window_sums(shifted_rts ** 2)
+    num_correct = get_window_sums(is_correct)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rt_avgs = rt_sums / num_rts
+        rt_variances = (rt_square_sums - rt_sums * rt_avgs) / (num_rts - 1)
+        rt_avgs += shift
+        rt_cvs = np.sqrt(np.maximum(rt_variances, 0)) / rt_avgs
+    rt_avgs[num_rts < 1] = np.nan
+    rt_cvs[num_rts < 2] = np.nan
+
+    time_elapsed = trials['time_elapsed'].values[window - 1:]
+    return pd.DataFrame({
+        'time_elapsed_min': time_elapsed / 1000 / 60.0,
+        'rt_avg': rt_avgs,
+        'rt_cv': rt_cvs,
+        'accuracy': num_correct / window,
+    }, columns=['time_elapsed_min', 'rt_avg', 'rt_cv', 'accuracy'])
+
+
+def summarize_vigilance(trials, window=ROLLING_WINDOW_TRIALS,
+                        anticipation_threshold=ANTICIPATION_THRESHOLD_MS):
+    """Take pandas dataframe representing raw SART trials data from every
+    block, in order, and a rolling window size (number of trials). Summarize
+    RT variability over all correct trials, and the start, end and trend
+    (slope per minute) of the rolling-window curves (see
+    `get_vigilance_curves`). Return dict.
+    """
+    summary = {}
+
+    # RT variability over the whole experiment
+    correct_rts = _get_correct_trial_rts(trials, anticipation_threshold)
+    summary['rt_avg'] = round(np.mean(correct_rts), ROUND_NDIGITS) \
+        if len(correct_rts) else None
+    summary['rt_sd'], summary['rt_cv'] = _get_rt_variability(correct_rts)
+
+    # vigilance decrement: rolling-window curves and their trends
+    curves = get_vigilance_curves(trials, window, anticipation_threshold)
+    time_elapsed = curves['time_elapsed_min'].values
+    for measure_name, column in [('rt', 'rt_avg'), ('rt_cv', 'rt_cv'),
+                                 ('accuracy', 'accuracy')]:
+        values = curves[column].values
+        is_finite = np.isfinite(values)
+        start, end, slope = None, None, None
+        if is_finite.any():
+            start = round(values[is_finite][0], ROUND_NDIGITS)
+            end = round(values[is_finite][-1], ROUND_NDIGITS)
+        if is_finite.sum() > 1:
+            linregress = stats.linregress(
+                time_elapsed[is_finite], values[is_finite])
+            slope = round(linregress.slope, ROUND_NDIGITS)
+        summary['rolling_{}_start'.format(measure_name)] = start
+        summary['rolling_{}_end'.format(measure_name)] = end
+        summary['rolling_{}_slope'.format(measure_name)] = slope
+
+    return summary
+
+
+def summarize_event_locked_rts(
+        blocks, num_prev=EVENT_WINDOW_TRIALS, num_next=EVENT_WINDOW_TRIALS,
+        anticipation_threshold=ANTICIPATION_THRESHOLD_MS,
+        nogo_stimulus=NOGO_STIMULUS):
+    """Take list of pandas dataframes representing raw SART trials data, one
+    per block. Average the RTs of up to `num_prev` trials before and
+    `num_next` trials after go errors and anticipation errors (within their
+    blocks), and around survey probes (the last trials of the block before
+    and the first of the block after; see ``events.py``). Return dict;
+    averages are None where there are no RTs.
+    """
+    events = _import_script('events')
+    names = ['{}_{}_rt_avg'.format(name, direction)
+             for name in ['go_error', 'anticipation_error', 'probe']
+             for direction in ['prev', 'next']]
+    summary = dict.fromkeys(names)
+    trials = pd.concat(blocks) if blocks else None
+    if trials is None or not len(trials):
+        return summary
+
+    rts_ms = np.asarray(_get_parsed_rts(trials), dtype=float)
+    anticipated, _, go_errors, _ = _get_error_masks(
+        trials, rts_ms, anticipation_threshold, nogo_stimulus)
+    block_ids = np.repeat(np.arange(len(blocks)), [len(b) for b in blocks])
+
+    # probes precede every block but the first
+    probes = np.zeros(len(trials), bool)
+    probes[np.flatnonzero(np.diff(block_ids)) + 1] = True
+
+    event_windows = [
+        ('go_error', go_errors, trials.index.values, block_ids, False),
+        ('anticipation_error', anticipated, trials.index.values, block_ids,
+         False),
+        ('probe', probes, np.arange(len(trials)), None, True),
+    ]
+    for name, mask, indices, segments, include_event in event_windows:
+        windows = events.summarize_event_windows(
+            indices, rts_ms, mask, num_prev, num_next, segments,
+            include_event)
+        for direction in ['prev', 'next']:
+            rt_avg = windows['{}_rt_avg'.format(direction)]
+            summary['{}_{}_rt_avg'.format(name, direction)] = \
+                round(rt_avg, ROUND_NDIGITS) if np.isfinite(rt_avg) else None
+    return summary
+
+
+def summarize_exgauss(blocks,
+                      anticipation_threshold=ANTICIPATION_THRESHOLD_MS):
+    """Take list of pandas dataframes representing raw SART trials data, one
+    per block. Fit ex-Gaussian distributions to correct-trial RTs over all
+    blocks (`exg_mu`, `exg_sigma`, `exg_tau`) and per block (e.g.,
+    `exg_blk1_tau`), in a single batch (see ``exgauss.py``). Return dict;
+    parameters are None where there are too few RTs to fit.
+    """
+    exgauss = _import_script('exgauss')
+    block_rts = [_get_correct_trial_rts(block, anticipation_threshold)
+                 for block in blocks]
+    all_rts = np.concatenate(block_rts) if block_rts else np.empty(0)
+    fits = exgauss.fit_exgauss([all_rts] + block_rts)
+
+    summary = {}
+    for i, fit in enumerate(fits):
+        for parameter, value in zip(exgauss.PARAMETERS, fit):
+            if i == 0:
+                name = 'exg_{}'.format(parameter)
+            else:
+                name = VARIABLES.get_family_name('exg_blk', i, parameter)
+            summary[name] = None if np.isnan(value) \
+                else round(value, ROUND_NDIGITS)
+    return summary
+
+
+def _format_breakdown_value(value, dtype):
+    if np.isnan(value):
+        return None
+    if dtype == 'int':
+        return int(value)
+    return round(value, ROUND_NDIGITS)
+
+
+def summarize_breakdowns(blocks,
+                         anticipation_threshold=ANTICIPATION_THRESHOLD_MS,
+                         nogo_stimulus=NOGO_STIMULUS):
+    """Take list of pandas dataframes representing raw SART trials data, one
+    per block. Summarize performance (number of trials, accuracy, commission
+    and omission errors and average correct-trial RT) by stimulus digit
+    (e.g., `digit3_accuracy`) and font size, ranked from the smallest (e.g.,
+    `font1_rt_avg`, with its size in `font1_px`), over all blocks and per
+    block (e.g., `blk2_digit3_accuracy`), in one pass over the trials (see
+    ``breakdowns.py``). Return dict; accuracies and averages are None where
+    there are no trials or RTs.
+    """
+    breakdowns = _import_script('breakdowns')
+    trials = pd.concat(blocks) if blocks else None
+    if trials is None or not len(trials):
+        return {}
+
+    rts_ms = np.asarray(_get_parsed_rts(trials), dtype=float)
+    anticipated, is_truthy, go_errors, nogo_errors = _get_error_masks(
+        trials, rts_ms, anticipation_threshold, nogo_stimulus)
+    is_correct = trials['correct'].values == True  # noqa: E712
+    is_correct &= ~anticipated
+    correct_rts = np.where(is_truthy, rts_ms, np.nan)
+    block_ids = np.repeat(np.arange(len(blocks)), [len(b) for b in blocks])
+
+    font_codes, font_sizes = breakdowns.code_font_sizes(
+        breakdowns.parse_font_sizes(trials['font_size'].values))
+    num_font_sizes = max(NUM_FONT_SIZES, len(font_sizes))
+    groupings = [
+        ('digit', breakdowns.code_digits(trials['stimulus'].values),
+         max(STIMULUS_DIGITS)),
+        ('font', font_codes, num_font_sizes),
+    ]
+
+    summary = {}
+    for grouping, codes, num_groups in groupings:
+        reductions = breakdowns.reduce_groups(
+            codes, block_ids, num_groups + 1, len(blocks), is_correct,
+            nogo_errors, go_errors, correct_rts)
+        for metric, dtype in BREAKDOWN_METRICS:
+            values = reductions[metric]
+            for group in range(1, num_groups + 1):
+                summary[VARIABLES.get_family_name(
+                    grouping, group, metric)] = _format_breakdown_value(
+                        values[-1, group], dtype)
+                for i in range(len(blocks)):
+                    summary[VARIABLES.get_family_name(
+                        'blk_' + grouping, i + 1,
+                        '{}_{}'.format(group, metric))] = \
+                        _format_breakdown_value(values[i, group], dtype)
+    for rank in range(1, num_font_sizes + 1):
+        summary[VARIABLES.get_family_name('font', rank, 'px')] = \
+            round(font_sizes[rank - 1], ROUND_NDIGITS) \
+            if rank <= len(font_sizes) else None
+    return summary
+
+
 def _calculate_ratings_proportions(ratings):
     """Given a list of ratings integers, calcuate the number of changes.
     Return dict indicating proportion of increases, decreases, and no-changes.
@@ -412,143 +1268,228 @@ def _calculate_ratings_proportions(ratings):
     }
 
 
-def compile_experiment_data(df):
-    """Take pandas dataframe and compile key variables. Return dict.
-    """
-    compiled_data = {}
+# scoring engines: the pandas reference implementation and an optimized one,
+# which must compile the same values (see ``equivalence.py``)
+ENGINES = {
+    'reference': Engine(
+        extract_sart_blocks, summarize_block_performance,
+        _calculate_ratings_proportions),
+    'fast': Engine(
+        extract_sart_blocks_fast, summarize_block_performance_fast,
+        _calculate_ratings_proportions_fast),
+}
+
+
+# anticipated/antecedent questions
+ANTICIPATED_QUESTIONS_INDEX = [
+    ('forecasted_enjoyment', '0.0-1.0-0.0'),
+    ('forecasted_performance', '0.0-1.0-1.0'),
+    ('forecasted_effort', '0.0-1.0-2.0'),
+    ('forecasted_discomfort', '0.0-1.0-3.0'),
+    ('forecasted_fatigue', '0.0-1.0-4.0'),
+    ('forecasted_motivation', '0.0-1.0-5.0'),
+    ('antecedent_boredom', '0.0-1.0-6.0'),
+]
 
-    # conditions
-    num_trials = df['num_trials'].values[0]
-    compiled_data['num_trials'] = num_trials
-    compiled_data['trials_per_block'] = df['trials_per_block'].values[0]
 
-    # blocks and block order
-    blocks = extract_sart_blocks(df, with_survey=True)
-    compiled_data['num_blocks'] = len(blocks)
+REALTIME_RATING_TYPES = ['effort', 'discomfort', 'boredom']
 
-    # anticipated/antecedent questions
-    anticipated_questions_index = [
-        ('forecasted_enjoyment', 0),
-        ('forecasted_performance', 1),
-        ('forecasted_effort', 2),
-        ('forecasted_discomfort', 3),
-        ('forecasted_fatigue', 4),
-        ('forecasted_motivation', 5),
-        ('antecedent_boredom', 6),
-    ]
-    for label, i in anticipated_questions_index:
-        node_id = '0.0-1.0-{}.0'.format(i)
+
+def _get_conditions(df):
+    return {
+        'num_trials': df['num_trials'].values[0],
+        'trials_per_block': df['trials_per_block'].values[0],
+    }
+
+
+def _extract_experiment_blocks(df, params):
+    return get_engine(params['engine']).extract_sart_blocks(
+        df, with_survey=True,
+        num_survey_questions=params['num_survey_questions'])
+
+
+def _get_anticipated_responses(df):
+    compiled_data = {}
+    for label, node_id in ANTICIPATED_QUESTIONS_INDEX:
         resp_json = df[
             (df['internal_node_id'] == node_id)]['responses'].values[0]
         resp = get_response_from_json(resp_json)
         compiled_data[label] = int(resp[0])
+    return compiled_data
 
-    # SART accuracy and affective reports
-    realtime_ratings = {'effort': [], 'discomfort': [], 'boredom': []}
-    accuracies = []
-    rating_times = []
-    num_block_trials = []
-
-    # for calculating no-go error averages
-    num_anticipation_errors = 0
-    num_go_errors = 0
-    num_nogo_errors = 0
-    nogo_prev4_avgs = []
-    nogo_next4_avgs = []
-    nogo_num_next4_rts = []
-    nogo_num_prev4_rts = []
-    realtime_rating_types = ['effort', 'discomfort', 'boredom']
-
-    # collect and organize experiment data from experimental blocks
-    for i, block in enumerate(blocks, start=1):
-        blk_summary = summarize_sart_chunk(block)
-        blk_name = "blk{}".format(i)
-
-        # pop block summary rating times, and add to list for later slope
-        # calculations
-        rating_times.append(blk_summary.pop('ratings_time_min'))
-
-        # add block summaries to compiled data
+
+def _summarize_experiment_ratings(blocks):
+    return [summarize_chunk_ratings(block) for block in blocks]
+
+
+def _summarize_experiment_blocks(blocks, block_ratings, params):
+    engine = get_engine(params['engine'])
+    block_summaries = []
+    for block, ratings in zip(blocks, block_ratings):
+        sart_trials = block.loc[block['trial_type'] == SART_TRIAL_TYPE]
+        summary = engine.summarize_block_performance(
+            sart_trials, **params['scoring'])
+        summary.update(ratings)
+        block_summaries.append(summary)
+    return block_summaries
+
+
+def _get_block_variables(block_summaries):
+    compiled_data = {}
+    for i, blk_summary in enumerate(block_summaries, start=1):
+        blk_names = VARIABLES.get_family_names('blk', i)
         for key in blk_summary.keys():
-            blk_key = "{}_{}".format(blk_name, key)
+            # (rating times are only used for later slope calculations)
+            if key == 'ratings_time_min':
+                continue
+            blk_key = blk_names.get(key) or VARIABLES.get_family_name(
+                'blk', i, key)
             compiled_data[blk_key] = blk_summary[key]
+    return compiled_data
 
-        # collect data for later averaging
-        for rtype in realtime_rating_types:
-            realtime_ratings[rtype].append(blk_summary[rtype])
-        accuracies.append(blk_summary['accuracy'])
-        num_block_trials.append(blk_summary['num_trials'])
 
-        num_anticipation_errors += blk_summary['anticipated_num_errors']
-        num_go_errors += blk_summary['go_num_errors']
-        num_nogo_errors += blk_summary['nogo_num_errors']
+def _collect_rating_measures(block_ratings):
+    """Take list of dicts of block ratings (or block summaries). Return dict
+    of lists of their ratings (by rating type) and rating times.
+    """
+    measures = {
+        'realtime_ratings': dict(
+            (rtype, []) for rtype in REALTIME_RATING_TYPES),
+        'rating_times': [],
+    }
+    for ratings in block_ratings:
+        measures['rating_times'].append(ratings['ratings_time_min'])
+        for rtype in REALTIME_RATING_TYPES:
+            measures['realtime_ratings'][rtype].append(ratings[rtype])
+    return measures
+
+
+def _collect_block_measures(block_summaries):
+    """Take list of block summary dicts. Return dict of lists of their
+    ratings (by rating type), accuracies, rating times and numbers of
+    trials, totals of errors, and RT averages before and after no-go errors
+    (with their numbers of RTs), for averaging.
+    """
+    measures = _collect_rating_measures(block_summaries)
+    measures.update({
+        'accuracies': [],
+        'num_block_trials': [],
+        'num_anticipation_errors': 0,
+        'num_go_errors': 0,
+        'num_nogo_errors': 0,
+        'nogo_prev4_avgs': [],
+        'nogo_next4_avgs': [],
+        'nogo_num_prev4_rts': [],
+        'nogo_num_next4_rts': [],
+    })
+    for blk_summary in block_summaries:
+        measures['accuracies'].append(blk_summary['accuracy'])
+        measures['num_block_trials'].append(blk_summary['num_trials'])
+
+        measures['num_anticipation_errors'] += \
+            blk_summary['anticipated_num_errors']
+        measures['num_go_errors'] += blk_summary['go_num_errors']
+        measures['num_nogo_errors'] += blk_summary['nogo_num_errors']
         if blk_summary['nogo_prev4_avg']:
-            nogo_prev4_avgs.append(blk_summary['nogo_prev4_avg'])
-            nogo_num_prev4_rts.append(blk_summary['nogo_num_prev4_rts'])
+            measures['nogo_prev4_avgs'].append(blk_summary['nogo_prev4_avg'])
+            measures['nogo_num_prev4_rts'].append(
+                blk_summary['nogo_num_prev4_rts'])
         if blk_summary['nogo_next4_avg']:
-            nogo_next4_avgs.append(blk_summary['nogo_next4_avg'])
-            nogo_num_next4_rts.append(blk_summary['nogo_num_next4_rts'])
+            measures['nogo_next4_avgs'].append(blk_summary['nogo_next4_avg'])
+            measures['nogo_num_next4_rts'].append(
+                blk_summary['nogo_num_next4_rts'])
+    return measures
+
+
+def _summarize_errors(conditions, measures):
+    compiled_data = {}
+    num_trials = conditions['num_trials']
 
     # weighted averages for RTs before and after no-go errors
-    compiled_data['nogo_num_errors'] = num_nogo_errors
+    compiled_data['nogo_num_errors'] = measures['num_nogo_errors']
     compiled_data['nogo_error_prev_rt_avg'] = np.average(
-        nogo_prev4_avgs,
-        weights=nogo_num_prev4_rts) if nogo_num_prev4_rts else None
+        measures['nogo_prev4_avgs'],
+        weights=measures['nogo_num_prev4_rts']) \
+        if measures['nogo_num_prev4_rts'] else None
     compiled_data['nogo_error_next_rt_avg'] = np.average(
-        nogo_next4_avgs,
-        weights=nogo_num_next4_rts) if nogo_num_next4_rts else None
+        measures['nogo_next4_avgs'],
+        weights=measures['nogo_num_next4_rts']) \
+        if measures['nogo_num_next4_rts'] else None
 
     # average of go, no-go, and anticipation errors, as well as accuracy
-    avg_go_errors = (num_go_errors / float(num_trials))
+    avg_go_errors = (measures['num_go_errors'] / float(num_trials))
     compiled_data['avg_go_errors'] = round(avg_go_errors, ROUND_NDIGITS)
-    avg_nogo_errors = (num_nogo_errors / float(num_trials))
+    avg_nogo_errors = (measures['num_nogo_errors'] / float(num_trials))
     compiled_data['avg_nogo_errors'] = round(avg_nogo_errors, ROUND_NDIGITS)
-    avg_anticipation_errors = (num_anticipation_errors / float(num_trials))
+    avg_anticipation_errors = (
+        measures['num_anticipation_errors'] / float(num_trials))
     compiled_data['avg_anticipation_errors'] = round(
         avg_anticipation_errors, ROUND_NDIGITS)
     avg_accuracy = (1 - avg_go_errors - avg_nogo_errors -
                     avg_anticipation_errors)
     compiled_data['avg_accuracy'] = round(avg_accuracy, ROUND_NDIGITS)
+    return compiled_data
+
+
+def _summarize_realtime_ratings(measures, params):
+    compiled_data = {}
+    for rtype in REALTIME_RATING_TYPES:
+        ratings = measures['realtime_ratings'][rtype]
 
-    # assign realtime summary variables
-    for rtype in realtime_rating_types:
         # descriptive
-        compiled_data['start_{}'.format(rtype)] = realtime_ratings[rtype][0]
-        compiled_data['peak_{}'.format(rtype)] = max(realtime_ratings[rtype])
-        compiled_data['min_{}'.format(rtype)] = min(realtime_ratings[rtype])
-        compiled_data['end_{}'.format(rtype)] = realtime_ratings[rtype][-1]
-        avg_rating = np.mean(realtime_ratings[rtype])
+        compiled_data['start_{}'.format(rtype)] = ratings[0]
+        compiled_data['peak_{}'.format(rtype)] = max(ratings)
+        compiled_data['min_{}'.format(rtype)] = min(ratings)
+        compiled_data['end_{}'.format(rtype)] = ratings[-1]
+        avg_rating = np.mean(ratings)
         compiled_data['avg_{}'.format(rtype)] = round(
             avg_rating, ROUND_NDIGITS)
 
         # proportion of effort and discomfort ratings that increase or decrease
-        props = _calculate_ratings_proportions(realtime_ratings[rtype])
+        props = get_engine(params['engine']).calculate_ratings_proportions(
+            ratings)
         compiled_data['prop_{}_ups'.format(rtype)] = props['ups']
         compiled_data['prop_{}_downs'.format(rtype)] = props['downs']
         compiled_data['prop_{}_sames'.format(rtype)] = props['sames']
 
         # area under the curve calculations
         compiled_data['auc_{}'.format(rtype)] = round(
-            np.trapz(realtime_ratings[rtype]), ROUND_NDIGITS)
-
-    # assign accuracy summary variables
-    average_accuracy = np.average(accuracies, weights=num_block_trials)
-    compiled_data['avg_blk_accuracy'] = round(average_accuracy, ROUND_NDIGITS)
-    compiled_data['max_blk_accuracy'] = max(accuracies)
-    compiled_data['min_blk_accuracy'] = min(accuracies)
-    compiled_data['start_blk_accuracy'] = accuracies[0]
-    compiled_data['end_blk_accuracy'] = accuracies[-1]
-    compiled_data['auc_accuracy'] = round(np.trapz(accuracies), ROUND_NDIGITS)
-
-    # compute regression variables for blocks
-    block_measures = [
-        ('accuracy', accuracies),
-        ('effort', realtime_ratings['effort']),
-        ('discomfort', realtime_ratings['discomfort']),
-        ('boredom', realtime_ratings['boredom']),
-    ]
+            np.trapz(ratings), ROUND_NDIGITS)
+    return compiled_data
+
+
+def _summarize_block_accuracy(measures):
+    accuracies = measures['accuracies']
+    average_accuracy = np.average(
+        accuracies, weights=measures['num_block_trials'])
+    return {
+        'avg_blk_accuracy': round(average_accuracy, ROUND_NDIGITS),
+        'max_blk_accuracy': max(accuracies),
+        'min_blk_accuracy': min(accuracies),
+        'start_blk_accuracy': accuracies[0],
+        'end_blk_accuracy': accuracies[-1],
+        'auc_accuracy': round(np.trapz(accuracies), ROUND_NDIGITS),
+    }
+
+
+def _summarize_block_regressions(measures):
+    return _regress_on_rating_times(
+        measures['rating_times'], [('accuracy', measures['accuracies'])])
+
+
+def _summarize_rating_regressions(measures):
+    return _regress_on_rating_times(measures['rating_times'], [
+        (rtype, measures['realtime_ratings'][rtype])
+        for rtype in REALTIME_RATING_TYPES])
+
+
+def _regress_on_rating_times(rating_times, block_measures):
+    """Take list of block rating times (minutes) and list of (measure name,
+    list of its block values) tuples. Return dict of each measure's slope
+    and intercept over the rating times.
+    """
+    compiled_data = {}
     for measure_name, measure_values in block_measures:
-        measure_order = range(1, len(measure_values) + 1)
         linregress = stats.linregress(rating_times, measure_values)
 
         slope_key = '{}_slope'.format(measure_name)
@@ -556,18 +1497,185 @@ def compile_experiment_data(df):
         intercept_key = '{}_intercept'.format(measure_name)
         compiled_data[intercept_key] = round(
             linregress.intercept, ROUND_NDIGITS)
+    return compiled_data
+
+
+def _get_sart_blocks(blocks):
+    return [block.loc[block['trial_type'] == SART_TRIAL_TYPE]
+            for block in blocks]
+
+
+def _get_anticipation_threshold(params):
+    return params['scoring'].get(
+        'anticipation_threshold', ANTICIPATION_THRESHOLD_MS)
+
+
+def _summarize_experiment_vigilance(df, sart_blocks, params):
+    trials = pd.concat(sart_blocks) if sart_blocks else df.iloc[:0]
+    return summarize_vigilance(
+        trials, params['rolling_window'], _get_anticipation_threshold(params))
+
+
+def _summarize_experiment_event_windows(sart_blocks, params):
+    return summarize_event_locked_rts(
+        sart_blocks, params['event_window_prev'], params['event_window_next'],
+        _get_anticipation_threshold(params),
+        params['scoring'].get('nogo_stimulus', NOGO_STIMULUS))
+
+
+def _summarize_experiment_exgauss(sart_blocks, params):
+    if not params['exgauss']:
+        return {}
+    return summarize_exgauss(sart_blocks, _get_anticipation_threshold(params))
+
+
+def _summarize_experiment_breakdowns(sart_blocks, params):
+    if not params['breakdowns']:
+        return {}
+    return summarize_breakdowns(
+        sart_blocks, _get_anticipation_threshold(params),
+        params['scoring'].get('nogo_stimulus', NOGO_STIMULUS))
+
 
-    # post-experiment evaluation of valence and arousal
+def _get_post_arousal_ratings(df):
     arousal_df = df.ix[df.last_valid_index()-2:df.last_valid_index()-1]
     mind_body, feeling = _get_arousal_ratings(arousal_df)
-    compiled_data['arousal_post_mind_body'] = mind_body
-    compiled_data['arousal_post_feeling'] = feeling
+    return {
+        'arousal_post_mind_body': mind_body,
+        'arousal_post_feeling': feeling,
+    }
 
-    # time taken to complete working memory task
+
+def _get_experiment_time(df):
     time_experiment_ms = int(df.ix[df.last_valid_index()]['time_elapsed'])
-    compiled_data['time_experiment_ms'] = time_experiment_ms
+    return {'time_experiment_ms': time_experiment_ms}
 
-    return compiled_data
+
+def _build_experiment_graph():
+    """Return `graph.VariableGraph` of the steps of compiling experiment
+    data, in the order they were always run, taking the raw data frame
+    (``df``) and a dict of compile parameters (``params``).
+    """
+    graph = _import_script('graph').VariableGraph(inputs=['df', 'params'])
+    rating_names = [
+        name.format(rtype) for rtype in REALTIME_RATING_TYPES
+        for name in ['start_{}', 'peak_{}', 'min_{}', 'end_{}', 'avg_{}',
+                     'prop_{}_ups', 'prop_{}_downs', 'prop_{}_sames',
+                     'auc_{}']]
+
+    # conditions, blocks and block order
+    graph.add('conditions', _get_conditions, ['df'],
+              ['num_trials', 'trials_per_block'])
+    graph.add('blocks', _extract_experiment_blocks, ['df', 'params'])
+    graph.add('num_blocks', lambda blocks: {'num_blocks': len(blocks)},
+              ['blocks'], ['num_blocks'])
+
+    # anticipated/antecedent questions
+    graph.add('anticipated_questions', _get_anticipated_responses, ['df'],
+              [label for label, _ in ANTICIPATED_QUESTIONS_INDEX])
+
+    # SART accuracy and affective reports, by block and over blocks
+    # (ratings don't depend on how trials are scored)
+    graph.add('block_ratings', _summarize_experiment_ratings, ['blocks'])
+    graph.add('rating_measures', _collect_rating_measures, ['block_ratings'])
+    graph.add('block_summaries', _summarize_experiment_blocks,
+              ['blocks', 'block_ratings', 'params'])
+    graph.add('block_variables', _get_block_variables, ['block_summaries'],
+              [r'blk\d+_(?!digit\d|font\d)\w+'])
+    graph.add('block_measures', _collect_block_measures,
+              ['block_summaries'])
+    graph.add('errors', _summarize_errors, ['conditions', 'block_measures'], [
+        'nogo_num_errors', 'nogo_error_prev_rt_avg', 'nogo_error_next_rt_avg',
+        'avg_go_errors', 'avg_nogo_errors', 'avg_anticipation_errors',
+        'avg_accuracy'])
+    graph.add('realtime_ratings', _summarize_realtime_ratings,
+              ['rating_measures', 'params'], rating_names)
+    graph.add('block_accuracy', _summarize_block_accuracy,
+              ['block_measures'], [
+                  'avg_blk_accuracy', 'max_blk_accuracy', 'min_blk_accuracy',
+                  'start_blk_accuracy', 'end_blk_accuracy', 'auc_accuracy'])
+    graph.add('regressions', _summarize_block_regressions,
+              ['block_measures'], ['accuracy_slope', 'accuracy_intercept'])
+    graph.add('rating_regressions', _summarize_rating_regressions,
+              ['rating_measures'], [
+                  '{}_{}'.format(rtype, parameter)
+                  for rtype in REALTIME_RATING_TYPES
+                  for parameter in ['slope', 'intercept']])
+
+    # RT variability, vigilance and windows around events over all blocks'
+    # trials, and optional ex-Gaussian fits and digit/font breakdowns
+    graph.add('sart_blocks', _get_sart_blocks, ['blocks'])
+    graph.add('vigilance', _summarize_experiment_vigilance,
+              ['df', 'sart_blocks', 'params'],
+              ['rt_avg', 'rt_sd', 'rt_cv', r'rolling_\w+'])
+    graph.add('event_windows', _summarize_experiment_event_windows,
+              ['sart_blocks', 'params'], [
+                  '{}_{}_rt_avg'.format(name, direction)
+                  for name in ['go_error', 'anticipation_error', 'probe']
+                  for direction in ['prev', 'next']])
+    graph.add('exgauss', _summarize_experiment_exgauss,
+              ['sart_blocks', 'params'], [r'exg_\w+'])
+    graph.add('breakdowns', _summarize_experiment_breakdowns,
+              ['sart_blocks', 'params'], [
+                  r'digit\d+_\w+', r'font\d+_\w+', r'blk\d+_digit\d+_\w+',
+                  r'blk\d+_font\d+_\w+'])
+
+    # post-experiment evaluation of valence and arousal, and time taken to
+    # complete working memory task
+    graph.add('arousal', _get_post_arousal_ratings, ['df'],
+              ['arousal_post_mind_body', 'arousal_post_feeling'])
+    graph.add('time_experiment', _get_experiment_time, ['df'],
+              ['time_experiment_ms'])
+    return graph
+
+
+def compile_experiment_data(df, blocks=None,
+                            num_survey_questions=NUM_SURVEY_QUESTIONS,
+                            rolling_window=ROLLING_WINDOW_TRIALS,
+                            event_window_prev=EVENT_WINDOW_TRIALS,
+                            event_window_next=EVENT_WINDOW_TRIALS,
+                            exgauss=False, engine=DEFAULT_ENGINE,
+                            breakdowns=False, variables=None, **scoring):
+    """Take pandas dataframe and compile key variables. Return dict.
+
+    Previously extracted SART blocks (see `extract_sart_blocks`) may be passed
+    in to avoid extracting them again. Blocks are scored by the named scoring
+    engine (see `ENGINES`); remaining scoring parameters are passed on to its
+    `summarize_block_performance`. Vigilance is summarized over windows of
+    `rolling_window` trials (see `summarize_vigilance`), and RTs around
+    events over `event_window_prev` trials before and `event_window_next`
+    after them (see `summarize_event_locked_rts`). With `exgauss`,
+    ex-Gaussian distributions are also fit to RTs (see `summarize_exgauss`).
+    With `breakdowns`, performance is also broken down by stimulus digit and
+    font size (see `summarize_breakdowns`).
+
+    With `variables`, only the steps compiling those variables are run (see
+    `get_variable_graphs`); the dict may hold other variables computed
+    along the way. Asking for ex-Gaussian or breakdown variables turns on
+    their steps.
+    """
+    graph = get_variable_graphs()['experiment']
+    if variables is not None:
+        nodes = graph.resolve(variables)
+        exgauss = exgauss or 'exgauss' in nodes
+        breakdowns = breakdowns or 'breakdowns' in nodes
+
+    inputs = {
+        'df': df,
+        'params': {
+            'engine': engine,
+            'num_survey_questions': num_survey_questions,
+            'rolling_window': rolling_window,
+            'event_window_prev': event_window_prev,
+            'event_window_next': event_window_next,
+            'exgauss': exgauss,
+            'breakdowns': breakdowns,
+            'scoring': scoring,
+        },
+    }
+    if blocks is not None:
+        inputs['blocks'] = blocks
+    return graph.evaluate(inputs, variables)
 
 
 DEMOGRAPHICS_INDEX = [
@@ -593,17 +1701,17 @@ def compile_demographic_data(df):
     """Take pandas dataframe and compile key variables. Return dict.
     """
     compiled_data = {}
-    responses = list(df['responses'].dropna().values)
+    responses = get_responses_by_node_id(df)
 
     # demographics
     for label, inid in DEMOGRAPHICS_INDEX:
-        compiled_data[label] = get_response_via_node_id(df, inid)
+        compiled_data[label] = _format_survey_response(responses.get(inid))
 
     # boredom scales
     for scale_idx in [SMS_INDEX, STATE_BOREDOM_INDEX]:
         for label, inid in scale_idx:
-            compiled_data[label] = get_response_via_node_id(
-                df, inid, is_likert=True)
+            compiled_data[label] = _format_survey_response(
+                responses.get(inid), is_likert=True)
 
     # post-working memory task delay
     delay_b4_retrospect_ms = None
@@ -632,104 +1740,2276 @@ def compile_retrospective_data(df):
     """Take pandas dataframe and compile key variables. Return dict.
     """
     compiled_data = {}
-    responses = list(df['responses'].dropna().values)
+    responses = get_responses_by_node_id(df)
 
     # retrospective questions
     for label, inid in TLX_SCALE_INDEX:
-        compiled_data[label] = get_response_via_node_id(
-            df, inid, is_likert=True)
+        compiled_data[label] = _format_survey_response(
+            responses.get(inid), is_likert=True)
 
     return compiled_data
 
 
-def main():
-    # collect lists of raw data CSVs
-    raw_data_csvs = {}
-    for exp_stage in ['practice', 'experiment', 'follow_up']:
-        raw_data_csvs[exp_stage] = get_csv_paths(DATA_DIR, exp_stage)
+def _compile_follow_up_retrospective(df, passed_practice):
+    # (retrospective questions are only asked after passing practice)
+    return compile_retrospective_data(df) if passed_practice else {}
 
-    # create list of compiled participant data
-    compiled_participants = []
-    for practice_csv in tqdm(raw_data_csvs['practice']):
-        participant = {
-            'missing_data': False
+
+def compile_follow_up_data(df, passed_practice=True, variables=None):
+    """Take pandas dataframe and whether the participant passed practice, and
+    compile key variables (only those needed for `variables`, if given; see
+    `get_variable_graphs`). Return dict.
+    """
+    return get_variable_graphs()['follow_up'].evaluate(
+        {'df': df, 'passed_practice': passed_practice}, variables)
+
+
+def _build_variable_graphs():
+    graph_module = _import_script('graph')
+    # practice data is always compiled (for participant IDs and whether they
+    # passed practice), so its graph is only used to name its variables
+    practice_graph = graph_module.VariableGraph(inputs=['df', 'engine'])
+    practice_graph.add('practice', compile_practice_data, ['df', 'engine'], [
+        'id', 'arousal_baseline_mind_body', 'arousal_baseline_feeling',
+        'passed_practice', 'time_practice_blk1_ms',
+        r'time_practice_blk2_\d+_ms', 'num_practice_blk2s',
+        'time_practice_ms'])
+
+    follow_up_graph = graph_module.VariableGraph(
+        inputs=['df', 'passed_practice'])
+    follow_up_graph.add(
+        'demographics', compile_demographic_data, ['df'],
+        [label for label, _ in DEMOGRAPHICS_INDEX + SMS_INDEX +
+         STATE_BOREDOM_INDEX] +
+        ['time_delay_b4_retrospect_ms', 'time_follow_up_ms'])
+    follow_up_graph.add(
+        'retrospective', _compile_follow_up_retrospective,
+        ['df', 'passed_practice'],
+        [label for label, _ in TLX_SCALE_INDEX])
+
+    return OrderedDict([
+        ('practice', practice_graph),
+        ('experiment', _build_experiment_graph()),
+        ('follow_up', follow_up_graph),
+    ])
+
+
+_VARIABLE_GRAPHS = {}
+
+
+def get_variable_graphs():
+    """Return ordered dict of the variable dependency graphs (see
+    ``graph.py``) of each experiment stage's compiled variables. Compiling a
+    subset of variables only runs the stages, and steps within them, that
+    they depend on.
+    """
+    if not _VARIABLE_GRAPHS:
+        _VARIABLE_GRAPHS.update(graphs=_build_variable_graphs())
+    return _VARIABLE_GRAPHS['graphs']
+
+
+def check_variables(variables):
+    """Take list of compiled variable names. Raise ValueError naming any that
+    are not compiled by any stage.
+    """
+    graphs = get_variable_graphs().values()
+    unknown = [
+        v for v in variables if v != 'missing_data' and
+        not any(graph.get_provider(v) for graph in graphs)]
+    if unknown:
+        raise ValueError('Unknown variables: {}'.format(', '.join(unknown)))
+
+
+# compiled variable column groups
+FIRST_COLUMNS, MIDDLE_COLUMNS, LAST_COLUMNS = 0, 1, 2
+
+Variable = namedtuple('Variable', ['name', 'dtype', 'group', 'order'])
+
+
+class VariableRegistry(object):
+    """Define each compiled output variable once, with its name, dtype
+    ('bool', 'int', 'float' or 'str') and column position.
+
+    Columns are positioned by group: first columns and last (demographic)
+    columns keep their registration order, while the remaining columns are
+    ordered by name. Families of numbered variables (e.g., per-block
+    summaries) are registered on demand.
+    """
+
+    def __init__(self):
+        self.variables = []
+        self._indices = {}
+        self._group_sizes = {}
+        self._families = {}
+        self._family_names = {}
+
+    def __len__(self):
+        return len(self.variables)
+
+    def register(self, name, dtype, group=MIDDLE_COLUMNS):
+        """Register variable (if not already registered). Return its index.
+        """
+        if name in self._indices:
+            return self._indices[name]
+        if group == MIDDLE_COLUMNS:
+            order = name
+        else:
+            order = self._group_sizes.get(group, 0)
+        self._group_sizes[group] = self._group_sizes.get(group, 0) + 1
+
+        self._indices[name] = len(self.variables)
+        self.variables.append(Variable(name, dtype, group, order))
+        return self._indices[name]
+
+    def register_family(self, family, template, variables):
+        """Register a family of numbered variables. `template` formats a
+        variable name from ``num`` and ``key``; `variables` is a list of
+        (key, dtype) tuples.
+        """
+        pattern = re.escape(template)
+        for field, regex in [('num', r'(\d+)'), ('key', r'(.+)')]:
+            pattern = pattern.replace(re.escape('{' + field + '}'), regex)
+        self._families[family] = (
+            template, OrderedDict(variables), re.compile(pattern + '$'))
+
+    def get_family_names(self, family, num):
+        """Take family name and number. Register the numbered variables.
+        Return dict of variable names, keyed by family key.
+        """
+        cache_key = (family, num)
+        if cache_key not in self._family_names:
+            template, variables, _ = self._families[family]
+            names = {}
+            for key, dtype in variables.items():
+                names[key] = template.format(num=num, key=key)
+                self.register(names[key], dtype)
+            self._family_names[cache_key] = names
+        return self._family_names[cache_key]
+
+    def get_family_name(self, family, num, key):
+        """Take family name, number and key. Return variable name.
+        """
+        names = self.get_family_names(family, num)
+        if key not in names:
+            template = self._families[family][0]
+            return template.format(num=num, key=key)
+        return names[key]
+
+    def index(self, name, value=None):
+        """Take variable name (and an example value, used to infer the dtype
+        of unregistered variables). Return column index.
+        """
+        try:
+            return self._indices[name]
+        except KeyError:
+            pass
+
+        for family, (template, variables, regex) in self._families.items():
+            match = regex.match(name)
+            if match and match.group(2) in variables:
+                self.get_family_names(family, int(match.group(1)))
+                return self._indices[name]
+
+        return self.register(name, _infer_dtype(value))
+
+    def get_variable(self, index):
+        return self.variables[index]
+
+    def sort_indices(self, indices):
+        """Take column indices. Return them sorted in column order.
+        """
+        return sorted(
+            indices, key=lambda i: (self.variables[i].group,
+                                    self.variables[i].order))
+
+    def sort_names(self, names):
+        """Take variable names. Return them sorted in column order.
+        """
+        indices = self.sort_indices([self.index(name) for name in names])
+        return [self.variables[i].name for i in indices]
+
+
+def _infer_dtype(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    if isinstance(value, numbers.Integral):
+        return 'int'
+    if isinstance(value, numbers.Real):
+        return 'float'
+    return 'str'
+
+
+def _register_compiled_variables(registry):
+    """Take variable registry and register all compiled variables.
+    """
+    first_columns = [
+        ('id', 'str'),
+        ('passed_practice', 'bool'),
+        ('num_practice_blk2s', 'int'),
+        ('missing_data', 'bool'),
+        ('practice_condition', 'str'),
+        ('num_trials', 'int'),
+        ('trials_per_block', 'int'),
+        ('num_blocks', 'int'),
+    ]
+    for name, dtype in first_columns:
+        registry.register(name, dtype, FIRST_COLUMNS)
+
+    # practice
+    practice_variables = [
+        ('arousal_baseline_mind_body', 'str'),
+        ('arousal_baseline_feeling', 'str'),
+        ('time_practice_blk1_ms', 'int'),
+        ('time_practice_ms', 'int'),
+    ]
+    registry.register_family(
+        'time_practice_blk2', 'time_practice_blk2_{num}_{key}',
+        [('ms', 'int')])
+
+    # experiment
+    experiment_variables = [
+        ('forecasted_enjoyment', 'int'),
+        ('forecasted_performance', 'int'),
+        ('forecasted_effort', 'int'),
+        ('forecasted_discomfort', 'int'),
+        ('forecasted_fatigue', 'int'),
+        ('forecasted_motivation', 'int'),
+        ('antecedent_boredom', 'int'),
+        ('nogo_num_errors', 'int'),
+        ('nogo_error_prev_rt_avg', 'float'),
+        ('nogo_error_next_rt_avg', 'float'),
+        ('go_error_prev_rt_avg', 'float'),
+        ('go_error_next_rt_avg', 'float'),
+        ('anticipation_error_prev_rt_avg', 'float'),
+        ('anticipation_error_next_rt_avg', 'float'),
+        ('probe_prev_rt_avg', 'float'),
+        ('probe_next_rt_avg', 'float'),
+        ('avg_go_errors', 'float'),
+        ('avg_nogo_errors', 'float'),
+        ('avg_anticipation_errors', 'float'),
+        ('avg_accuracy', 'float'),
+        ('avg_blk_accuracy', 'float'),
+        ('max_blk_accuracy', 'float'),
+        ('min_blk_accuracy', 'float'),
+        ('start_blk_accuracy', 'float'),
+        ('end_blk_accuracy', 'float'),
+        ('auc_accuracy', 'float'),
+        ('arousal_post_mind_body', 'str'),
+        ('arousal_post_feeling', 'str'),
+        ('time_experiment_ms', 'int'),
+    ]
+    for rtype in ['effort', 'discomfort', 'boredom']:
+        experiment_variables += [
+            ('start_{}'.format(rtype), 'int'),
+            ('peak_{}'.format(rtype), 'int'),
+            ('min_{}'.format(rtype), 'int'),
+            ('end_{}'.format(rtype), 'int'),
+            ('avg_{}'.format(rtype), 'float'),
+            ('prop_{}_ups'.format(rtype), 'float'),
+            ('prop_{}_downs'.format(rtype), 'float'),
+            ('prop_{}_sames'.format(rtype), 'float'),
+            ('auc_{}'.format(rtype), 'float'),
+        ]
+    for measure_name in ['accuracy', 'effort', 'discomfort', 'boredom']:
+        experiment_variables += [
+            ('{}_slope'.format(measure_name), 'float'),
+            ('{}_intercept'.format(measure_name), 'float'),
+        ]
+    experiment_variables += [
+        ('exg_mu', 'float'),
+        ('exg_sigma', 'float'),
+        ('exg_tau', 'float'),
+        ('rt_avg', 'float'),
+        ('rt_sd', 'float'),
+        ('rt_cv', 'float'),
+    ]
+    for measure_name in ['rt', 'rt_cv', 'accuracy']:
+        experiment_variables += [
+            ('rolling_{}_start'.format(measure_name), 'float'),
+            ('rolling_{}_end'.format(measure_name), 'float'),
+            ('rolling_{}_slope'.format(measure_name), 'float'),
+        ]
+    registry.register_family('exg_blk', 'exg_blk{num}_{key}', [
+        ('mu', 'float'),
+        ('sigma', 'float'),
+        ('tau', 'float'),
+    ])
+    registry.register_family('digit', 'digit{num}_{key}', BREAKDOWN_METRICS)
+    registry.register_family(
+        'font', 'font{num}_{key}', BREAKDOWN_METRICS + [('px', 'float')])
+    registry.register_family('blk_digit', 'blk{num}_digit{key}', [
+        ('{}_{}'.format(digit, metric), dtype)
+        for digit in STIMULUS_DIGITS for metric, dtype in BREAKDOWN_METRICS])
+    registry.register_family('blk_font', 'blk{num}_font{key}', [
+        ('{}_{}'.format(rank, metric), dtype)
+        for rank in range(1, NUM_FONT_SIZES + 1)
+        for metric, dtype in BREAKDOWN_METRICS])
+    registry.register_family('blk', 'blk{num}_{key}', [
+        ('num_trials', 'int'),
+        ('anticipated_num_errors', 'int'),
+        ('anticipated', 'float'),
+        ('accuracy', 'float'),
+        ('go_num_errors', 'int'),
+        ('go_errors', 'float'),
+        ('nogo_num_errors', 'int'),
+        ('nogo_errors', 'float'),
+        ('rt_avg', 'float'),
+        ('rt_sd', 'float'),
+        ('rt_cv', 'float'),
+        ('nogo_prev4_avg', 'float'),
+        ('nogo_num_prev4_rts', 'int'),
+        ('nogo_next4_avg', 'float'),
+        ('nogo_num_next4_rts', 'int'),
+        ('effort', 'int'),
+        ('discomfort', 'int'),
+        ('boredom', 'int'),
+    ])
+
+    # follow up
+    follow_up_variables = [
+        ('time_delay_b4_retrospect_ms', 'int'),
+        ('time_follow_up_ms', 'int'),
+    ]
+
+    for name, dtype in (practice_variables + experiment_variables +
+                        follow_up_variables):
+        registry.register(name, dtype)
+
+    # demographic and scale responses come last
+    for index in [DEMOGRAPHICS_INDEX, SMS_INDEX, STATE_BOREDOM_INDEX,
+                  TLX_SCALE_INDEX]:
+        for name, inid in index:
+            registry.register(name, 'str', LAST_COLUMNS)
+
+
+VARIABLES = VariableRegistry()
+_register_compiled_variables(VARIABLES)
+
+
+class RowBuffer(object):
+    """Columnar, typed storage for compiled participant rows, preallocated
+    for `num_rows` rows. Rows are filled from compiled data dicts (see
+    `set_row`), each value written by its variable's column index (see
+    `VariableRegistry`); the buffer types and orders the columns, while the
+    dicts are still built by the `compile_*` functions.
+
+    Integer columns are kept as objects, so their values are written as
+    integers even when some rows are missing. The values seen in each column
+    are tracked (`non_integral` and `non_numeric` column indices), so a
+    column with non-numeric values falls back to objects rather than failing.
+    """
+
+    def __init__(self, num_rows, registry=VARIABLES):
+        self.num_rows = num_rows
+        self.registry = registry
+        self.columns = {}
+        self.fill_counts = {}
+        self.non_integral = set()
+        self.non_numeric = set()
+
+    def _new_column(self, dtype):
+        if dtype == 'float':
+            return np.full(self.num_rows, np.nan)
+        return np.empty(self.num_rows, dtype=object)
+
+    def set(self, row, index, value):
+        column = self.columns.get(index)
+        if column is None:
+            dtype = self.registry.get_variable(index).dtype
+            column = self.columns[index] = self._new_column(dtype)
+            self.fill_counts[index] = 0
+        if value is None:
+            return
+        if not isinstance(value, (numbers.Number, np.bool_)):
+            self.non_numeric.add(index)
+            if column.dtype != object:
+                column = self.columns[index] = column.astype(object)
+        elif isinstance(value, (float, np.floating)):
+            self.non_integral.add(index)
+        column[row] = value
+        self.fill_counts[index] += 1
+
+    def set_row(self, row, compiled_data):
+        for name, value in compiled_data.items():
+            self.set(row, self.registry.index(name, value), value)
+
+    def get_column(self, index, num_rows, is_complete, non_integral=None,
+                   non_numeric=None):
+        """Take column index, number of rows, whether the column has a value
+        in every row of the data set and, for a buffer holding part of the
+        data set, the sets of non-integral and non-numeric column indices of
+        the complete data set. Return array of column values with the dtype
+        pandas would give the complete column.
+        """
+        if non_integral is None:
+            non_integral = self.non_integral
+        if non_numeric is None:
+            non_numeric = self.non_numeric
+        variable = self.registry.get_variable(index)
+        column = self.columns.get(index)
+        if column is None:
+            column = self._new_column(variable.dtype)
+        column = column[:num_rows]
+
+        if index in non_numeric:
+            return column.astype(object)
+        if variable.dtype == 'int':
+            if index in non_integral:
+                return column.astype(float)
+            if is_complete:
+                return column.astype(np.int64)
+        if is_complete and variable.dtype == 'bool':
+            return column.astype(bool)
+        return column
+
+
+def get_scoring_variants(grid):
+    """Take dict mapping scoring parameter names (see `SCORING_DEFAULTS`) to
+    lists of values. Return list of scoring parameter dicts, one per
+    combination; parameters missing from the grid keep their defaults.
+    """
+    unknown_params = set(grid) - set(SCORING_DEFAULTS)
+    if unknown_params:
+        raise ValueError('Unknown scoring parameter(s): {}'.format(
+            ', '.join(sorted(unknown_params))))
+
+    param_names = sorted(SCORING_DEFAULTS)
+    param_values = [
+        list(grid.get(name, [SCORING_DEFAULTS[name]]))
+        for name in param_names]
+    return [
+        dict(zip(param_names, combination))
+        for combination in itertools.product(*param_values)]
+
+
+# scoring parameters (see `SCORING_DEFAULTS`) that the steps of compiling
+# experiment data taking compile parameters depend on (the other steps
+# depend on those of the steps they take; see `_build_experiment_graph`)
+STEP_SCORING_PARAMS = {
+    'blocks': ['num_survey_questions'],
+    'block_summaries': [
+        'anticipation_threshold', 'max_adjacent_rows', 'nogo_stimulus'],
+    'realtime_ratings': [],
+    'vigilance': ['anticipation_threshold', 'rolling_window'],
+    'event_windows': [
+        'anticipation_threshold', 'event_window_next', 'event_window_prev',
+        'nogo_stimulus'],
+    'exgauss': ['anticipation_threshold'],
+    'breakdowns': ['anticipation_threshold', 'nogo_stimulus'],
+}
+
+
+def get_step_scoring_params(graph):
+    """Take experiment `graph.VariableGraph`. Return dict of sorted lists of
+    the scoring parameters each of its steps depends on, directly or through
+    the steps it takes. Steps taking compile parameters that aren't in
+    `STEP_SCORING_PARAMS` depend on all of them.
+    """
+    step_params = {}
+    for name, node in graph.nodes.items():
+        if 'params' in node.requires:
+            params = set(STEP_SCORING_PARAMS.get(name, SCORING_DEFAULTS))
+        else:
+            params = set()
+        for requirement in node.requires:
+            params.update(step_params.get(requirement, ()))
+        step_params[name] = sorted(params)
+    return step_params
+
+
+def sweep_experiment_data(df, variants, engine=DEFAULT_ENGINE):
+    """Take pandas dataframe and list of scoring parameter dicts (see
+    `get_scoring_variants`) and compile key variables for every variant.
+    Return list of dicts, in variant order.
+
+    Each step of compiling (see `get_variable_graphs`) is run once per
+    combination of the scoring parameters it depends on (see
+    `get_step_scoring_params`), and shared by the variants with those
+    values: e.g., blocks are extracted and ratings summarized once per
+    block segmentation, and trials are only rescored by the steps
+    depending on the parameters that vary.
+    """
+    graph = get_variable_graphs()['experiment']
+    step_params = get_step_scoring_params(graph)
+    step_values = {}
+    compiled_variants = []
+    for variant in variants:
+        variant = dict(SCORING_DEFAULTS, **variant)
+        step_keys = dict(
+            (name, (name,) + tuple(variant[param] for param in params))
+            for name, params in step_params.items())
+        inputs = {
+            'df': df,
+            'params': {
+                'engine': engine,
+                'num_survey_questions': variant['num_survey_questions'],
+                'rolling_window': variant['rolling_window'],
+                'event_window_prev': variant['event_window_prev'],
+                'event_window_next': variant['event_window_next'],
+                'exgauss': False,
+                'breakdowns': False,
+                'scoring': dict(
+                    (param, variant[param]) for param in [
+                        'anticipation_threshold', 'max_adjacent_rows',
+                        'nogo_stimulus']),
+            },
         }
+        for name, key in step_keys.items():
+            if key in step_values:
+                inputs[name] = step_values[key]
+
+        values = {}
+        compiled_variants.append(graph.evaluate(inputs, values=values))
+        for name, key in step_keys.items():
+            step_values[key] = values[name]
+    return compiled_variants
+
+
+def sweep_anticipation_thresholds(df, variants, engine=DEFAULT_ENGINE):
+    """Take pandas dataframe and list of scoring parameter dicts (see
+    `get_scoring_variants`) differing only by anticipation threshold, and
+    compile block anticipation and accuracy variables (see
+    `compile_anticipation_thresholds`) for every variant, scoring all the
+    thresholds in one pass over each block's trials. Return list of dicts,
+    in variant order.
+    """
+    if not variants:
+        return []
+    variants = [dict(SCORING_DEFAULTS, **variant) for variant in variants]
+    thresholds = [variant['anticipation_threshold'] for variant in variants]
+    num_questions = variants[0]['num_survey_questions']
+    blocks = get_engine(engine).extract_sart_blocks(
+        df, with_survey=True, num_survey_questions=num_questions)
+    compiled = compile_anticipation_thresholds(
+        df, sorted(set(thresholds)), blocks,
+        nogo_stimulus=variants[0]['nogo_stimulus'])
+    return [compiled[threshold] for threshold in thresholds]
+
+
+def _sweep_participant_task(task):
+    """Take tuple of experiment CSV path, list of scoring variants, scoring
+    engine name and whether to only compile accuracy variables. Return
+    tuple of participant ID, list of compiled variant dicts (see
+    `sweep_experiment_data` and `sweep_anticipation_thresholds`) and failure
+    dict (None, unless compiling raised an exception, when the others are
+    None).
+    """
+    experiment_csv, variants, engine, accuracy_only = task
+    sweep = sweep_anticipation_thresholds if accuracy_only else \
+        sweep_experiment_data
+    try:
+        df = get_csv_as_dataframe(experiment_csv)
+        return (df['participant_id'].values[0],
+                sweep(df, variants, engine), None)
+    except Exception as e:
+        e.source_csv = experiment_csv
+        return None, None, get_failure(experiment_csv, e)
+
+
+def compile_sweep(data_dir, grid, engine=DEFAULT_ENGINE, workers=1,
+                  accuracy_only=False):
+    """Take base data directory (or archive), scoring parameter grid,
+    scoring engine name and number of worker processes. Compile each
+    participant's experiment data, read once, under every scoring variant.
+    Return tuple of long pandas dataframe keyed by `variant` and participant
+    `id`, and list of failure dicts (see `get_failure`; as no practice data
+    is compiled, their ``practice_csv`` is the experiment CSV).
+
+    With `accuracy_only`, only block anticipation and accuracy variables,
+    and their averages, are compiled, for a grid of anticipation thresholds
+    alone (see `sweep_anticipation_thresholds`).
+
+    Each participant is compiled in isolation: one that fails is left out
+    of the dataframe, and the others carry on.
+    """
+    get_engine(engine)
+    if accuracy_only and set(grid) - set(['anticipation_threshold']):
+        raise ValueError(
+            'Only anticipation_threshold can be swept for accuracy alone')
+    variants = get_scoring_variants(grid)
+    param_names = sorted(SCORING_DEFAULTS)
+    experiment_csvs = sorted(find_raw_data_csvs(data_dir)['experiment'])
+    tasks = [(path, variants, engine, accuracy_only)
+             for path in experiment_csvs]
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(_sweep_participant_task, tasks)
+    else:
+        results = (_sweep_participant_task(task) for task in tasks)
+
+    compiled_rows = []
+    failures = []
+    try:
+        for participant_id, compiled_variants, failure in tqdm(
+                results, total=len(tasks)):
+            if failure:
+                failures.append(failure)
+                continue
+            for i, compiled_data in enumerate(compiled_variants):
+                row = {'variant': i, 'id': participant_id}
+                row.update(variants[i])
+                row.update(compiled_data)
+                compiled_rows.append(row)
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    sweep_df = pd.DataFrame.from_dict(compiled_rows)
+    first_columns = ['variant'] + param_names + ['id']
+    other_columns = [
+        c for c in sweep_df.columns.values if c not in first_columns]
+    return sweep_df.reindex(columns=first_columns + other_columns), failures
+
+
+def _import_script(name):
+    """Take the name of a sibling module in ``scripts`` and import it, whether
+    this module is imported from the package or run as a script.
+    """
+    try:
+        return importlib.import_module('scripts.{}'.format(name))
+    except ImportError:
+        return importlib.import_module(name)
+
+
+def _get_stage_csv_paths(data_dir, exp_stage, participant_id):
+    """Take base data directory, experiment stage and participant ID. Return
+    list of the possible paths of the participant's CSV for that stage (one
+    per CSV suffix, see ``sources.py``).
+    """
+    return [
+        os.path.join(data_dir, exp_stage, participant_id + suffix)
+        for suffix in _import_script('sources').CSV_SUFFIXES]
+
 
+def get_study_name(data_dir):
+    """Take base data directory (or archive). Return its name, without any
+    archive suffix (e.g., ``study`` for ``study.tar.gz``).
+    """
+    sources = _import_script('sources')
+    name = os.path.basename(os.path.normpath(data_dir))
+    if sources.is_archive(data_dir):
+        for suffix in sources.ARCHIVE_SUFFIXES:
+            if name.lower().endswith(suffix):
+                return name[:-len(suffix)]
+    return name
+
+
+def _get_default_output_path(data_dir):
+    """Take base data directory (or archive). Return the default compiled
+    output path: ``compiled.csv`` in the data directory, or beside an
+    archive (e.g., ``study-compiled.csv`` for ``study.tar``).
+    """
+    if _import_script('sources').is_archive(data_dir):
+        return os.path.join(
+            os.path.dirname(data_dir),
+            '{}-compiled.csv'.format(get_study_name(data_dir)))
+    return os.path.join(data_dir, 'compiled.csv')
+
+
+def compile_participant(practice_csv, raw_data_csvs, data_dir=DATA_DIR,
+                        engine=DEFAULT_ENGINE, exgauss=False,
+                        breakdowns=False, variables=None):
+    """Take a practice CSV path and dict of raw data CSV paths (keyed by
+    experiment stage) and compile all of the participant's data with the
+    named scoring engine (and, with `exgauss`, ex-Gaussian RT fits, and
+    with `breakdowns`, performance by digit and font size). Return dict.
+
+    With a list of `variables`, only those (and the participant ID) are
+    compiled: stages none of them depend on aren't read (see
+    `get_variable_graphs`).
+    """
+    graphs = get_variable_graphs()
+    participant = {
+        'missing_data': False
+    }
+
+    # (exceptions are tagged with the raw data file being compiled)
+    source_csv = practice_csv
+    try:
         # compile practice data
         practice_df = get_csv_as_dataframe(practice_csv)
-        compiled_practice_data = compile_practice_data(practice_df)
+        compiled_practice_data = compile_practice_data(practice_df, engine)
         participant.update(compiled_practice_data)
 
         # compile experimental and follow up data
         # note: checks to ensure that assumed CSV files exist
+        sources = _import_script('sources')
         for exp_stage in ['experiment', 'follow_up']:
-            assumed_csv_path = os.path.join(
-                DATA_DIR, exp_stage, '{}.csv'.format(participant['id']))
+            stage_csv_paths = [
+                path for path in _get_stage_csv_paths(
+                    data_dir, exp_stage, participant['id'])
+                if path in raw_data_csvs[exp_stage] and sources.exists(path)]
 
-            if assumed_csv_path in raw_data_csvs[exp_stage] and \
-                    os.path.exists(assumed_csv_path):
-                stage_df = get_csv_as_dataframe(assumed_csv_path)
+            if stage_csv_paths:
+                if not graphs[exp_stage].provides_any(variables):
+                    continue
+                source_csv = stage_csv_paths[0]
+                stage_df = get_csv_as_dataframe(source_csv)
 
                 if exp_stage == 'experiment':
-                    experiment_data = compile_experiment_data(stage_df)
+                    experiment_data = compile_experiment_data(
+                        stage_df, exgauss=exgauss, engine=engine,
+                        breakdowns=breakdowns, variables=variables)
                     participant.update(experiment_data)
                 elif exp_stage == 'follow_up':
-                    demographics = compile_demographic_data(stage_df)
-                    participant.update(demographics)
-                    if participant['passed_practice']:
-                        retrospective = compile_retrospective_data(stage_df)
-                        participant.update(retrospective)
+                    follow_up_data = compile_follow_up_data(
+                        stage_df, participant['passed_practice'], variables)
+                    participant.update(follow_up_data)
 
             elif (exp_stage == 'experiment' and
                     participant['passed_practice']) or \
                     exp_stage == 'follow_up':
                 participant['missing_data'] = True
+    except Exception as e:
+        e.source_csv = source_csv
+        raise
 
-        # append compiled participant data to master list
-        compiled_participants.append(participant)
+    if variables is not None:
+        kept = set(variables) | set(['id'])
+        participant = dict(
+            (k, v) for k, v in participant.items() if k in kept)
+    return participant
 
-    # create unordered data frame
-    compiled_df = pd.DataFrame.from_dict(compiled_participants)
 
-    # organize variable names
-    compiled_var_names = list(compiled_df.columns.values)
-    ordered_columns = []
+def get_ordered_columns(var_names):
+    """Take list of compiled variable names. Return list of variable names in
+    output order.
+    """
+    return VARIABLES.sort_names(var_names)
 
-    first_columns = [
-        'id',
-        'passed_practice',
-        'num_practice_blk2s',
-        'missing_data',
-        'practice_condition',
-        'num_trials',
-        'trials_per_block',
-        'num_blocks',
-    ]
-    for var_name in first_columns:
-        if var_name in compiled_var_names:
-            var_index = compiled_var_names.index(var_name)
-            ordered_columns.append(compiled_var_names.pop(var_index))
-
-    demographic_columns = []
-    indices = [
-        DEMOGRAPHICS_INDEX,
-        SMS_INDEX,
-        STATE_BOREDOM_INDEX,
-        TLX_SCALE_INDEX
-    ]
-    for index in indices:
-        for var_name, idx in index:
-            if var_name in compiled_var_names:
-                var_index = compiled_var_names.index(var_name)
-                demographic_columns.append(compiled_var_names.pop(var_index))
 
-    ordered_columns += compiled_var_names + demographic_columns
-    ordered_compiled_df = compiled_df.reindex_axis(ordered_columns, axis=1)
+def _get_rss_bytes():
+    """Return the current resident set size of this process in bytes, or the
+    peak resident set size where the current size is unavailable.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            rss_pages = int(statm.read().split()[1])
+        return rss_pages * resource.getpagesize()
+    except (IOError, OSError, IndexError, ValueError, AttributeError):
+        return _get_peak_rss_bytes()
+
+
+def _get_peak_rss_bytes():
+    """Return the peak resident set size of this process in bytes (None if
+    unavailable on this platform).
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, kilobytes elsewhere
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _format_mb(num_bytes):
+    if num_bytes is None:
+        return 'n/a'
+    return '{:.1f} MB'.format(num_bytes / 1024.0 / 1024.0)
+
+
+class MemoryMonitor(object):
+    """Measure the memory used to compile each participant, and check the
+    process against an optional memory budget.
+
+    Allocations are measured with ``tracemalloc`` where available (Python
+    3.4+), otherwise approximated by resident set size growth. They are
+    measured by the process compiling the participant (a worker process,
+    with several workers; see `_compile_participant_task`), and recorded
+    with `end_participant`.
+    """
+
+    def __init__(self, budget_mb=None):
+        self.budget_bytes = None
+        if budget_mb:
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.participants = []
+        self._rss_before = None
+        self._started_tracing = False
+
+    def start(self):
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def start_participant(self):
+        self._rss_before = _get_rss_bytes()
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.clear_traces()
+
+    def measure_participant(self):
+        """Return the bytes allocated by this process since
+        `start_participant` (None if they can't be measured).
+        """
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[1]
+        rss_after = _get_rss_bytes()
+        if rss_after is not None and self._rss_before is not None:
+            return max(0, rss_after - self._rss_before)
+        return None
+
+    def end_participant(self, participant_id, paths, allocated_bytes):
+        """Take participant ID, list of the participant's raw data CSV paths
+        and the bytes allocated to compile them (see `measure_participant`).
+        """
+        self.participants.append({
+            'id': participant_id,
+            'paths': list(paths),
+            'allocated_bytes': allocated_bytes,
+            'rss_bytes': _get_rss_bytes(),
+        })
+
+    def is_over_budget(self):
+        if self.budget_bytes is None:
+            return False
+        rss = _get_rss_bytes()
+        return rss is not None and rss > self.budget_bytes
+
+    def get_heaviest_participants(self, num_participants=5):
+        measured = [
+            p for p in self.participants if p['allocated_bytes'] is not None]
+        measured.sort(key=lambda p: p['allocated_bytes'], reverse=True)
+        return measured[:num_participants]
+
+    def report(self, num_participants=5):
+        """Return a human-readable memory report.
+        """
+        lines = ['Peak RSS: {}'.format(_format_mb(_get_peak_rss_bytes()))]
+        if self.budget_bytes is not None:
+            lines.append('Memory budget: {}'.format(
+                _format_mb(self.budget_bytes)))
+
+        heaviest = self.get_heaviest_participants(num_participants)
+        if heaviest:
+            lines.append('Heaviest participants:')
+        for p in heaviest:
+            lines.append('  {}: {} ({})'.format(
+                p['id'], _format_mb(p['allocated_bytes']),
+                ', '.join(p['paths'])))
+        return '\n'.join(lines)
+
+
+class CompiledResults(object):
+    """Collect compiled participant data in a `RowBuffer`, spilling it to disk
+    on request, and write it to a single CSV.
+
+    Rows may arrive in any order (e.g., as worker processes finish them),
+    each with its position in the output; they are written in position
+    order (positions of participants that failed to compile are skipped).
+    """
+
+    def __init__(self, num_rows, registry=VARIABLES):
+        self.num_rows = num_rows
+        self.registry = registry
+        self.num_compiled = 0
+        self.spill_paths = []
+        self.buffer = RowBuffer(num_rows, registry)
+        self._buffer_start = 0
+        self._spill_dir = None
+        self._fill_counts = {}
+        self._non_integral = set()
+        self._non_numeric = set()
+        self._positions = []
+        self._spilled_positions = []
+
+    def append(self, participant, position=None):
+        """Take compiled participant data dict and its position in the
+        output (by default, after the rows appended so far).
+        """
+        if self.num_compiled >= self.num_rows:
+            raise ValueError('More rows appended than were allocated')
+        if position is None:
+            position = self.num_compiled
+        row = self.num_compiled - self._buffer_start
+        self.buffer.set_row(row, participant)
+        self._positions.append(position)
+        self.num_compiled += 1
+
+    def _count_buffer(self):
+        for index, count in self.buffer.fill_counts.items():
+            self._fill_counts[index] = self._fill_counts.get(index, 0) + count
+        self._non_integral |= self.buffer.non_integral
+        self._non_numeric |= self.buffer.non_numeric
+
+    def _get_temp_path(self, name):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='jssart-compile-')
+        return os.path.join(self._spill_dir, name)
+
+    def spill(self, min_rows=1):
+        """Move compiled rows held in memory to a temporary file, if there are
+        at least `min_rows` of them.
+        """
+        num_buffered = self.num_compiled - self._buffer_start
+        if not num_buffered or num_buffered < min_rows:
+            return
+        spill_path = self._get_temp_path(
+            '{}.pickle'.format(len(self.spill_paths)))
+        self.buffer.columns = dict(
+            (i, c[:num_buffered]) for i, c in self.buffer.columns.items())
+        with open(spill_path, 'wb') as spill_file:
+            pickle.dump((num_buffered, self.buffer), spill_file,
+                        pickle.HIGHEST_PROTOCOL)
+        self._count_buffer()
+        self.spill_paths.append(spill_path)
+        self._spilled_positions.append(self._positions)
+
+        self._buffer_start = self.num_compiled
+        self._positions = []
+        self.buffer = RowBuffer(
+            self.num_rows - self.num_compiled, self.registry)
+
+    def iter_chunks(self):
+        """Yield tuples of number of rows, list of their positions and
+        `RowBuffer`, in the order they were appended.
+        """
+        for spill_path, positions in zip(
+                self.spill_paths, self._spilled_positions):
+            with open(spill_path, 'rb') as spill_file:
+                num_rows, buffer = pickle.load(spill_file)
+            yield num_rows, positions, buffer
+        num_buffered = self.num_compiled - self._buffer_start
+        if num_buffered:
+            yield num_buffered, self._positions, self.buffer
+
+    def get_column_indices(self):
+        fill_counts = dict(self._fill_counts)
+        for index, count in self.buffer.fill_counts.items():
+            fill_counts[index] = fill_counts.get(index, 0) + count
+        return fill_counts
+
+    def get_ordered_columns(self):
+        indices = self.registry.sort_indices(self.get_column_indices())
+        return [self.registry.get_variable(i).name for i in indices]
+
+    def to_csv(self, path):
+        """Write compiled data to CSV, in position order. Spilled rows are
+        written chunk by chunk (each sorted, then merged), so the complete
+        data set is never held in memory at once.
+        """
+        fill_counts = self.get_column_indices()
+        indices = self.registry.sort_indices(fill_counts)
+        # (columns are typed by the values of every chunk)
+        non_integral = self._non_integral | self.buffer.non_integral
+        non_numeric = self._non_numeric | self.buffer.non_numeric
+        names = [self.registry.get_variable(i).name for i in indices]
+        # (rows are numbered in position order)
+        all_positions = sorted(itertools.chain(
+            self._positions, *self._spilled_positions))
+        row_numbers = dict(
+            (position, i) for i, position in enumerate(all_positions))
+
+        def get_chunk_df(num_rows, positions, buffer):
+            order = np.argsort(positions, kind='mergesort')
+            return pd.DataFrame(
+                OrderedDict(
+                    (name, buffer.get_column(
+                        i, num_rows,
+                        fill_counts[i] == self.num_compiled, non_integral,
+                        non_numeric)[order])
+                    for i, name in zip(indices, names)),
+                index=[row_numbers[positions[j]] for j in order],
+                columns=names)
+
+        if not self.num_compiled:
+            pd.DataFrame().to_csv(path, encoding='utf-8')
+        elif not self.spill_paths:
+            get_chunk_df(self.num_compiled, self._positions,
+                         self.buffer).to_csv(path, encoding='utf-8')
+        else:
+            chunk_paths = []
+            for i, chunk in enumerate(self.iter_chunks()):
+                chunk_paths.append(self._get_temp_path('{}.csv'.format(i)))
+                get_chunk_df(*chunk).to_csv(
+                    chunk_paths[-1], header=False, encoding='utf-8')
+            pd.DataFrame(columns=names).to_csv(path, encoding='utf-8')
+            _merge_csv_rows(chunk_paths, path)
+            for chunk_path in chunk_paths:
+                os.remove(chunk_path)
+
+    def close(self):
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        self.spill_paths = []
+        self._spilled_positions = []
+
+
+def _open_csv_file(path, mode='r'):
+    if sys.version_info[0] < 3:
+        return open(path, mode + 'b')
+    return io.open(path, mode, newline='', encoding='utf-8')
+
+
+def _merge_csv_rows(chunk_paths, path):
+    """Take list of paths of headerless CSVs, each sorted by its (integer)
+    index column, and the path of a CSV to append their rows to, merged in
+    index order.
+    """
+    chunk_files = [_open_csv_file(p) for p in chunk_paths]
+    try:
+        rows = heapq.merge(*[
+            ((int(row[0]), row) for row in csv.reader(chunk_file))
+            for chunk_file in chunk_files])
+        with _open_csv_file(path, 'a') as output_file:
+            writer = csv.writer(output_file, lineterminator='\n')
+            for _, row in rows:
+                writer.writerow(row)
+    finally:
+        for chunk_file in chunk_files:
+            chunk_file.close()
+
+
+def _get_participant_id(csv_path):
+    """Take raw data CSV path. Return participant ID (the file name stem).
+    """
+    return os.path.basename(csv_path).split('.')[0]
+
+
+def find_raw_data_csvs(data_dir, ids=None, since=None):
+    """Take base data directory, and optionally a list of participant IDs and
+    a modification time (seconds since the epoch). Return dict of sets of raw
+    data CSV paths, keyed by experiment stage.
+
+    With `ids`, only those participants' files are looked up, rather than
+    scanning the data directory. With `since`, only participants with a file
+    modified at or after that time are included.
+    """
+    sources = _import_script('sources')
+    raw_data_csvs = {}
+    for exp_stage in EXP_STAGES:
+        if ids is None:
+            paths = get_csv_paths(data_dir, exp_stage)
+        else:
+            paths = [
+                path for participant_id in ids
+                for path in _get_stage_csv_paths(
+                    data_dir, exp_stage, participant_id)]
+        raw_data_csvs[exp_stage] = set(p for p in paths if sources.exists(p))
+
+    if since is not None:
+        recent_ids = set(
+            _get_participant_id(path)
+            for paths in raw_data_csvs.values() for path in paths
+            if sources.get_mtime(path) >= since)
+        for exp_stage, paths in raw_data_csvs.items():
+            raw_data_csvs[exp_stage] = set(
+                p for p in paths if _get_participant_id(p) in recent_ids)
+
+    return raw_data_csvs
+
+
+# raw data CSVs (keyed by data directory) shared by worker processes
+_WORKER_STATE = {}
+
+
+def _init_worker(raw_data_csvs_by_dir, engine=DEFAULT_ENGINE,
+                 verify_csvs=(), exgauss=False, breakdowns=False,
+                 variables=None, measure_memory=False):
+    _WORKER_STATE['raw_data_csvs_by_dir'] = raw_data_csvs_by_dir
+    _WORKER_STATE['engine'] = engine
+    _WORKER_STATE['verify_csvs'] = verify_csvs
+    _WORKER_STATE['exgauss'] = exgauss
+    _WORKER_STATE['breakdowns'] = breakdowns
+    _WORKER_STATE['variables'] = variables
+    _WORKER_STATE['monitor'] = None
+    if measure_memory:
+        _WORKER_STATE['monitor'] = MemoryMonitor()
+        _WORKER_STATE['monitor'].start()
+
+
+def get_failure(practice_csv, exception):
+    """Take practice CSV path and the exception raised while compiling the
+    participant (within its ``except`` block). Return failure dict, for the
+    failure manifest.
+    """
+    return {
+        'id': _get_participant_id(practice_csv),
+        'practice_csv': practice_csv,
+        'source_csv': getattr(exception, 'source_csv', practice_csv),
+        'error': '{}: {}'.format(type(exception).__name__, exception),
+        'traceback': traceback.format_exc(),
+    }
+
 
-    # export complete data set to CSV
-    compiled_csv_path = os.path.join(DATA_DIR, 'compiled.csv')
-    ordered_compiled_df.to_csv(compiled_csv_path, encoding='utf-8')
+def _compile_participant_task(task):
+    """Take tuple of base data directory and practice CSV path. Return tuple
+    of compiled participant data, engine differences (None, unless the
+    participant is verified), failure dict (None, unless compiling raised
+    an exception, when the participant data is None) and the bytes this
+    process allocated to compile the participant (None, unless measuring
+    memory; see `MemoryMonitor`).
+    """
+    data_dir, practice_csv = task
+    args = (practice_csv, _WORKER_STATE['raw_data_csvs_by_dir'][data_dir],
+            data_dir, _WORKER_STATE['engine'], _WORKER_STATE['exgauss'],
+            _WORKER_STATE['breakdowns'], _WORKER_STATE['variables'])
+    monitor = _WORKER_STATE['monitor']
+    if monitor is not None:
+        monitor.start_participant()
+    try:
+        if practice_csv in _WORKER_STATE['verify_csvs']:
+            result = _import_script('equivalence').verify_participant(
+                *args) + (None,)
+        else:
+            result = compile_participant(*args), None, None
+    except Exception as e:
+        result = None, None, get_failure(practice_csv, e)
+    if monitor is not None:
+        return result + (monitor.measure_participant(),)
+    return result + (None,)
+
+
+def get_participant_csvs(practice_csv, raw_data_csvs, data_dir):
+    """Take practice CSV path, dict of raw data CSV paths (keyed by
+    experiment stage) and base data directory. Return list of the
+    participant's raw data CSV paths, practice first.
+    """
+    participant_id = _get_participant_id(practice_csv)
+    return [practice_csv] + [
+        path for stage in ['experiment', 'follow_up']
+        for path in _get_stage_csv_paths(data_dir, stage, participant_id)
+        if path in raw_data_csvs[stage]]
+
+
+def iter_compiled_studies(tasks, raw_data_csvs_by_dir, workers=1,
+                          engine=DEFAULT_ENGINE, verify_csvs=(),
+                          exgauss=False, schedule_stats=None,
+                          breakdowns=False, variables=None, monitor=None):
+    """Take list of (base data directory, practice CSV path) tuples, dict of
+    raw data CSV paths dicts keyed by base data directory, number of worker
+    processes, scoring engine name, set of practice CSV paths to verify,
+    whether to fit ex-Gaussian RT distributions, optionally a
+    `scheduling.ScheduleStats` to record worker utilization in, whether
+    to break performance down by digit and font size, optionally the
+    list of variables to compile (see `compile_participant`), and optionally
+    a `MemoryMonitor` to record the memory each participant took (as
+    measured by the process compiling them). Yield tuples
+    of task position, base data directory, practice CSV path, compiled
+    participant data, engine differences and failure (see
+    `_compile_participant_task`), as participants are compiled.
+
+    All participants, from any number of data directories, are compiled by
+    one pool of worker processes, largest first (by the size of their raw
+    data files; see ``scheduling.py``). Each participant is compiled in
+    isolation: one that fails is yielded with its failure, and the others
+    carry on.
+    """
+    scheduling = _import_script('scheduling')
+    costs = [
+        scheduling.estimate_cost(get_participant_csvs(
+            practice_csv, raw_data_csvs_by_dir[data_dir], data_dir))
+        for data_dir, practice_csv in tasks]
+    state = (raw_data_csvs_by_dir, engine, verify_csvs, exgauss, breakdowns,
+             variables, monitor is not None)
+
+    def iter_results(compiled):
+        for position, result in compiled:
+            data_dir, practice_csv = tasks[position]
+            if monitor is not None:
+                monitor.end_participant(
+                    _get_participant_id(practice_csv),
+                    get_participant_csvs(
+                        practice_csv, raw_data_csvs_by_dir[data_dir],
+                        data_dir),
+                    result[-1])
+            yield (position,) + tasks[position] + result[:-1]
+
+    if workers <= 1:
+        _init_worker(*state)
+        for result in iter_results(scheduling.iter_scheduled(
+                _compile_participant_task, tasks, costs,
+                stats=schedule_stats)):
+            yield result
+        return
+
+    pool = multiprocessing.Pool(workers, _init_worker, state)
+    try:
+        for result in iter_results(scheduling.iter_scheduled(
+                _compile_participant_task, tasks, costs, pool,
+                schedule_stats)):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def iter_compiled_participants(practice_csvs, raw_data_csvs, data_dir,
+                               workers=1, engine=DEFAULT_ENGINE,
+                               verify_csvs=(), exgauss=False,
+                               schedule_stats=None, breakdowns=False,
+                               variables=None, monitor=None):
+    """Take list of practice CSV paths, dict of raw data CSV paths (keyed by
+    experiment stage), base data directory, number of worker processes,
+    scoring engine name, set of practice CSV paths of participants to
+    verify against the other engines, whether to fit ex-Gaussian RT
+    distributions, optionally a `scheduling.ScheduleStats`, whether to
+    break performance down by digit and font size, optionally the list of
+    variables to compile and optionally a `MemoryMonitor` (see
+    `iter_compiled_studies`). Yield tuples of the position of the practice
+    CSV path in the list, the path, compiled participant data, engine
+    differences (see `equivalence.verify_participant`; None for
+    participants not verified) and failure (None, unless the participant
+    failed to compile), as participants are compiled.
+    """
+    tasks = [(data_dir, practice_csv) for practice_csv in practice_csvs]
+    for result in iter_compiled_studies(
+            tasks, {data_dir: raw_data_csvs}, workers, engine, verify_csvs,
+            exgauss, schedule_stats, breakdowns, variables, monitor):
+        yield result[:1] + result[2:]
+
+
+def read_compiled_csv_as_text(path):
+    """Take compiled CSV path. Return pandas dataframe of its values as they
+    are written (strings, with empty cells kept as empty strings), so rows
+    can be written back unchanged.
+    """
+    return pd.read_csv(path, index_col=0, dtype=str, keep_default_na=False,
+                       encoding='utf-8')
+
+
+def merge_compiled_csv(compiled_csv_path, updated_csv_path):
+    """Take path of a compiled CSV and path of a compiled CSV holding a
+    subset of participants. Replace those participants' rows in the
+    compiled CSV, in place (adding new participants' rows at the end). Other
+    rows are written back as they were.
+    """
+    compiled_df = read_compiled_csv_as_text(compiled_csv_path)
+    updated_df = read_compiled_csv_as_text(updated_csv_path)
+    if 'id' not in compiled_df.columns:
+        compiled_df = pd.DataFrame(columns=['id'])
+
+    # updated rows take the place (and row number) of the rows they replace
+    row_labels = dict(zip(compiled_df['id'], compiled_df.index))
+    next_row = max([int(label) + 1 for label in compiled_df.index] + [0])
+    updated_labels = []
+    for participant_id in updated_df['id']:
+        if participant_id not in row_labels:
+            row_labels[participant_id] = u'{}'.format(next_row)
+            next_row += 1
+        updated_labels.append(row_labels[participant_id])
+    updated_df.index = updated_labels
+
+    kept_df = compiled_df[~compiled_df['id'].isin(updated_df['id'])]
+    merged_df = pd.concat([kept_df, updated_df])
+    merged_df = merged_df.loc[
+        list(compiled_df.index) + [label for label in updated_labels
+                                   if label not in compiled_df.index]]
+    columns = get_ordered_columns(merged_df.columns.values)
+    merged_df.to_csv(compiled_csv_path, columns=columns, encoding='utf-8')
+
+
+def exclude_invalid_csvs(raw_data_csvs, report_path=None, workers=1):
+    """Take dict of raw data CSV paths (keyed by experiment stage) and
+    validate each file (see ``validate.py``), optionally writing the report
+    as JSON. Return dict of the valid raw data CSV paths.
+    """
+    validate = _import_script('validate')
+    reports = validate.validate_raw_data_csvs(raw_data_csvs, workers)
+    if report_path:
+        validate.write_report(reports, report_path)
+
+    invalid_paths = validate.get_invalid_paths(reports)
+    for report in reports:
+        if not report['valid']:
+            sys.stderr.write(validate.format_report(report) + '\n')
+    return dict(
+        (stage, set(paths) - invalid_paths)
+        for stage, paths in raw_data_csvs.items())
+
+
+def exclude_duplicate_csvs(raw_data_csvs, report_path=None, workers=1):
+    """Take dict of raw data CSV paths (keyed by experiment stage) and look
+    for duplicate and resubmitted files (see ``dedup.py``), optionally
+    writing the findings as JSON. Return dict of raw data CSV paths, without
+    redundant duplicates.
+    """
+    dedup = _import_script('dedup')
+    findings = dedup.find_duplicate_files(raw_data_csvs, workers)
+    if report_path:
+        dedup.write_report(findings, report_path)
+
+    redundant_paths = dedup.get_redundant_paths(findings)
+    for finding in findings:
+        sys.stderr.write(dedup.format_finding(finding) + '\n')
+    return dict(
+        (stage, set(paths) - redundant_paths)
+        for stage, paths in raw_data_csvs.items())
+
+
+def save_json(data, path):
+    """Write data to JSON, replacing the file at `path` only once written: it
+    is written to a temporary file beside it, which is renamed over it (an
+    atomic replace on POSIX, and with ``os.replace`` on Python 3, on Windows
+    too), so the file is never missing or partly written.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, sort_keys=True)
+    getattr(os, 'replace', os.rename)(temp_path, path)
+
+
+def get_failure_manifest_path(output_path):
+    """Take compiled output path. Return the path of its failure manifest
+    (e.g., ``compiled-failures.json`` for ``compiled.csv``).
+    """
+    return '{}-failures.json'.format(os.path.splitext(output_path)[0])
+
+
+def read_failure_manifest(path):
+    """Take failure manifest path. Return list of failure dicts (empty if
+    there is no manifest).
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)['failures']
+
+
+def write_failure_manifest(path, failures):
+    """Take failure manifest path and list of failure dicts. Write the
+    failures as JSON, or remove the manifest if there are none.
+    """
+    if failures:
+        with open(path, 'w') as f:
+            json.dump({'failures': failures}, f, indent=2, sort_keys=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def format_failures(failures, manifest_path):
+    """Take list of failure dicts and failure manifest path. Return string
+    summarizing the failures.
+    """
+    lines = ['{} participant(s) failed to compile (see {}):'.format(
+        len(failures), manifest_path)]
+    for failure in failures:
+        lines.append('  {}\t{}\t{}'.format(
+            failure['id'], failure['source_csv'], failure['error']))
+    return '\n'.join(lines)
+
+
+def main(data_dir=DATA_DIR, output_path=None, ids=None, since=None,
+         workers=1, memory_budget_mb=None, memory_report=False,
+         sqlite_path=None, validate=False, engine=DEFAULT_ENGINE,
+         verify=0.0, verify_seed=None, exgauss=False, cohort_path=None,
+         cohort_resamples=None, cohort_seed=None, retry_failed=False,
+         dedup=False, schedule_report=False, breakdowns=False,
+         variables=None):
+    """Compile participants' raw data and write it to CSV (by default,
+    ``compiled.csv`` in the data directory). When compiling a subset of
+    participants (by `ids` or `since`), their rows are merged into an
+    existing output file.
+
+    With `validate`, raw data files are checked first and invalid files are
+    left out, as though missing (see `exclude_invalid_csvs`); the report is
+    written to ``validation.json`` beside the output. With `dedup`, files are
+    checked for duplicates and resubmissions, and redundant duplicates are
+    left out (see `exclude_duplicate_csvs`); the findings are written to
+    ``duplicates.json`` beside the output.
+
+    Data is scored by the named scoring engine (see `ENGINES`). With
+    `verify`, that fraction of participants (sampled at random) is also
+    compiled by the other engines, and any differences are reported.
+
+    With `exgauss`, ex-Gaussian distributions are fit to each participant's
+    RTs, overall and per block (see `summarize_exgauss`), within the worker
+    processes. With `breakdowns`, performance is also broken down by
+    stimulus digit and font size (see `summarize_breakdowns`).
+
+    With `cohort_path`, cohort means of key outcomes, with bootstrap
+    confidence intervals by trial condition, are computed from the complete
+    compiled output and written to that CSV (see ``cohort.py``).
+
+    Participants that fail to compile are left out of the output, and their
+    errors (with tracebacks and the raw data file being compiled) are
+    written to a failure manifest beside it (see
+    `get_failure_manifest_path`). With `retry_failed`, only the manifest's
+    participants are compiled, and merged into the existing output.
+
+    Cohort aggregates of key outcomes, by trial condition, are updated as
+    each participant is compiled, and saved beside the output (see
+    ``aggregates.py``); subset compiles update the saved aggregates.
+
+    Participants are dispatched to workers largest first (see
+    ``scheduling.py``); with `schedule_report`, each worker's utilization
+    is reported.
+
+    Row hashes and column checksums of the output are saved beside it,
+    keeping those of the previous compile (see ``hashes.py``), for diffing.
+
+    With a list of `variables`, only those (and participant IDs) are
+    compiled, skipping the stages and steps they don't depend on (see
+    `get_variable_graphs`). Their output must be written to its own
+    `output_path` (it can't replace or be merged into an output holding
+    other variables, nor be upserted into a SQLite store), and cohort
+    aggregates are not updated.
+    """
+    get_engine(engine)
+    if variables is not None:
+        check_variables(variables)
+        if output_path is None:
+            raise ValueError(
+                'Compiling a subset of variables needs an output path')
+        if sqlite_path:
+            raise ValueError(
+                'Can\'t upsert a subset of variables into a SQLite store')
+        _check_variables_output(output_path, variables)
+    if output_path is None:
+        output_path = _get_default_output_path(data_dir)
+    manifest_path = get_failure_manifest_path(output_path)
+    earlier_failures = read_failure_manifest(manifest_path)
+    if retry_failed:
+        ids = [failure['id'] for failure in earlier_failures]
+    is_subset = ids is not None or since is not None
+    if variables is not None and is_subset and os.path.exists(output_path):
+        raise ValueError('Can\'t merge a subset of variables into {}'.format(
+            output_path))
+
+    # collect raw data CSVs
+    raw_data_csvs = find_raw_data_csvs(data_dir, ids, since)
+    if validate:
+        report_path = os.path.join(
+            os.path.dirname(os.path.abspath(output_path)), 'validation.json')
+        raw_data_csvs = exclude_invalid_csvs(
+            raw_data_csvs, report_path, workers)
+    if dedup:
+        report_path = os.path.join(
+            os.path.dirname(os.path.abspath(output_path)), 'duplicates.json')
+        raw_data_csvs = exclude_duplicate_csvs(
+            raw_data_csvs, report_path, workers)
+    practice_csvs = sorted(raw_data_csvs['practice'])
+    verify_csvs = _import_script('equivalence').sample_paths(
+        practice_csvs, verify, verify_seed)
+    differences_by_id = {}
+    failures = []
+
+    # streaming cohort aggregates (for subsets, those of the existing output)
+    # (recompiled participants' earlier values are replaced)
+    aggregates = _import_script('aggregates')
+    earlier_values = {}
+    if is_subset:
+        cohort_aggregates = aggregates.load_aggregates(output_path)
+        earlier_values = aggregates.read_compiled_values(
+            output_path, [_get_participant_id(p) for p in practice_csvs])
+    else:
+        cohort_aggregates = aggregates.CohortAggregates()
+
+    monitor = None
+    if memory_budget_mb or memory_report:
+        monitor = MemoryMonitor(memory_budget_mb)
+        monitor.start()
+
+    # optionally upsert each compiled participant into a SQLite store
+    compiled_store = None
+    if sqlite_path:
+        compiled_store = _import_script('store').CompiledStore(sqlite_path)
+
+    schedule_stats = None
+    if schedule_report:
+        schedule_stats = _import_script('scheduling').ScheduleStats(
+            max(workers, 1))
+
+    # create list of compiled participant data
+    results = CompiledResults(len(practice_csvs))
+    compiled_participants = iter_compiled_participants(
+        practice_csvs, raw_data_csvs, data_dir, workers, engine, verify_csvs,
+        exgauss, schedule_stats, breakdowns, variables, monitor)
+    try:
+        for position, practice_csv, participant, differences, failure in \
+                tqdm(compiled_participants, total=len(practice_csvs)):
+            if failure:
+                failures.append(failure)
+            else:
+                results.append(participant, position)
+                if participant['id'] in earlier_values:
+                    cohort_aggregates.remove(
+                        earlier_values[participant['id']])
+                if variables is None:
+                    cohort_aggregates.add(participant)
+                if differences:
+                    differences_by_id[participant['id']] = differences
+                if compiled_store is not None:
+                    compiled_store.upsert(participant)
+
+            # (the budget is checked against this process, which holds
+            # the compiled rows)
+            if monitor and monitor.is_over_budget():
+                results.spill(SPILL_MIN_ROWS)
+
+        # export complete data set to CSV
+        if is_subset and os.path.exists(output_path):
+            if results.num_compiled:
+                updated_csv_path = output_path + '.updated'
+                results.to_csv(updated_csv_path)
+                merge_compiled_csv(output_path, updated_csv_path)
+                os.remove(updated_csv_path)
+        else:
+            results.to_csv(output_path)
+        if variables is None:
+            cohort_aggregates.save(
+                aggregates.get_aggregates_path(output_path))
+        if os.path.exists(output_path):
+            _import_script('hashes').update_hashes(output_path)
+    finally:
+        results.close()
+        if compiled_store is not None:
+            compiled_store.close()
+        if monitor:
+            monitor.stop()
+
+    # record failures (for subsets, keeping earlier ones not compiled again)
+    if is_subset:
+        compiled_ids = set(_get_participant_id(p) for p in practice_csvs)
+        failures += [
+            f for f in earlier_failures if f['id'] not in compiled_ids]
+    failures.sort(key=lambda failure: failure['practice_csv'])
+    write_failure_manifest(manifest_path, failures)
+    if failures:
+        sys.stderr.write(format_failures(failures, manifest_path) + '\n')
+
+    if monitor:
+        print(monitor.report())
+    if schedule_stats is not None:
+        print(schedule_stats.report())
+    if verify_csvs:
+        sys.stderr.write(
+            'Verified {} participant(s) against other engines: {} '
+            'differ\n'.format(len(verify_csvs), len(differences_by_id)))
+        if differences_by_id:
+            equivalence = _import_script('equivalence')
+            sys.stderr.write(equivalence.format_engine_differences(
+                differences_by_id, engine) + '\n')
+
+    # optional cohort summary of the complete compiled data
+    if cohort_path:
+        write_cohort_summary(
+            output_path, cohort_path, cohort_resamples, cohort_seed, workers)
+    return results.num_compiled
+
+
+def _check_variables_output(output_path, variables):
+    """Take output path and list of variables to compile to it. Raise
+    ValueError if the output exists and holds other variables (e.g., a
+    complete compile), which would be overwritten.
+    """
+    if not os.path.exists(output_path):
+        return
+    columns = pd.read_csv(output_path, nrows=0, index_col=0).columns
+    other_columns = set(columns) - set(variables) - set(['id'])
+    if other_columns:
+        raise ValueError(
+            '{} holds other variables (e.g., {}); compile a subset of '
+            'variables to another output path'.format(
+                output_path, sorted(other_columns)[0]))
+
+
+def write_cohort_summary(compiled_csv_path, output_path=None,
+                         num_resamples=None, seed=None, workers=1):
+    """Take compiled CSV path and summary CSV path (if None, the summary is
+    printed), number of bootstrap resamples (by default,
+    `cohort.NUM_RESAMPLES`), random seed and number of worker processes.
+    Summarize the cohort by trial condition (see ``cohort.py``).
+    """
+    cohort = _import_script('cohort')
+    summary_df = cohort.summarize_compiled_csv(
+        compiled_csv_path, output_path,
+        num_resamples=num_resamples or cohort.NUM_RESAMPLES, seed=seed,
+        workers=workers)
+    if output_path is None:
+        print(summary_df.to_csv(index=False))
+
+
+def compile_studies(studies, output_dir=None, combined_path=None, workers=1,
+                    engine=DEFAULT_ENGINE, exgauss=False,
+                    schedule_report=False, breakdowns=False):
+    """Take list of (study name, base data directory) tuples, and optionally
+    an output directory and combined output CSV path. Compile every study's
+    participants on one pool of worker processes, writing each study to its
+    own CSV (``<study>-compiled.csv`` in `output_dir`, or else the default
+    output path of its data directory) as soon as it is complete, with a
+    failure manifest for participants that fail to compile, cohort
+    aggregates and row hashes (see `main`).
+    With `combined_path`, all studies are also written to one CSV, with a
+    ``study`` column. With `schedule_report`, each worker's utilization is
+    reported. Return ordered dict of compiled output paths, keyed by study
+    name.
+    """
+    get_engine(engine)
+    names = [name for name, _ in studies]
+    if len(set(names)) < len(names):
+        raise ValueError('Study names must be unique: {}'.format(
+            ', '.join(names)))
+    data_dirs = [data_dir for _, data_dir in studies]
+    if len(set(data_dirs)) < len(data_dirs):
+        raise ValueError('Data directories must be unique')
+
+    output_paths = OrderedDict()
+    raw_data_csvs_by_dir = {}
+    tasks = []
+    # (each task's position among its study's participants)
+    study_positions = []
+    for name, data_dir in studies:
+        if output_dir is None:
+            output_paths[name] = _get_default_output_path(data_dir)
+        else:
+            output_paths[name] = os.path.join(
+                output_dir, '{}-compiled.csv'.format(name))
+        raw_data_csvs_by_dir[data_dir] = find_raw_data_csvs(data_dir)
+        practice_csvs = sorted(raw_data_csvs_by_dir[data_dir]['practice'])
+        tasks.extend(
+            (data_dir, practice_csv) for practice_csv in practice_csvs)
+        study_positions.extend(range(len(practice_csvs)))
+
+    # each study's rows are placed by position, and written out once its
+    # last participant arrives
+    results_by_dir = dict(
+        (data_dir, CompiledResults(len(raw_data_csvs['practice'])))
+        for data_dir, raw_data_csvs in raw_data_csvs_by_dir.items())
+    output_paths_by_dir = dict(zip(data_dirs, output_paths.values()))
+    failures_by_dir = dict((data_dir, []) for data_dir in data_dirs)
+    aggregates = _import_script('aggregates')
+    aggregates_by_dir = dict(
+        (data_dir, aggregates.CohortAggregates()) for data_dir in data_dirs)
+    schedule_stats = None
+    if schedule_report:
+        schedule_stats = _import_script('scheduling').ScheduleStats(
+            max(workers, 1))
+
+    def write_results(data_dir):
+        results = results_by_dir.pop(data_dir)
+        output_path = output_paths_by_dir[data_dir]
+        try:
+            results.to_csv(output_path)
+        finally:
+            results.close()
+        aggregates_by_dir[data_dir].save(
+            aggregates.get_aggregates_path(output_path))
+        _import_script('hashes').update_hashes(output_path)
+        failures = sorted(failures_by_dir[data_dir],
+                          key=lambda failure: failure['practice_csv'])
+        manifest_path = get_failure_manifest_path(output_path)
+        write_failure_manifest(manifest_path, failures)
+        if failures:
+            sys.stderr.write(format_failures(failures, manifest_path) + '\n')
+
+    try:
+        for data_dir in data_dirs:
+            if not results_by_dir[data_dir].num_rows:
+                write_results(data_dir)
+        compiled_participants = iter_compiled_studies(
+            tasks, raw_data_csvs_by_dir, workers, engine, exgauss=exgauss,
+            schedule_stats=schedule_stats, breakdowns=breakdowns)
+        for position, data_dir, _, participant, _, failure in tqdm(
+                compiled_participants, total=len(tasks)):
+            results = results_by_dir[data_dir]
+            if failure:
+                failures_by_dir[data_dir].append(failure)
+            else:
+                results.append(participant, study_positions[position])
+                aggregates_by_dir[data_dir].add(participant)
+            num_done = results.num_compiled + len(failures_by_dir[data_dir])
+            if num_done == results.num_rows:
+                write_results(data_dir)
+    finally:
+        for results in results_by_dir.values():
+            results.close()
+
+    if schedule_stats is not None:
+        print(schedule_stats.report())
+    if combined_path:
+        write_combined_csv(output_paths, combined_path)
+    return output_paths
+
+
+def write_combined_csv(compiled_csv_paths, output_path):
+    """Take ordered dict of compiled CSV paths, keyed by study name, and
+    output CSV path. Write all studies' rows to one CSV, with a ``study``
+    column.
+    """
+    study_dfs = []
+    for name, path in compiled_csv_paths.items():
+        # (values are copied as written in each study's CSV)
+        study_df = read_compiled_csv_as_text(path)
+        if not len(study_df.index):
+            continue
+        study_df.insert(0, 'study', name)
+        study_dfs.append(study_df)
+    if not study_dfs:
+        pd.DataFrame().to_csv(output_path, encoding='utf-8')
+        return
+
+    combined_df = pd.concat(study_dfs, ignore_index=True)
+    columns = ['study'] + get_ordered_columns(
+        [c for c in combined_df.columns if c != 'study'])
+    combined_df.to_csv(output_path, columns=columns, encoding='utf-8')
+
+
+def get_status(data_dir=DATA_DIR, output_path=None):
+    """Take base data directory (and compiled output path). Return dict
+    summarizing raw data files and compiled output, without reading data.
+    """
+    if output_path is None:
+        output_path = _get_default_output_path(data_dir)
+
+    sources = _import_script('sources')
+    raw_data_csvs = find_raw_data_csvs(data_dir)
+    status = {
+        'data_dir': data_dir,
+        'num_files': dict(
+            (stage, len(paths)) for stage, paths in raw_data_csvs.items()),
+        'output_path': output_path,
+        'output_mtime': None,
+        'num_stale_files': None,
+    }
+    if os.path.exists(output_path):
+        output_mtime = os.path.getmtime(output_path)
+        status['output_mtime'] = output_mtime
+        status['num_stale_files'] = len([
+            path for paths in raw_data_csvs.values() for path in paths
+            if sources.get_mtime(path) > output_mtime])
+    return status
+
+
+def find_missing_data(data_dir=DATA_DIR, ids=None):
+    """Take base data directory (and optionally participant IDs). Return
+    sorted list of (participant ID, missing experiment stages) tuples for
+    participants lacking a stage's raw data file.
+    """
+    raw_data_csvs = find_raw_data_csvs(data_dir, ids)
+    stage_ids = dict(
+        (stage, set(_get_participant_id(p) for p in paths))
+        for stage, paths in raw_data_csvs.items())
+    all_ids = set().union(*stage_ids.values())
+
+    missing = []
+    for participant_id in sorted(all_ids):
+        missing_stages = [
+            stage for stage in EXP_STAGES
+            if participant_id not in stage_ids[stage]]
+        if missing_stages:
+            missing.append((participant_id, missing_stages))
+    return missing
+
+
+def _parse_ids(value):
+    return [i.strip() for i in value.split(',') if i.strip()]
+
+
+def _parse_variables(value):
+    variables = _parse_ids(value)
+    try:
+        check_variables(variables)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return variables
+
+
+def _parse_since(value):
+    """Take a date/time (ISO 8601) or seconds since the epoch. Return seconds
+    since the epoch.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for date_format in ['%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S',
+                        '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S']:
+        try:
+            since = datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return time.mktime(since.timetuple())
+    raise argparse.ArgumentTypeError(
+        'invalid date/time: {!r} (use YYYY-MM-DD[THH:MM[:SS]])'.format(value))
+
+
+def _parse_study(value):
+    """Take ``NAME=DATA_DIR`` or ``DATA_DIR``. Return tuple of study name and
+    data directory.
+    """
+    name, sep, data_dir = value.partition('=')
+    if not sep:
+        return get_study_name(value), value
+    if not name or not data_dir:
+        raise argparse.ArgumentTypeError(
+            'invalid study: {!r} (use [NAME=]DATA_DIR)'.format(value))
+    return name, data_dir
+
+
+def _parse_sweep_param(value):
+    """Take ``NAME=VALUE1,VALUE2`` string. Return tuple of scoring parameter
+    name (see `SCORING_DEFAULTS`) and list of its values.
+    """
+    name, sep, param_values = value.partition('=')
+    if name not in SCORING_DEFAULTS:
+        raise argparse.ArgumentTypeError(
+            'unknown scoring parameter: {!r} (expected one of: {})'.format(
+                name, ', '.join(sorted(SCORING_DEFAULTS))))
+    param_values = [v.strip() for v in param_values.split(',')]
+    if not sep or not all(param_values):
+        raise argparse.ArgumentTypeError(
+            'invalid scoring parameter values: {!r} (use '
+            'NAME=VALUE1[,VALUE2...])'.format(value))
+
+    default = SCORING_DEFAULTS[name]
+    if isinstance(default, string_types):
+        return name, param_values
+    try:
+        param_values = [int(v) for v in param_values]
+    except ValueError:
+        param_values = None
+    if param_values is None or min(param_values) < 1:
+        raise argparse.ArgumentTypeError(
+            '{} takes positive whole numbers: {!r}'.format(name, value))
+    return name, param_values
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Compile raw jsSART data into a single data set.')
+    parser.add_argument(
+        '--data-dir', default=DATA_DIR,
+        help='base data directory, or a .tar/.zip archive of it (default: '
+        '%(default)s)')
+    subparsers = parser.add_subparsers(dest='command')
+
+    def add_subset_arguments(subparser):
+        subparser.add_argument(
+            '--ids', type=_parse_ids,
+            help='comma-separated participant IDs')
+        subparser.add_argument(
+            '--since', type=_parse_since,
+            help='only participants with files modified since this date/time')
+
+    def add_bootstrap_arguments(subparser):
+        subparser.add_argument(
+            '--bootstrap-resamples', type=int, metavar='N',
+            help='number of bootstrap resamples (default: 10000)')
+        subparser.add_argument(
+            '--bootstrap-seed', type=int,
+            help='random seed for bootstrap resampling')
+
+    compile_parser = subparsers.add_parser(
+        'compile', help='compile participant data (default)')
+    compile_parser.add_argument(
+        '-o', '--output', help='output CSV path (default: compiled.csv in '
+        'the data directory, or <archive>-compiled.csv beside an archive)')
+    add_subset_arguments(compile_parser)
+    compile_parser.add_argument(
+        '--retry-failed', action='store_true',
+        help='compile only the participants in the failure manifest, and '
+        'merge them into the output')
+    compile_parser.add_argument(
+        '-j', '--workers', type=int, default=1,
+        help='number of worker processes (default: %(default)s)')
+    compile_parser.add_argument(
+        '--memory-budget', type=float, metavar='MB',
+        help='spill compiled rows to disk (every {} rows) above this '
+             'resident memory size'.format(SPILL_MIN_ROWS))
+    compile_parser.add_argument(
+        '--memory-report', action='store_true',
+        help='report peak memory and the heaviest participants')
+    compile_parser.add_argument(
+        '--schedule-report', action='store_true',
+        help='report each worker\'s utilization')
+    compile_parser.add_argument(
+        '--sqlite', metavar='PATH',
+        help='also upsert compiled participants into this SQLite database')
+    compile_parser.add_argument(
+        '--validate', action='store_true',
+        help='check raw data files first, and leave out invalid files')
+    compile_parser.add_argument(
+        '--dedup', action='store_true',
+        help='check raw data files for duplicates first, and leave out '
+        'redundant copies')
+    compile_parser.add_argument(
+        '--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+        help='scoring engine (default: %(default)s)')
+    compile_parser.add_argument(
+        '--verify', type=float, default=0.0, metavar='FRACTION',
+        help='also compile this fraction of participants with the other '
+        'engines, and report differences')
+    compile_parser.add_argument(
+        '--verify-seed', type=int, help='random seed for --verify sampling')
+    compile_parser.add_argument(
+        '--exgauss', action='store_true',
+        help='fit ex-Gaussian RT distributions (exg_* columns)')
+    compile_parser.add_argument(
+        '--breakdowns', action='store_true',
+        help='break performance down by stimulus digit and font size '
+        '(digit*, font* columns)')
+    compile_parser.add_argument(
+        '--vars', type=_parse_variables, metavar='NAMES',
+        help='compile only these comma-separated variables (and IDs), to '
+        'the output given by --output')
+    compile_parser.add_argument(
+        '--cohort-summary', metavar='PATH',
+        help='also write cohort means, with bootstrap confidence intervals '
+        'by condition, to this CSV')
+    add_bootstrap_arguments(compile_parser)
+
+    subparsers.add_parser(
+        'status', help='summarize raw data files and compiled output')
+
+    missing_parser = subparsers.add_parser(
+        'list-missing', help='list participants missing a stage data file')
+    missing_parser.add_argument('--ids', type=_parse_ids)
+
+    validate_parser = subparsers.add_parser(
+        'validate', help='check raw data files before compiling')
+    add_subset_arguments(validate_parser)
+    validate_parser.add_argument(
+        '-j', '--workers', type=int, default=1,
+        help='number of worker processes (default: %(default)s)')
+    validate_parser.add_argument(
+        '--json', action='store_true', help='print the report as JSON')
+    validate_parser.add_argument(
+        '--report', metavar='PATH', help='also write the report as JSON')
+    validate_parser.add_argument(
+        '--quarantine', metavar='DIR',
+        help='move invalid files into this directory')
+
+    dedup_parser = subparsers.add_parser(
+        'dedup', help='find duplicate and resubmitted raw data files, and '
+        'participant ID mismatches')
+    add_subset_arguments(dedup_parser)
+    dedup_parser.add_argument(
+        '-j', '--workers', type=int, default=1,
+        help='number of worker processes (default: %(default)s)')
+    dedup_parser.add_argument(
+        '--json', action='store_true', help='print the findings as JSON')
+    dedup_parser.add_argument(
+        '--report', metavar='PATH', help='also write the findings as JSON')
+
+    fuzz_parser = subparsers.add_parser(
+        'fuzz', help='compare scoring engines on random SART blocks')
+    fuzz_parser.add_argument(
+        '-n', '--cases', type=int, default=1000,
+        help='number of random cases (default: %(default)s)')
+    fuzz_parser.add_argument('--seed', type=int, help='random seed')
+    fuzz_parser.add_argument(
+        '--engine', choices=sorted(ENGINES), default='fast',
+        help='scoring engine compared with the reference engine '
+        '(default: %(default)s)')
+
+    benchmark_parser = subparsers.add_parser(
+        'benchmark', help='time the scoring engines on generated data')
+    benchmark_parser.add_argument(
+        '--trials', type=int, default=2000,
+        help='number of SART trials (default: %(default)s)')
+    benchmark_parser.add_argument(
+        '--blocks', type=int, default=200,
+        help='number of blocks to segment (default: %(default)s)')
+    benchmark_parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='number of timed calls (default: %(default)s)')
+
+    cohort_parser = subparsers.add_parser(
+        'cohort', help='summarize compiled data by condition, with bootstrap '
+        'confidence intervals')
+    cohort_parser.add_argument(
+        '-i', '--input', help='compiled CSV path (default: compiled.csv in '
+        'the data directory)')
+    cohort_parser.add_argument(
+        '-o', '--output', help='summary CSV path (default: print it)')
+    cohort_parser.add_argument(
+        '-j', '--workers', type=int, default=1,
+        help='number of worker processes (default: %(default)s)')
+    add_bootstrap_arguments(cohort_parser)
+
+    aggregates_parser = subparsers.add_parser(
+        'aggregates', help='summarize (and merge) saved cohort aggregates')
+    aggregates_parser.add_argument(
+        'paths', nargs='*', metavar='PATH',
+        help='saved aggregates, e.g. of several shards (default: those of '
+        'compiled.csv in the data directory)')
+    aggregates_parser.add_argument(
+        '-o', '--output', help='summary CSV path (default: print it)')
+    aggregates_parser.add_argument(
+        '--merged', metavar='PATH', help='also save the merged aggregates')
+
+    diff_parser = subparsers.add_parser(
+        'diff', help='report participants and variables that changed '
+        'between compiled outputs')
+    diff_parser.add_argument(
+        'old', nargs='?', metavar='OLD',
+        help='compiled CSV or saved hashes (default: the hashes of the '
+        'previous compile of compiled.csv in the data directory)')
+    diff_parser.add_argument(
+        'new', nargs='?', metavar='NEW',
+        help='compiled CSV or saved hashes (default: compiled.csv in the '
+        'data directory)')
+    diff_parser.add_argument(
+        '--json', action='store_true', help='print the diff as JSON')
+    diff_parser.add_argument(
+        '--ids', action='store_true',
+        help='only print the IDs of added and changed participants')
+
+    studies_parser = subparsers.add_parser(
+        'studies', help='compile several studies\' data directories on one '
+        'pool of worker processes')
+    studies_parser.add_argument(
+        'studies', nargs='+', type=_parse_study, metavar='[NAME=]DATA_DIR',
+        help='study data directory (or archive), optionally named (default '
+        'name: the directory name)')
+    studies_parser.add_argument(
+        '--output-dir', help='write <study>-compiled.csv files here '
+        '(default: each study\'s default output path)')
+    studies_parser.add_argument(
+        '--combined', metavar='PATH',
+        help='also write all studies to this CSV, with a study column')
+    studies_parser.add_argument(
+        '-j', '--workers', type=int, default=1,
+        help='number of worker processes (default: %(default)s)')
+    studies_parser.add_argument(
+        '--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+        help='scoring engine (default: %(default)s)')
+    studies_parser.add_argument(
+        '--exgauss', action='store_true',
+        help='fit ex-Gaussian RT distributions (exg_* columns)')
+    studies_parser.add_argument(
+        '--breakdowns', action='store_true',
+        help='break performance down by stimulus digit and font size '
+        '(digit*, font* columns)')
+    studies_parser.add_argument(
+        '--schedule-report', action='store_true',
+        help='report each worker\'s utilization')
+
+    sweep_parser = subparsers.add_parser(
+        'sweep', help='compile experiment data under several scoring '
+        'parameter values')
+    sweep_parser.add_argument(
+        'params', nargs='+', metavar='NAME=VALUES', type=_parse_sweep_param,
+        help='scoring parameter values, e.g. anticipation_threshold=100,150')
+    sweep_parser.add_argument(
+        '-o', '--output', help='output CSV path (default: '
+        'compiled_sweep.csv in the data directory, or beside an archive)')
+    sweep_parser.add_argument(
+        '-j', '--workers', type=int, default=1,
+        help='number of worker processes (default: %(default)s)')
+    sweep_parser.add_argument(
+        '--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+        help='scoring engine (default: %(default)s)')
+    sweep_parser.add_argument(
+        '--accuracy-only', action='store_true',
+        help='only compile anticipation and accuracy variables, scoring '
+        'all anticipation_threshold values at once')
+    return parser
+
+
+COMMANDS = [
+    'compile', 'status', 'list-missing', 'validate', 'dedup', 'fuzz',
+    'benchmark', 'cohort', 'aggregates', 'diff', 'studies', 'sweep']
+# top-level options (before the command), all of which take a value
+TOP_LEVEL_OPTIONS = ['--data-dir']
+
+
+def _insert_default_command(argv, command='compile'):
+    """Take command-line arguments. Return them with the default command
+    inserted after the top-level options (and their values), unless a
+    command (or help) follows them.
+    """
+    argv = list(argv)
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in COMMANDS or arg in ('-h', '--help'):
+            return argv
+        if arg in TOP_LEVEL_OPTIONS:
+            i += 2
+        elif arg.split('=', 1)[0] in TOP_LEVEL_OPTIONS:
+            i += 1
+        else:
+            break
+    return argv[:i] + [command] + argv[i:]
+
+
+def cli(argv=None):
+    """Run the command-line interface (`compile` is the default command).
+    Return exit status.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    argv = _insert_default_command(argv)
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'compile':
+        if args.vars is not None:
+            if args.output is None:
+                parser.error('--vars needs an output path (--output)')
+            if args.sqlite:
+                parser.error('--vars can\'t be combined with --sqlite')
+            try:
+                _check_variables_output(args.output, args.vars)
+            except ValueError as e:
+                parser.error(str(e))
+        main(args.data_dir, output_path=args.output, ids=args.ids,
+             since=args.since, workers=args.workers,
+             memory_budget_mb=args.memory_budget,
+             memory_report=args.memory_report, sqlite_path=args.sqlite,
+             validate=args.validate, engine=args.engine, verify=args.verify,
+             verify_seed=args.verify_seed, exgauss=args.exgauss,
+             cohort_path=args.cohort_summary,
+             cohort_resamples=args.bootstrap_resamples,
+             cohort_seed=args.bootstrap_seed, retry_failed=args.retry_failed,
+             dedup=args.dedup, schedule_report=args.schedule_report,
+             breakdowns=args.breakdowns, variables=args.vars)
+        output_path = args.output or _get_default_output_path(args.data_dir)
+        if os.path.exists(get_failure_manifest_path(output_path)):
+            return 1
+
+    elif args.command == 'status':
+        status = get_status(args.data_dir)
+        print('Data directory: {}'.format(status['data_dir']))
+        for exp_stage in EXP_STAGES:
+            print('  {}: {} file(s)'.format(
+                exp_stage, status['num_files'][exp_stage]))
+        if status['output_mtime'] is None:
+            print('Compiled output: none ({})'.format(status['output_path']))
+        else:
+            print('Compiled output: {} (updated {})'.format(
+                status['output_path'],
+                time.strftime('%Y-%m-%d %H:%M:%S',
+                              time.localtime(status['output_mtime']))))
+            print('Raw files changed since: {}'.format(
+                status['num_stale_files']))
+
+    elif args.command == 'list-missing':
+        for participant_id, stages in find_missing_data(
+                args.data_dir, args.ids):
+            print('{}\t{}'.format(participant_id, ','.join(stages)))
+
+    elif args.command == 'validate':
+        validate = _import_script('validate')
+        reports = validate.validate_data_dir(
+            args.data_dir, args.ids, args.since, args.workers)
+        if args.report:
+            validate.write_report(reports, args.report)
+        if args.json:
+            print(validate.dumps(reports))
+        else:
+            for report in reports:
+                if not report['valid']:
+                    print(validate.format_report(report))
+        if args.quarantine:
+            for old_path, new_path in validate.quarantine_files(
+                    reports, args.quarantine):
+                sys.stderr.write('Moved {} to {}\n'.format(old_path, new_path))
+        return 1 if validate.get_invalid_paths(reports) else 0
+
+    elif args.command == 'dedup':
+        dedup = _import_script('dedup')
+        findings = dedup.find_data_dir_duplicates(
+            args.data_dir, args.ids, args.since, args.workers)
+        if args.report:
+            dedup.write_report(findings, args.report)
+        if args.json:
+            print(dedup.dumps(findings))
+        else:
+            for finding in findings:
+                print(dedup.format_finding(finding))
+        return 1 if findings else 0
+
+    elif args.command == 'fuzz':
+        failures = _import_script('equivalence').fuzz_engines(
+            args.cases, args.seed, args.engine)
+        for case, description in failures:
+            print('case {}\t{}'.format(case, description))
+        print('{} case(s), {} difference(s)'.format(
+            args.cases, len(failures)))
+        return 1 if failures else 0
+
+    elif args.command == 'benchmark':
+        timings = _import_script('equivalence').benchmark_engines(
+            args.trials, args.blocks, repeat=args.repeat)
+        reference_times = dict(
+            (name, seconds) for name, implementation, seconds in timings
+            if implementation == 'reference')
+        for name, implementation, seconds in timings:
+            print('{:<32}{:<16}{:>10.2f} ms{:>10.1f}x'.format(
+                name, implementation, seconds * 1000,
+                reference_times[name] / max(seconds, 1e-9)))
+
+    elif args.command == 'cohort':
+        write_cohort_summary(
+            args.input or _get_default_output_path(args.data_dir),
+            args.output, args.bootstrap_resamples, args.bootstrap_seed,
+            args.workers)
+
+    elif args.command == 'aggregates':
+        aggregates = _import_script('aggregates')
+        cohort_aggregates = aggregates.merge_aggregates(
+            args.paths or [aggregates.get_aggregates_path(
+                _get_default_output_path(args.data_dir))])
+        if args.merged:
+            cohort_aggregates.save(args.merged)
+        summary_df = cohort_aggregates.summarize()
+        if args.output:
+            summary_df.to_csv(args.output, index=False)
+        else:
+            print(summary_df.to_csv(index=False))
+
+    elif args.command == 'diff':
+        hashes = _import_script('hashes')
+        output_path = _get_default_output_path(args.data_dir)
+        diff = hashes.diff_hashes(
+            hashes.load_hashes(
+                args.old or hashes.get_previous_hashes_path(output_path)),
+            hashes.load_hashes(args.new or output_path))
+        if args.json:
+            print(json.dumps(diff, indent=2, sort_keys=True))
+        elif args.ids:
+            participants = diff['participants']
+            for participant_id in sorted(
+                    participants['added'] + participants['changed']):
+                print(participant_id)
+        elif hashes.has_differences(diff):
+            print(hashes.format_diff(diff))
+        return 1 if hashes.has_differences(diff) else 0
+
+    elif args.command == 'studies':
+        output_paths = compile_studies(
+            args.studies, args.output_dir, args.combined, args.workers,
+            args.engine, args.exgauss, args.schedule_report,
+            args.breakdowns)
+        for name, output_path in output_paths.items():
+            print('{}\t{}'.format(name, output_path))
+
+    elif args.command == 'sweep':
+        grid = dict(args.params)
+        if len(grid) < len(args.params):
+            parser.error('each scoring parameter can only be swept once')
+        if args.accuracy_only and set(grid) != set(['anticipation_threshold']):
+            parser.error('--accuracy-only only sweeps anticipation_threshold')
+        # (``compiled_sweep.csv`` in the data directory, or beside it)
+        output_path = args.output or '{}_sweep.csv'.format(
+            os.path.splitext(_get_default_output_path(args.data_dir))[0])
+        sweep_df, failures = compile_sweep(
+            args.data_dir, grid, args.engine, args.workers,
+            args.accuracy_only)
+        sweep_df.to_csv(output_path, encoding='utf-8')
+        manifest_path = get_failure_manifest_path(output_path)
+        write_failure_manifest(manifest_path, failures)
+        if failures:
+            sys.stderr.write(format_failures(failures, manifest_path) + '\n')
+
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(cli())
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""Find duplicate and resubmitted raw jsSART data files before compiling
+them.
+
+The Node server writes ``data/<stage>/<participant ID>.csv`` on every upload,
+so re-runs, page reloads and shared participant IDs leave duplicated,
+overwritten or mismatched files behind. Each file is fingerprinted once: a
+hash of its (decompressed) bytes, and a hash of each of its trials, with
+cells normalized and the columns that differ between resubmissions of the
+same trials (participant ID and elapsed time) left out. Files are then
+compared by fingerprint, not content:
+
+- ``duplicate``: files with the same trials (``exact`` if byte-identical)
+- ``near_duplicate``: files sharing most of their trials (e.g., a truncated
+  upload and its complete resubmission)
+- ``id_mismatch``: a file whose participant ID differs from its file name
+- ``id_collision``: a participant ID found in files of several participants
+
+Findings are JSON-serializable dicts, and all but the first (earliest) file
+of each stage's duplicates can be excluded from a compile (see the
+``dedup`` command and ``compile --dedup`` of ``compile_data.py``).
+"""
+import io
+import json
+import hashlib
+import itertools
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts import compile_data, sources
+except ImportError:  # run as a script
+    import compile_data
+    import sources
+
+
+# columns left out of trial hashes, as they differ between resubmissions
+UNHASHED_COLUMNS = ['participant_id', 'time_elapsed']
+# minimum share of trials (of the shorter file) for near-duplicates
+NEAR_DUPLICATE_OVERLAP = 0.9
+# trials found in more files than this are too common to compare files by
+MAX_FILES_PER_TRIAL = 20
+
+
+def fingerprint_dataframe(df):
+    """Take raw data frame, read as text. Return array of trial hashes
+    (unsigned 64-bit integers), one per row.
+    """
+    columns = sorted(c for c in df.columns if c not in UNHASHED_COLUMNS)
+    trials = df[columns].fillna('')
+    for column in columns:
+        trials[column] = trials[column].str.strip()
+    return pd.util.hash_pandas_object(trials, index=False).values
+
+
+def fingerprint_csv(path, exp_stage):
+    """Take CSV path and experiment stage. Return fingerprint dict, with the
+    file's ``path``, ``stage``, participant ``id`` (from its file name),
+    modification time, the participant IDs in the file, a hash of its
+    bytes (``file_hash``) and trials (``trial_hash``), and array of trial
+    hashes (``row_hashes``). Unreadable files have an ``error`` instead of
+    hashes.
+    """
+    fingerprint = {
+        'path': path,
+        'stage': exp_stage,
+        'id': compile_data._get_participant_id(path),
+        'mtime': sources.get_mtime(path),
+    }
+    try:
+        with sources.open_csv(path) as f:
+            data = f.read()
+        df = pd.read_csv(io.BytesIO(data), dtype=object, encoding='utf-8')
+    except (ValueError, IOError, EOFError, pd.errors.ParserError) as e:
+        fingerprint['error'] = 'unreadable: {}'.format(e)
+        return fingerprint
+
+    row_hashes = fingerprint_dataframe(df)
+    participant_ids = []
+    if 'participant_id' in df.columns:
+        participant_ids = sorted(
+            df['participant_id'].dropna().str.strip().unique())
+    fingerprint.update({
+        'participant_ids': participant_ids,
+        'file_hash': hashlib.sha1(data).hexdigest(),
+        'trial_hash': hashlib.sha1(row_hashes.tobytes()).hexdigest(),
+        'row_hashes': row_hashes,
+    })
+    return fingerprint
+
+
+def _fingerprint_csv_task(args):
+    return fingerprint_csv(*args)
+
+
+def fingerprint_raw_data_csvs(raw_data_csvs, workers=1):
+    """Take dict of raw data CSV paths (keyed by experiment stage) and number
+    of worker processes. Return list of fingerprint dicts (see
+    `fingerprint_csv`), ordered by stage and path.
+    """
+    tasks = [
+        (path, exp_stage) for exp_stage in compile_data.EXP_STAGES
+        for path in sorted(raw_data_csvs.get(exp_stage, []))]
+    if workers <= 1 or len(tasks) <= 1:
+        return [fingerprint_csv(*task) for task in tasks]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        fingerprints = pool.map(_fingerprint_csv_task, tasks, chunksize=1)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return fingerprints
+
+
+def _finding(check, fingerprints, message, **kwargs):
+    finding = {
+        'check': check,
+        'message': message,
+        'paths': [f['path'] for f in fingerprints],
+        'stages': [f['stage'] for f in fingerprints],
+        'ids': [f['id'] for f in fingerprints],
+    }
+    finding.update(kwargs)
+    return finding
+
+
+def find_duplicates(fingerprints):
+    """Take list of (readable) fingerprint dicts. Return list of duplicate
+    findings, one per set of files with the same trials; each set's files
+    are ordered by modification time.
+    """
+    groups = {}
+    for fingerprint in fingerprints:
+        groups.setdefault(fingerprint['trial_hash'], []).append(fingerprint)
+
+    findings = []
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda f: (f['mtime'], f['path']))
+        is_exact = len(set(f['file_hash'] for f in group)) == 1
+        findings.append(_finding(
+            'duplicate', group, '{} files with the same trials{}'.format(
+                len(group), ' (identical)' if is_exact else ''),
+            exact=is_exact))
+    return sorted(findings, key=lambda finding: finding['paths'])
+
+
+def count_shared_trials(fingerprints,
+                        max_files_per_trial=MAX_FILES_PER_TRIAL):
+    """Take list of (readable) fingerprint dicts. Return dict of the number
+    of distinct trials each pair of files (by list positions) has in common.
+
+    All trial hashes are sorted together, so only trials found in more than
+    one file are visited.
+    """
+    row_hashes = [np.unique(f['row_hashes']) for f in fingerprints]
+    if not row_hashes:
+        return {}
+    hashes = np.concatenate(row_hashes)
+    files = np.repeat(
+        np.arange(len(row_hashes)), [len(h) for h in row_hashes])
+    order = np.argsort(hashes, kind='mergesort')
+    hashes, files = hashes[order], files[order]
+
+    is_start = np.concatenate([[True], hashes[1:] != hashes[:-1]])
+    starts = np.flatnonzero(is_start)
+    sizes = np.diff(np.append(starts, len(hashes)))
+    is_shared = (sizes > 1) & (sizes <= max_files_per_trial)
+
+    shared_counts = {}
+    for start, size in zip(starts[is_shared], sizes[is_shared]):
+        for pair in itertools.combinations(files[start:start + size], 2):
+            shared_counts[pair] = shared_counts.get(pair, 0) + 1
+    return shared_counts
+
+
+def find_near_duplicates(fingerprints, min_overlap=NEAR_DUPLICATE_OVERLAP):
+    """Take list of (readable) fingerprint dicts and minimum share of the
+    shorter file's trials. Return list of near-duplicate findings, one per
+    pair of files sharing that many trials (but not all of them).
+    """
+    num_trials = [len(np.unique(f['row_hashes'])) for f in fingerprints]
+    findings = []
+    for (i, j), num_shared in sorted(
+            count_shared_trials(fingerprints).items()):
+        a, b = fingerprints[i], fingerprints[j]
+        if a['trial_hash'] == b['trial_hash']:
+            continue
+        overlap = float(num_shared) / min(num_trials[i], num_trials[j])
+        if overlap >= min_overlap:
+            pair = sorted([a, b], key=lambda f: (f['mtime'], f['path']))
+            findings.append(_finding(
+                'near_duplicate', pair,
+                '{:.0%} of trials in common ({} and {} trials)'.format(
+                    overlap, num_trials[i], num_trials[j]),
+                overlap=round(overlap, 4)))
+    return findings
+
+
+def find_id_problems(fingerprints):
+    """Take list of (readable) fingerprint dicts. Return list of findings
+    for files whose participant IDs don't match their file names, and for
+    participant IDs found in files of several participants (across all
+    stages).
+    """
+    findings = []
+    files_by_id = {}
+    for fingerprint in fingerprints:
+        participant_ids = fingerprint['participant_ids']
+        if participant_ids != [fingerprint['id']]:
+            findings.append(_finding(
+                'id_mismatch', [fingerprint],
+                'participant ID(s) {} do not match file name'.format(
+                    ', '.join(participant_ids) or 'missing'),
+                participant_ids=participant_ids))
+        for participant_id in participant_ids:
+            files_by_id.setdefault(participant_id, []).append(fingerprint)
+
+    for participant_id, group in sorted(files_by_id.items()):
+        if len(set(f['id'] for f in group)) > 1:
+            findings.append(_finding(
+                'id_collision', group,
+                'participant ID {} found in files of participants '
+                '{}'.format(participant_id, ', '.join(
+                    sorted(set(f['id'] for f in group)))),
+                participant_ids=[participant_id]))
+    return findings
+
+
+def find_duplicate_files(raw_data_csvs, workers=1,
+                         min_overlap=NEAR_DUPLICATE_OVERLAP):
+    """Take dict of raw data CSV paths (keyed by experiment stage), number of
+    worker processes and minimum share of trials for near-duplicates.
+    Return list of finding dicts, with the ``check``, a ``message``, and the
+    ``paths``, ``stages`` and participant ``ids`` of the files involved.
+    """
+    fingerprints = fingerprint_raw_data_csvs(raw_data_csvs, workers)
+    findings = [
+        _finding('read', [f], f['error'])
+        for f in fingerprints if 'error' in f]
+    fingerprints = [f for f in fingerprints if 'error' not in f]
+    findings.extend(find_duplicates(fingerprints))
+    findings.extend(find_near_duplicates(fingerprints, min_overlap))
+    findings.extend(find_id_problems(fingerprints))
+    return findings
+
+
+def find_data_dir_duplicates(data_dir=compile_data.DATA_DIR, ids=None,
+                             since=None, workers=1):
+    """Take base data directory (and optionally participant IDs or a
+    modification time; see `compile_data.find_raw_data_csvs`). Return list
+    of finding dicts.
+    """
+    raw_data_csvs = compile_data.find_raw_data_csvs(data_dir, ids, since)
+    return find_duplicate_files(raw_data_csvs, workers)
+
+
+def get_redundant_paths(findings):
+    """Take list of finding dicts. Return set of the paths of redundant
+    files: all but the earliest of each stage's duplicates.
+    """
+    redundant_paths = set()
+    for finding in findings:
+        if finding['check'] != 'duplicate':
+            continue
+        kept_stages = set()
+        for path, exp_stage in zip(finding['paths'], finding['stages']):
+            if exp_stage in kept_stages:
+                redundant_paths.add(path)
+            kept_stages.add(exp_stage)
+    return redundant_paths
+
+
+def summarize_findings(findings):
+    """Take list of finding dicts. Return dict of finding counts (keyed by
+    check) and the number of redundant files.
+    """
+    finding_counts = {}
+    for finding in findings:
+        check = finding['check']
+        finding_counts[check] = finding_counts.get(check, 0) + 1
+    return {
+        'finding_counts': finding_counts,
+        'num_redundant': len(get_redundant_paths(findings)),
+    }
+
+
+def dumps(findings):
+    """Take list of finding dicts. Return JSON string of the findings, with a
+    summary.
+    """
+    return json.dumps({'summary': summarize_findings(findings),
+                       'findings': findings}, indent=2, sort_keys=True)
+
+
+def write_report(findings, path):
+    """Take list of finding dicts and write them, with a summary, as JSON.
+    """
+    with open(path, 'w') as f:
+        f.write(dumps(findings))
+
+
+def format_finding(finding):
+    """Take finding dict. Return tab-separated line.
+    """
+    return '{}\t{}\t{}'.format(
+        finding['check'], ','.join(finding['paths']), finding['message'])
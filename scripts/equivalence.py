@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""Check that the scoring engines (``compile_data.ENGINES``) compile the same
+values, and time them.
+
+- verification: a sample of participants is compiled by every engine, and
+  the variables that differ are reported (``compile --verify``)
+- fuzzing: the engines' functions are compared on randomly generated SART
+  blocks, trial sequences, ratings and scoring parameters (``fuzz``)
+- benchmarks: the engines' kernelled functions are timed on generated data,
+  under each kernel backend (``benchmark``; see ``kernels.py``)
+
+Compiled values match when they agree to ``compile_data.ROUND_NDIGITS``
+decimal places.
+"""
+import numbers
+import random
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts import compile_data, kernels
+except ImportError:  # run as a script
+    import compile_data
+    import kernels
+
+
+def _values_match(expected, actual, ndigits=compile_data.ROUND_NDIGITS):
+    """Take two compiled values. Return whether they match to `ndigits`
+    decimal places (NaN matches NaN).
+    """
+    is_number = [
+        isinstance(v, numbers.Number) and not isinstance(v, bool)
+        for v in (expected, actual)]
+    if all(is_number):
+        if np.isnan(expected) or np.isnan(actual):
+            return bool(np.isnan(expected) and np.isnan(actual))
+        return abs(expected - actual) <= 10 ** -ndigits
+    return expected == actual
+
+
+def compare_compiled_data(expected, actual,
+                          ndigits=compile_data.ROUND_NDIGITS):
+    """Take two dicts of compiled data. Return sorted list of (variable name,
+    expected value, actual value) tuples for variables that differ by more
+    than `ndigits` decimal places (or are missing from either).
+    """
+    differences = []
+    for name in sorted(set(expected) | set(actual)):
+        expected_value = expected.get(name)
+        actual_value = actual.get(name)
+        if not _values_match(expected_value, actual_value, ndigits):
+            differences.append((name, expected_value, actual_value))
+    return differences
+
+
+def verify_participant(practice_csv, raw_data_csvs,
+                       data_dir=compile_data.DATA_DIR,
+                       engine=compile_data.DEFAULT_ENGINE, exgauss=False,
+                       breakdowns=False, variables=None):
+    """Take a practice CSV path, dict of raw data CSV paths (keyed by
+    experiment stage) and scoring engine name. Compile the participant's data
+    with every scoring engine. Return tuple of the named engine's compiled
+    data and dict of differences from it (see `compare_compiled_data`), keyed
+    by the other engines' names.
+    """
+    compiled = dict(
+        (name, compile_data.compile_participant(
+            practice_csv, raw_data_csvs, data_dir, engine=name,
+            exgauss=exgauss, breakdowns=breakdowns, variables=variables))
+        for name in sorted(compile_data.ENGINES))
+    participant = compiled.pop(engine)
+
+    differences = {}
+    for name, other_participant in compiled.items():
+        engine_differences = compare_compiled_data(
+            participant, other_participant)
+        if engine_differences:
+            differences[name] = engine_differences
+    return participant, differences
+
+
+def sample_paths(paths, fraction, seed=None):
+    """Take list of paths, a fraction and an optional random seed. Return a
+    set of that fraction of the paths (at least one, for a non-zero
+    fraction), chosen at random.
+    """
+    paths = sorted(paths)
+    if not fraction or not paths:
+        return set()
+    num_paths = min(len(paths), max(1, int(round(fraction * len(paths)))))
+    return set(random.Random(seed).sample(paths, num_paths))
+
+
+def format_engine_differences(differences_by_id,
+                              engine=compile_data.DEFAULT_ENGINE):
+    """Take dict of engine differences (see `verify_participant`), keyed by
+    participant ID, and the verified engine name. Return report string.
+    """
+    lines = []
+    for participant_id in sorted(differences_by_id):
+        for name, differences in sorted(
+                differences_by_id[participant_id].items()):
+            for variable, value, other_value in differences:
+                lines.append('{}\t{}\t{}={!r}\t{}={!r}'.format(
+                    participant_id, variable, engine, value, name,
+                    other_value))
+    return '\n'.join(lines)
+
+
+def generate_sart_trials(random_state, num_trials=None, first_index=None):
+    """Take numpy random state (and optionally the number of trials and first
+    trial index). Return pandas dataframe of random raw SART trials data,
+    including missing and multiple responses, anticipations and skipped
+    trial indices.
+    """
+    if num_trials is None:
+        num_trials = random_state.randint(1, 60)
+    if first_index is None:
+        first_index = random_state.randint(0, 1000)
+    steps = np.where(random_state.rand(num_trials) < 0.05,
+                     random_state.randint(2, 4, num_trials), 1)
+    steps[0] = 0
+    indices = first_index + np.cumsum(steps)
+
+    stimuli = [str(d) for d in random_state.randint(1, 10, num_trials)]
+    rts = []
+    corrects = []
+    for stimulus in stimuli:
+        kind = random_state.randint(0, 10)
+        rt = random_state.randint(0, 1500)
+        if kind == 0:
+            rts.append('[-1]')
+        elif kind == 1:
+            rts.append('[-1,{}]'.format(rt))
+        elif kind == 2:
+            rts.append('[{},{}]'.format(rt, random_state.randint(0, 1500)))
+        else:
+            rts.append('[{}]'.format(rt))
+        is_correct = (stimulus == compile_data.NOGO_STIMULUS) == \
+            (rts[-1] == '[-1]')
+        if random_state.rand() < 0.1:
+            is_correct = not is_correct
+        corrects.append(is_correct)
+
+    df = pd.DataFrame(
+        {'trial_type': compile_data.SART_TRIAL_TYPE, 'stimulus': stimuli,
+         'rt': rts, 'correct': np.array(corrects, dtype=object)},
+        index=pd.Index(indices, name='trial_index'))
+    df['rt_ms'] = compile_data._parse_rts(df['rt'])
+    return df
+
+
+def generate_trial_sequence(random_state, num_blocks=None):
+    """Take numpy random state (and optionally the number of blocks). Return
+    pandas dataframe of trial types, with SART blocks separated by random
+    numbers of survey questions and other trials.
+    """
+    if num_blocks is None:
+        num_blocks = random_state.randint(0, 6)
+    trial_types = []
+    for _ in range(num_blocks):
+        trial_types.extend(['text'] * random_state.randint(0, 3))
+        trial_types.extend(
+            [compile_data.SURVEY_TRIAL_TYPE] * random_state.randint(0, 2))
+        trial_types.extend(
+            [compile_data.SART_TRIAL_TYPE] * random_state.randint(1, 10))
+        trial_types.extend(
+            [compile_data.SURVEY_TRIAL_TYPE] * random_state.randint(0, 5))
+    trial_types.extend(['text'] * random_state.randint(0, 2))
+    return pd.DataFrame(
+        {'trial_type': trial_types},
+        index=pd.Index(np.arange(len(trial_types)), name='trial_index'))
+
+
+def fuzz_engines(num_cases=100, seed=None, engine='fast'):
+    """Take number of cases, random seed and scoring engine name. Compare
+    the engine with the reference engine on randomly generated SART blocks
+    and scoring parameters. Return list of (case number, description)
+    tuples for any differences.
+    """
+    random_state = np.random.RandomState(seed)
+    reference = compile_data.get_engine('reference')
+    other = compile_data.get_engine(engine)
+
+    failures = []
+    for case in range(num_cases):
+        # block segmentation
+        df = generate_trial_sequence(random_state)
+        with_survey = bool(random_state.randint(0, 2))
+        num_questions = random_state.randint(1, 5)
+        blocks = [
+            [list(block.index) for block in get_blocks(
+                df, with_survey=with_survey,
+                num_survey_questions=num_questions)]
+            for get_blocks in [reference.extract_sart_blocks,
+                               other.extract_sart_blocks]]
+        if blocks[0] != blocks[1]:
+            failures.append((case, 'blocks: {!r} != {!r}'.format(*blocks)))
+
+        # block performance
+        df = generate_sart_trials(random_state)
+        scoring = {
+            'anticipation_threshold': random_state.choice([50, 100, 200]),
+            'max_adjacent_rows': random_state.randint(1, 7),
+            'nogo_stimulus': str(random_state.randint(1, 10)),
+        }
+        with warnings.catch_warnings():
+            # e.g., averaging a block without correct responses
+            warnings.simplefilter('ignore', RuntimeWarning)
+            performances = [
+                summarize(df.copy(), **scoring) for summarize in [
+                    reference.summarize_block_performance,
+                    other.summarize_block_performance]]
+        for difference in compare_compiled_data(*performances):
+            failures.append((case, '{}: {!r} != {!r} ({})'.format(
+                difference[0], difference[1], difference[2], scoring)))
+
+        # rating changes
+        ratings = random_state.randint(
+            0, 8, random_state.randint(2, 10)).tolist()
+        proportions = [
+            calculate(ratings) for calculate in [
+                reference.calculate_ratings_proportions,
+                other.calculate_ratings_proportions]]
+        if proportions[0] != proportions[1]:
+            failures.append((case, 'ratings {!r}: {!r} != {!r}'.format(
+                ratings, *proportions)))
+
+    return failures
+
+
+def _time_call(func, args, kwargs, repeat):
+    """Return the shortest time (in seconds) of `repeat` calls.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func(*args, **kwargs)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def benchmark_engines(num_trials=2000, num_blocks=200, num_ratings=1000,
+                      repeat=3, seed=0):
+    """Take sizes of generated data (SART trials, blocks and ratings), number
+    of repeats and random seed. Time the scoring engines' kernelled functions
+    under each available kernel backend (see ``kernels.py``), after a warm-up
+    call. Return list of (function name, implementation, seconds) tuples.
+    """
+    random_state = np.random.RandomState(seed)
+    cases = [
+        ('extract_sart_blocks',
+         (generate_trial_sequence(random_state, num_blocks),),
+         {'with_survey': True}),
+        ('summarize_block_performance',
+         (generate_sart_trials(random_state, num_trials, first_index=1),),
+         {}),
+        ('calculate_ratings_proportions',
+         (random_state.randint(1, 8, num_ratings).tolist(),), {}),
+    ]
+
+    selected_backend = kernels.BACKEND
+    timings = []
+    try:
+        for name, args, kwargs in cases:
+            func = getattr(compile_data.get_engine('reference'), name)
+            timings.append((name, 'reference', _time_call(
+                func, args, kwargs, repeat)))
+            for backend in sorted(kernels.BACKENDS):
+                kernels.set_backend(backend)
+                func = getattr(compile_data.get_engine('fast'), name)
+                func(*args, **kwargs)
+                timings.append((name, 'fast/{}'.format(backend), _time_call(
+                    func, args, kwargs, repeat)))
+    finally:
+        kernels.set_backend(selected_backend)
+    return timings
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Event-locked reaction time windows: RTs of the trials before and after
+events (e.g., errors or survey probes), for post-event slowing analyses.
+
+Events are given as a boolean mask over parsed trial arrays (trial indices
+and RTs, NaN where there is no response), and windows as offsets from each
+event, in trial index steps. Trials may be split into segments (e.g.,
+blocks), which windows don't cross. Every event's window is looked up at
+once, by sorted search over (segment, trial index) keys, so any number of
+events are summarized in one pass.
+
+RTs before and after no-go errors (`compile_data.summarize_block_performance`)
+are the special case of no-go error events in one block, with windows of
+`compile_data.MAX_ADJACENT_ROWS` trials either side.
+"""
+import numpy as np
+
+
+def get_window_offsets(num_prev, num_next, include_event=False):
+    """Take number of trials before and after events, and whether the window
+    after an event starts at the event's own trial. Return tuple of arrays
+    of offsets before (nearest first) and after events.
+    """
+    first_next = 0 if include_event else 1
+    return (-np.arange(1, num_prev + 1),
+            np.arange(first_next, first_next + num_next))
+
+
+def _get_segment_positions(segments, num_trials):
+    """Take array of segment labels (or None) and number of trials. Return
+    tuple of each trial's segment position and arrays of each segment's
+    first and last trial positions.
+    """
+    if segments is None:
+        return (np.zeros(num_trials, np.int64), np.array([0]),
+                np.array([num_trials - 1]))
+    segments = np.asarray(segments)
+    is_start = np.concatenate([[True], segments[1:] != segments[:-1]])
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], num_trials) - 1
+    return np.cumsum(is_start) - 1, starts, ends
+
+
+def get_event_locked_rts(indices, rts_ms, events, offsets, segments=None):
+    """Take arrays of trial indices (increasing within segments), parsed RTs
+    (NaN for no response) and events (boolean), array of offsets from events
+    (in trial index steps) and, optionally, array of segment labels (each
+    segment's trials contiguous). Return events-by-offsets array of the RTs
+    at each offset from each event (NaN where there is no trial or response,
+    or the offset falls outside the event's segment).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    rts_ms = np.asarray(rts_ms, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    event_positions = np.flatnonzero(events)
+    window_rts = np.full((len(event_positions), len(offsets)), np.nan)
+    if not len(event_positions) or not len(offsets):
+        return window_rts
+
+    segment_positions, starts, ends = _get_segment_positions(
+        segments, len(indices))
+    event_segments = segment_positions[event_positions]
+    targets = indices[event_positions, np.newaxis] + offsets
+    is_within = \
+        (targets >= indices[starts][event_segments, np.newaxis]) & \
+        (targets <= indices[ends][event_segments, np.newaxis])
+
+    # (segment, trial index) keys, sorted, as segments are contiguous
+    first_index = indices.min()
+    stride = indices.max() - first_index + 1
+    keys = segment_positions * stride + (indices - first_index)
+    target_keys = event_segments[:, np.newaxis] * stride + \
+        np.where(is_within, targets - first_index, 0)
+    positions = np.minimum(np.searchsorted(keys, target_keys), len(keys) - 1)
+    is_trial = is_within & (keys[positions] == target_keys)
+    window_rts[is_trial] = rts_ms[positions[is_trial]]
+    return window_rts
+
+
+def summarize_event_windows(indices, rts_ms, events, num_prev, num_next,
+                            segments=None, include_event=False):
+    """Take arrays of trial indices, parsed RTs and events (see
+    `get_event_locked_rts`), number of trials before and after events, and
+    optionally array of segment labels and whether the window after an
+    event starts at its own trial. Return dict of the number of events
+    (``num_events``), and average and number of RTs before
+    (``prev_rt_avg``, ``num_prev_rts``) and after (``next_rt_avg``,
+    ``num_next_rts``) events (NaN averages where there are no RTs).
+    """
+    summary = {'num_events': int(np.count_nonzero(events))}
+    prev_offsets, next_offsets = get_window_offsets(
+        num_prev, num_next, include_event)
+    for name, offsets in [('prev', prev_offsets), ('next', next_offsets)]:
+        window_rts = get_event_locked_rts(
+            indices, rts_ms, events, offsets, segments)
+        rts = window_rts[~np.isnan(window_rts)]
+        summary['{}_rt_avg'.format(name)] = rts.mean() if len(rts) else \
+            np.nan
+        summary['num_{}_rts'.format(name)] = len(rts)
+    return summary
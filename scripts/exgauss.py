@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Batched ex-Gaussian fits of reaction time (RT) distributions.
+
+An ex-Gaussian variable is the sum of a normal (``mu``, ``sigma``) and an
+exponential (``tau``) variable. Many RT samples (e.g., a participant's blocks,
+or a whole cohort's) are fit at once: the samples are padded into a single
+array, started at method-of-moments estimates and refined together by maximum
+likelihood, taking a damped Newton (Levenberg-Marquardt) step for every
+unfinished fit in each iteration.
+"""
+import numpy as np
+from scipy import special
+
+
+PARAMETERS = ('mu', 'sigma', 'tau')
+# minimum number of RTs per fit
+MIN_RTS = 10
+MAX_ITERATIONS = 200
+TOLERANCE = 1e-10
+# ex-Gaussian skewness is within (0, 2)
+MIN_SKEW = 0.01
+MAX_SKEW = 1.99
+SQRT_2 = np.sqrt(2)
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def _pad_samples(samples):
+    """Take list of RT samples. Return 2D arrays of RTs, padded with zeros,
+    and of weights (1 for RTs, 0 for padding).
+    """
+    sizes = np.array([len(s) for s in samples], dtype=int)
+    rts = np.zeros((len(samples), max(sizes.max(), 1)))
+    weights = np.zeros(rts.shape)
+    for i, sample in enumerate(samples):
+        rts[i, :sizes[i]] = sample
+        weights[i, :sizes[i]] = 1
+    return rts, weights
+
+
+def estimate_moments(rts, weights):
+    """Take padded RT and weight arrays (see `_pad_samples`). Return array of
+    method-of-moments (mu, log sigma, log tau) estimates, one row per sample.
+    """
+    n = weights.sum(axis=1)
+    mean = (rts * weights).sum(axis=1) / n
+    deviations = (rts - mean[:, np.newaxis]) * weights
+    variance = (deviations ** 2).sum(axis=1) / (n - 1)
+    sd = np.sqrt(variance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = (deviations ** 3).sum(axis=1) / n / sd ** 3
+        tau = sd * (np.clip(skew, MIN_SKEW, MAX_SKEW) / 2) ** (1 / 3.0)
+        sigma = np.sqrt(np.maximum(variance - tau ** 2, 0.01 * variance))
+        return np.column_stack([mean - tau, np.log(sigma), np.log(tau)])
+
+
+def _get_terms(rts, params):
+    """Return deviations from ``mu``, sigma, tau, z scores of the normal
+    CDF term and log-likelihoods of each RT.
+
+    For negative z, the exponential and normal CDF terms nearly cancel; they
+    are combined analytically (with the scaled complementary error function)
+    to keep the log-likelihoods accurate.
+    """
+    mu, sigma, tau = [p[:, np.newaxis] for p in (
+        params[:, 0], np.exp(params[:, 1]), np.exp(params[:, 2]))]
+    deviations = rts - mu
+    z = deviations / sigma - sigma / tau
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        log_likelihoods = np.where(
+            z < 0,
+            -np.log(tau) - deviations ** 2 / (2 * sigma ** 2) +
+            np.log(special.erfcx(-z / SQRT_2) / 2),
+            -np.log(tau) - deviations / tau + sigma ** 2 / (2 * tau ** 2) +
+            special.log_ndtr(z))
+    return deviations, sigma, tau, z, log_likelihoods
+
+
+def _log_likelihoods(rts, weights, params):
+    log_likelihoods = _get_terms(rts, params)[-1]
+    return (log_likelihoods * weights).sum(axis=1)
+
+
+def _gradients(rts, weights, params):
+    """Return gradients of the log-likelihoods with respect to (mu,
+    log sigma, log tau).
+    """
+    deviations, sigma, tau, z, _ = _get_terms(rts, params)
+    # ratio of the normal density to the normal CDF at z
+    with np.errstate(over='ignore', invalid='ignore'):
+        mills = np.where(
+            z < 0, 2 / (SQRT_2PI * special.erfcx(-z / SQRT_2)),
+            np.exp(-z ** 2 / 2 - special.log_ndtr(z)) / SQRT_2PI)
+    d_mu = 1 / tau - mills / sigma
+    d_sigma = sigma / tau ** 2 - mills * (deviations / sigma ** 2 + 1 / tau)
+    d_tau = (-1 / tau + deviations / tau ** 2 - sigma ** 2 / tau ** 3 +
+             mills * sigma / tau ** 2)
+    return np.column_stack([
+        (d_mu * weights).sum(axis=1),
+        (d_sigma * sigma * weights).sum(axis=1),
+        (d_tau * tau * weights).sum(axis=1)])
+
+
+def _hessians(rts, weights, params):
+    """Return Hessians of the log-likelihoods, by central differences of
+    their gradients.
+    """
+    hessians = np.empty((len(params), 3, 3))
+    for j in range(3):
+        step = 1e-5 * np.maximum(np.abs(params[:, j]), 1)
+        params_up = params.copy()
+        params_up[:, j] += step
+        params_down = params.copy()
+        params_down[:, j] -= step
+        hessians[:, :, j] = (
+            _gradients(rts, weights, params_up) -
+            _gradients(rts, weights, params_down)) / (2 * step[:, np.newaxis])
+    return (hessians + hessians.transpose(0, 2, 1)) / 2
+
+
+def _maximize_likelihoods(rts, weights, params):
+    """Take padded RT and weight arrays and starting parameters. Refine every
+    fit's parameters in place, until no fit's log-likelihood improves.
+    """
+    log_likelihoods = _log_likelihoods(rts, weights, params)
+    damping = np.full(len(params), 1e-3)
+    is_active = np.isfinite(log_likelihoods)
+
+    for _ in range(MAX_ITERATIONS):
+        active = np.flatnonzero(is_active)
+        if not len(active):
+            break
+        active_rts, active_weights = rts[active], weights[active]
+        active_params = params[active]
+
+        gradients = _gradients(active_rts, active_weights, active_params)
+        hessians = _hessians(active_rts, active_weights, active_params)
+        is_finite = np.isfinite(hessians).all(axis=(1, 2)) & \
+            np.isfinite(gradients).all(axis=1)
+        hessians[~is_finite] = 0
+        gradients[~is_finite] = 0
+
+        # damped Newton step (towards gradient ascent as damping grows)
+        diagonals = np.abs(hessians[:, range(3), range(3)])
+        curvatures = -hessians
+        curvatures[:, range(3), range(3)] += \
+            damping[active, np.newaxis] * np.maximum(diagonals, 1e-12)
+        steps = np.einsum(
+            'nij,nj->ni', np.linalg.pinv(curvatures), gradients)
+        new_params = active_params + steps
+        new_log_likelihoods = _log_likelihoods(
+            active_rts, active_weights, new_params)
+
+        old_log_likelihoods = log_likelihoods[active]
+        is_better = np.isfinite(new_log_likelihoods) & \
+            (new_log_likelihoods > old_log_likelihoods)
+        improved = active[is_better]
+        params[improved] = new_params[is_better]
+        log_likelihoods[improved] = new_log_likelihoods[is_better]
+        damping[improved] /= 10
+        damping[active[~is_better]] *= 10
+
+        is_converged = ~is_better & (damping[active] > 1e12)
+        is_converged |= is_better & (
+            new_log_likelihoods - old_log_likelihoods <
+            TOLERANCE * (1 + np.abs(old_log_likelihoods)))
+        is_converged |= ~is_finite
+        is_active[active[is_converged]] = False
+
+    return params
+
+
+def fit_exgauss(samples, min_rts=MIN_RTS):
+    """Take list of RT samples (e.g., arrays of correct-trial RTs). Return
+    array of maximum-likelihood ex-Gaussian (mu, sigma, tau) estimates, one
+    row per sample; rows are NaN for samples with fewer than `min_rts` RTs
+    (or with no spread).
+    """
+    parameters = np.full((len(samples), len(PARAMETERS)), np.nan)
+    samples = [np.asarray(s, dtype=float) for s in samples]
+    samples = [s[np.isfinite(s)] for s in samples]
+    fitted = [i for i, s in enumerate(samples)
+              if len(s) >= max(min_rts, 2) and s.std() > 0]
+    if not fitted:
+        return parameters
+
+    rts, weights = _pad_samples([samples[i] for i in fitted])
+    # steps may overshoot (to be rejected) while a fit approaches a boundary
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        params = _maximize_likelihoods(rts, weights, estimate_moments(
+            rts, weights))
+    parameters[fitted] = np.column_stack([
+        params[:, 0], np.exp(params[:, 1]), np.exp(params[:, 2])])
+    return parameters
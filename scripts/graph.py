@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Variable dependency graphs: compile only the variables asked for.
+
+A graph's nodes are the steps of compiling a stage's data (e.g., extracting
+SART blocks, or summarizing each block). Each node names the nodes whose
+values it takes (``requires``) and the compiled variables it outputs, if
+any (``provides``, as variable names or regular expressions, e.g., for
+numbered families). Nodes are added in dependency order, so a node's
+requirements always come before it.
+
+To compile some variables, only the nodes providing them and the nodes those
+require are evaluated, in order, each once: intermediates shared by several
+outputs (e.g., block summaries) are computed once per evaluation.
+"""
+import re
+from collections import OrderedDict, namedtuple
+
+
+Node = namedtuple('Node', ['name', 'func', 'requires', 'provides'])
+
+
+class VariableGraph(object):
+    """A dependency graph of the steps compiling a stage's variables.
+    """
+
+    def __init__(self, inputs=()):
+        self.inputs = list(inputs)
+        self.nodes = OrderedDict()
+        self._patterns = []
+
+    def add(self, name, func, requires=(), provides=()):
+        """Add node, computed by calling `func` with the values of the
+        required inputs and nodes (in order). Nodes providing variables
+        return dicts of them.
+        """
+        if name in self.nodes or name in self.inputs:
+            raise ValueError('Duplicate node: {}'.format(name))
+        for requirement in requires:
+            if requirement not in self.nodes and \
+                    requirement not in self.inputs:
+                raise ValueError('Unknown requirement of {}: {}'.format(
+                    name, requirement))
+        self.nodes[name] = Node(name, func, tuple(requires), tuple(provides))
+        for pattern in provides:
+            self._patterns.append((re.compile(pattern + '$'), name))
+
+    def get_provider(self, variable):
+        """Take variable name. Return the name of the node providing it (None
+        if no node does).
+        """
+        for regex, name in self._patterns:
+            if regex.match(variable):
+                return name
+        return None
+
+    def provides_any(self, variables):
+        """Take variable names (None for all). Return whether the graph
+        provides any of them.
+        """
+        if variables is None:
+            return True
+        return any(self.get_provider(v) is not None for v in variables)
+
+    def resolve(self, variables=None):
+        """Take variable names (None for all). Return list of the names of
+        the nodes to evaluate for them, in dependency order.
+        """
+        if variables is None:
+            return list(self.nodes)
+        required = set()
+        pending = [self.get_provider(v) for v in variables]
+        while pending:
+            name = pending.pop()
+            if name is None or name in required or name in self.inputs:
+                continue
+            required.add(name)
+            pending.extend(self.nodes[name].requires)
+        return [name for name in self.nodes if name in required]
+
+    def evaluate(self, inputs, variables=None, values=None):
+        """Take dict of input values and variable names (None for all).
+        Evaluate the nodes needed for the variables (nodes already given as
+        inputs are not evaluated). Return dict of the variables provided by
+        the evaluated nodes (all of each node's variables, not only those
+        asked for).
+
+        With a dict of `values`, the inputs and the values of the nodes
+        evaluated are also stored in it (e.g., to pass some of them in as
+        inputs of a later evaluation).
+        """
+        if values is None:
+            values = {}
+        values.update(inputs)
+        compiled_data = {}
+        for name in self.resolve(variables):
+            node = self.nodes[name]
+            if name not in values:
+                values[name] = node.func(
+                    *[values[requirement] for requirement in node.requires])
+            if node.provides:
+                compiled_data.update(values[name])
+        return compiled_data
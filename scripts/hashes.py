@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Row hashes and column checksums of compiled outputs, for finding what
+changed between successive compiles.
+
+A snapshot holds a hash of each participant's compiled row (keyed by ID)
+and a checksum of each column. A cell is hashed with its participant ID,
+variable name and value, and a column's checksum is the sum of its cells'
+hashes (modulo 2 ** 64), so moving a value between participants changes it
+too. Values are formatted the same way whether they come from compiled data
+or a compiled CSV (missing values are left out), so snapshots don't depend
+on how the output was read or written.
+
+Snapshots are saved as JSON beside the compiled output (see
+`get_hashes_path`), and the one they replace is kept (see
+`get_previous_hashes_path`). Diffing two snapshots (see `diff_hashes`)
+only compares their hashes, without reading any compiled data, so
+downstream jobs can find the participants to reprocess cheaply.
+"""
+import os
+import json
+import hashlib
+import numbers
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts import compile_data
+except ImportError:  # run as a script
+    import compile_data
+
+
+CHECKSUM_MODULUS = 2 ** 64
+
+
+def format_value(value):
+    """Take compiled value. Return its canonical string (None for missing
+    values). Numbers, and strings of numbers (e.g., survey responses, which
+    are read back from CSV as numbers), are formatted as floats, so ``3``,
+    ``3.0`` (e.g., an integer column read with missing values) and ``'3'``
+    hash the same.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return repr(bool(value))
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    if not isinstance(value, numbers.Number):
+        try:
+            value = float(value)
+        except ValueError:
+            return value
+    value = float(value)
+    if value != value:
+        return None
+    return repr(value)
+
+
+def _hash(*parts):
+    return hashlib.sha1(
+        u'\0'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def hash_participant(participant):
+    """Take compiled participant data dict. Return tuple of its row hash and
+    dict of its cells' hashes (as integers), keyed by variable name.
+    """
+    participant_id = u'{}'.format(participant['id'])
+    cells = []
+    cell_hashes = {}
+    for name in sorted(participant):
+        value = format_value(participant[name])
+        if value is None:
+            continue
+        cells.append(u'{}={}'.format(name, value))
+        cell_hashes[name] = int(_hash(participant_id, name, value), 16)
+    return _hash(*cells), cell_hashes
+
+
+def hash_participants(participants):
+    """Take iterable of compiled participant data dicts. Return snapshot
+    dict of their row hashes (``participants``, keyed by ID) and column
+    checksums (``columns``, as hex strings).
+    """
+    row_hashes = {}
+    checksums = {}
+    for participant in participants:
+        row_hash, cell_hashes = hash_participant(participant)
+        row_hashes[u'{}'.format(participant['id'])] = row_hash
+        for name, cell_hash in cell_hashes.items():
+            checksums[name] = (
+                checksums.get(name, 0) + cell_hash) % CHECKSUM_MODULUS
+    return {
+        'participants': row_hashes,
+        'columns': dict(
+            (name, '{:016x}'.format(checksum))
+            for name, checksum in checksums.items()),
+    }
+
+
+def hash_compiled_csv(path):
+    """Take compiled CSV path. Return snapshot of its rows (see
+    `hash_participants`).
+    """
+    df = pd.read_csv(path, index_col=0, dtype={'id': str},
+                     float_precision='round_trip')
+    return hash_participants(df.to_dict(orient='records'))
+
+
+def get_hashes_path(output_path):
+    """Take compiled output path. Return the path of its hashes (e.g.,
+    ``compiled-hashes.json`` for ``compiled.csv``).
+    """
+    return '{}-hashes.json'.format(os.path.splitext(output_path)[0])
+
+
+def get_previous_hashes_path(output_path):
+    """Take compiled output path. Return the path of the hashes of its
+    previous compile (e.g., ``compiled-hashes-previous.json``).
+    """
+    return '{}-hashes-previous.json'.format(
+        os.path.splitext(output_path)[0])
+
+
+def save_hashes(hashes, path):
+    """Write snapshot to JSON (replacing the file once written, see
+    `compile_data.save_json`).
+    """
+    compile_data.save_json(hashes, path)
+
+
+def update_hashes(output_path):
+    """Take compiled output path. Hash the output and save the snapshot
+    beside it, keeping the snapshot it replaces as the previous one. Return
+    the snapshot.
+    """
+    hashes_path = get_hashes_path(output_path)
+    hashes = hash_compiled_csv(output_path)
+    if os.path.exists(hashes_path):
+        previous_path = get_previous_hashes_path(output_path)
+        if os.path.exists(previous_path):
+            os.remove(previous_path)
+        os.rename(hashes_path, previous_path)
+    save_hashes(hashes, hashes_path)
+    return hashes
+
+
+def load_hashes(path):
+    """Take path of saved hashes (``.json``) or of a compiled CSV (whose
+    saved hashes are used, if any, or which is hashed). Return snapshot.
+    """
+    if not path.endswith('.json'):
+        hashes_path = get_hashes_path(path)
+        if not os.path.exists(hashes_path):
+            return hash_compiled_csv(path)
+        path = hashes_path
+    with open(path) as f:
+        return json.load(f)
+
+
+def _diff_keys(old, new):
+    return {
+        'added': sorted(set(new) - set(old)),
+        'removed': sorted(set(old) - set(new)),
+        'changed': sorted(k for k in set(old) & set(new) if old[k] != new[k]),
+    }
+
+
+def diff_hashes(old, new):
+    """Take old and new snapshots. Return dict of the participants and the
+    variables added, removed and changed (sorted lists, under ``added``,
+    ``removed`` and ``changed``), keyed by ``participants`` and
+    ``variables``.
+    """
+    return {
+        'participants': _diff_keys(old['participants'], new['participants']),
+        'variables': _diff_keys(old['columns'], new['columns']),
+    }
+
+
+def has_differences(diff):
+    return any(
+        keys for kind in diff.values() for keys in kind.values())
+
+
+def format_diff(diff):
+    """Take diff (see `diff_hashes`). Return report string, one line per
+    added, removed or changed participant and variable.
+    """
+    lines = []
+    for kind in ['participants', 'variables']:
+        for change in ['added', 'removed', 'changed']:
+            for key in diff[kind][change]:
+                lines.append(u'{}\t{}\t{}'.format(change, kind[:-1], key))
+    return u'\n'.join(lines)
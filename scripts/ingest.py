@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compile jsSART (jsPsych) data straight from the JSON payloads posted to
+the server's ``/experiment-data`` route, without the CSV round trip.
+
+Payloads are read from a file or stdin, or received by a local stand-in for
+the Node server's data route.
+"""
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+import threading
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+try:
+    from scripts import compile_data
+except ImportError:  # run as a script
+    import compile_data
+
+
+EXP_STAGES = ['practice', 'experiment', 'follow_up']
+PAYLOAD_KEYS = ['pathname', 'filename', 'data']
+# participant IDs (and so raw data file name stems) are word characters
+PARTICIPANT_ID_PATTERN = re.compile(r'^[\w-]+$')
+
+
+def read_payload(fileobj):
+    """Take file object containing a JSON payload, as posted to the server.
+    Return payload dict.
+    """
+    return validate_payload(json.load(fileobj))
+
+
+def validate_payload(payload):
+    """Take decoded payload and check its shape. Return payload dict.
+    """
+    missing_keys = [k for k in PAYLOAD_KEYS if k not in payload]
+    if missing_keys:
+        raise ValueError('Payload is missing key(s): {}'.format(
+            ', '.join(missing_keys)))
+    if payload['pathname'] not in EXP_STAGES:
+        raise ValueError('Unknown experiment stage: {}'.format(
+            payload['pathname']))
+    if not PARTICIPANT_ID_PATTERN.match(u'{}'.format(payload['filename'])):
+        raise ValueError('Invalid file name: {}'.format(payload['filename']))
+    return payload
+
+
+def get_payload_as_dataframe(payload):
+    """Take payload dict. Return pandas dataframe of its trial data.
+    """
+    return compile_data.get_records_as_dataframe(payload['data'])
+
+
+def compile_stage_data(exp_stage, df, passed_practice=True):
+    """Take experiment stage and pandas dataframe and compile the stage's key
+    variables. Retrospective questions are only compiled for participants who
+    passed practice. Return dict.
+    """
+    if exp_stage == 'practice':
+        return compile_data.compile_practice_data(df)
+    elif exp_stage == 'experiment':
+        return compile_data.compile_experiment_data(df)
+    elif exp_stage == 'follow_up':
+        compiled_data = compile_data.compile_demographic_data(df)
+        if passed_practice:
+            compiled_data.update(compile_data.compile_retrospective_data(df))
+        return compiled_data
+    raise ValueError('Unknown experiment stage: {}'.format(exp_stage))
+
+
+def compile_payload(payload, passed_practice=True):
+    """Take payload dict and compile the participant's stage data.
+    Return dict.
+    """
+    df = get_payload_as_dataframe(payload)
+    return compile_stage_data(payload['pathname'], df, passed_practice)
+
+
+def write_payload_csv(payload, data_dir):
+    """Take payload dict and base data directory and save the trial data as
+    CSV, as the server does. The payload is validated first, so its stage
+    and file name can't point outside the data directory. Return CSV path.
+    """
+    validate_payload(payload)
+    csv_path = os.path.join(
+        data_dir, payload['pathname'], '{}.csv'.format(payload['filename']))
+    with open(csv_path, 'wb' if sys.version_info[0] < 3 else 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(compile_data.RAW_DATA_COLUMNS)
+        for record in payload['data']:
+            writer.writerow([
+                _encode(compile_data._get_record_value_as_text(
+                    record.get(column)))
+                for column in compile_data.RAW_DATA_COLUMNS])
+    return csv_path
+
+
+def _encode(text):
+    if sys.version_info[0] < 3:
+        return text.encode('utf-8')
+    return text
+
+
+def _json_default(obj):
+    """Make numpy values JSON serializable.
+    """
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    raise TypeError('{!r} is not JSON serializable'.format(obj))
+
+
+def dumps(compiled_data):
+    """Take compiled data dict. Return JSON string.
+    """
+    return json.dumps(compiled_data, default=_json_default, sort_keys=True)
+
+
+class ExperimentDataHandler(BaseHTTPRequestHandler):
+    """A stand-in for the server's ``POST /experiment-data`` route, which
+    compiles the posted stage and responds with the compiled data as JSON.
+    Set `data_dir` on the server to also save the raw data as CSV.
+    """
+
+    def do_POST(self):
+        if self.path != '/experiment-data':
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        try:
+            payload = validate_payload(json.loads(body.decode('utf-8')))
+            compiled_data = compile_payload(payload)
+        except Exception as e:
+            self.send_error(400, str(e))
+            return
+
+        data_dir = getattr(self.server, 'data_dir', None)
+        if data_dir:
+            write_payload_csv(payload, data_dir)
+
+        response = dumps(compiled_data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=3001, data_dir=None):
+    """Take host, port and optional base data directory. Return HTTP server
+    (not yet serving) for the stand-in data route.
+    """
+    server = HTTPServer((host, port), ExperimentDataHandler)
+    server.data_dir = data_dir
+    return server
+
+
+def serve_in_thread(server):
+    """Take HTTP server and serve it from a daemon thread. Return thread.
+    """
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'payload', nargs='?', default='-',
+        help='JSON payload file (default: read from stdin)')
+    parser.add_argument(
+        '--failed-practice', action='store_true',
+        help='skip retrospective questions when compiling follow-up data')
+    parser.add_argument(
+        '--serve', action='store_true',
+        help='run a local stand-in for the /experiment-data route')
+    parser.add_argument('--port', type=int, default=3001)
+    parser.add_argument(
+        '--data-dir',
+        help='with --serve, also save posted data as CSV in this directory')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        server = make_server(port=args.port, data_dir=args.data_dir)
+        print('Listening on port {}'.format(server.server_address[1]))
+        server.serve_forever()
+        return
+
+    if args.payload == '-':
+        payload = read_payload(sys.stdin)
+    else:
+        with open(args.payload) as f:
+            payload = read_payload(f)
+    compiled_data = compile_payload(
+        payload, passed_practice=not args.failed_practice)
+    print(dumps(compiled_data))
+
+
+if __name__ == '__main__':
+    main()
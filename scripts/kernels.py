@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Kernels for the sequential loops of the fast scoring engine (see
+``compile_data.ENGINES``): survey-capped block segmentation, the walk over
+trials adjacent to no-go errors and rating change counts. Kernels take plain
+integer/float arrays, parsed beforehand.
+
+Kernels are compiled with Numba where it is installed; otherwise NumPy
+(or, for block segmentation, plain Python) implementations are used. Set the
+``JSSART_KERNELS`` environment variable to ``numpy`` or ``numba`` to choose.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from scripts import events
+except ImportError:  # run as a script
+    import events
+
+try:
+    import numba
+except ImportError:  # optional dependency
+    numba = None
+
+
+Backend = namedtuple('Backend', [
+    'segment_blocks', 'get_nogo_adjacent_rts', 'count_rating_changes'])
+
+
+def _segment_blocks_loop(indices, is_mc_trial, is_block_trial,
+                         num_survey_questions):
+    """Scan trials as `compile_data.extract_sart_blocks` does. A trial index
+    of 0 stands for "no trial", just as the reference treats the (falsy)
+    trial index 0.
+    """
+    num_trials = len(indices)
+    first_indices = np.empty(num_trials, np.int64)
+    last_indices = np.empty(num_trials, np.int64)
+    num_blocks = 0
+
+    first_trial_idx = 0
+    last_trial_idx = 0
+    num_mc_trials = 0
+    for i in range(num_trials):
+        if first_trial_idx == 0 and is_mc_trial[i]:
+            continue
+        elif is_block_trial[i] and num_mc_trials < num_survey_questions:
+            if first_trial_idx == 0:
+                first_trial_idx = indices[i]
+            last_trial_idx = indices[i]
+            if is_mc_trial[i]:
+                num_mc_trials += 1
+        elif first_trial_idx != 0 and last_trial_idx != 0:
+            first_indices[num_blocks] = first_trial_idx
+            last_indices[num_blocks] = last_trial_idx
+            num_blocks += 1
+            first_trial_idx = 0
+            last_trial_idx = 0
+            num_mc_trials = 0
+
+    return first_indices[:num_blocks], last_indices[:num_blocks]
+
+
+def _segment_blocks_python(indices, is_mc_trial, is_block_trial,
+                           num_survey_questions):
+    return _segment_blocks_loop(
+        np.asarray(indices).tolist(), np.asarray(is_mc_trial).tolist(),
+        np.asarray(is_block_trial).tolist(), num_survey_questions)
+
+
+def _get_nogo_adjacent_rts_loop(indices, rts_ms, error_positions,
+                                max_adjacent_rows):
+    """Walk the trial indices before and after each no-go error, as
+    `compile_data._calculate_nogo_error_rt_avgs` does.
+    """
+    num_trials = len(indices)
+    max_rts = len(error_positions) * max_adjacent_rows
+    adjacent_rts = (np.empty(max_rts), np.empty(max_rts))
+    num_rts = [0, 0]
+
+    for direction in range(2):
+        step = -1 if direction == 0 else 1
+        break_idx = indices[0] if direction == 0 else indices[num_trials - 1]
+        rts = adjacent_rts[direction]
+        for error_position in error_positions:
+            row_idx = indices[error_position]
+            position = error_position
+            num_rows = 0
+            while num_rows < max_adjacent_rows and row_idx != break_idx:
+                row_idx += step
+                # move to the row at (or just past) the adjacent trial index
+                while 0 <= position + step < num_trials and \
+                        (row_idx - indices[position]) * step > 0:
+                    position += step
+                if indices[position] == row_idx and \
+                        not np.isnan(rts_ms[position]):
+                    rts[num_rts[direction]] = rts_ms[position]
+                    num_rts[direction] += 1
+                num_rows += 1
+
+    return adjacent_rts[0][:num_rts[0]], adjacent_rts[1][:num_rts[1]]
+
+
+def _get_nogo_adjacent_rts_numpy(indices, rts_ms, error_positions,
+                                 max_adjacent_rows):
+    """Look up every trial index adjacent to a no-go error at once, as
+    event-locked RT windows of the block (see ``events.py``).
+    """
+    errors = np.zeros(len(indices), bool)
+    errors[error_positions] = True
+    adjacent_rts = []
+    for offsets in events.get_window_offsets(
+            max_adjacent_rows, max_adjacent_rows):
+        # each error's adjacent RTs, nearest first
+        rts = events.get_event_locked_rts(
+            indices, rts_ms, errors, offsets).ravel()
+        adjacent_rts.append(rts[~np.isnan(rts)])
+    return tuple(adjacent_rts)
+
+
+def _count_rating_changes_loop(ratings):
+    """Count increases, decreases and no-changes between consecutive ratings,
+    as `compile_data._calculate_ratings_proportions` does (skipping changes
+    from a 0 rating).
+    """
+    ups = 0
+    downs = 0
+    sames = 0
+    for i in range(1, len(ratings)):
+        if ratings[i - 1] == 0:
+            continue
+        if ratings[i] > ratings[i - 1]:
+            ups += 1
+        elif ratings[i] < ratings[i - 1]:
+            downs += 1
+        else:
+            sames += 1
+    return ups, downs, sames
+
+
+def _count_rating_changes_numpy(ratings):
+    ratings = np.asarray(ratings, dtype=float)
+    previous = ratings[:-1]
+    current = ratings[1:]
+    is_change = (previous != 0)
+    ups = int((is_change & (current > previous)).sum())
+    downs = int((is_change & (current < previous)).sum())
+    return ups, downs, int(is_change.sum()) - ups - downs
+
+
+BACKENDS = {
+    'numpy': Backend(_segment_blocks_python, _get_nogo_adjacent_rts_numpy,
+                     _count_rating_changes_numpy),
+}
+
+if numba is not None:
+    BACKENDS['numba'] = Backend(
+        numba.njit(_segment_blocks_loop),
+        numba.njit(_get_nogo_adjacent_rts_loop),
+        numba.njit(_count_rating_changes_loop))
+
+BACKEND = os.environ.get(
+    'JSSART_KERNELS', 'numba' if numba is not None else 'numpy')
+
+
+def get_backend(name=None):
+    """Take kernel backend name (by default, the selected backend). Return
+    `Backend`.
+    """
+    name = name or BACKEND
+    if name not in BACKENDS:
+        raise ValueError('Unavailable kernel backend: {} (expected one of: '
+                         '{})'.format(name, ', '.join(sorted(BACKENDS))))
+    return BACKENDS[name]
+
+
+def set_backend(name):
+    """Take kernel backend name and select it.
+    """
+    global BACKEND
+    get_backend(name)
+    BACKEND = name
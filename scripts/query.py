@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""A local, read-only HTTP/JSON service for compiled participant metrics,
+e.g., for dashboards polling a participant's results right after they
+finish.
+
+Participants are compiled on demand from their raw data files and kept in an
+LRU cache keyed by the files' modification times, so a participant is only
+recompiled when their data changes (a participant whose data fails to
+compile is cached as a failure, and served as a ``500`` error). Cohort
+summaries (see ``cohort.py``) are computed from the compiled CSV, held in
+memory until it changes.
+
+Routes (all ``GET``):
+
+- ``/participants/<id>``: compiled data (``?vars=a,b`` for some variables)
+- ``/cohort``: cohort summary (``?resamples=N&seed=S``)
+- ``/cache``: cache statistics
+"""
+import os
+import argparse
+import threading
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:  # Python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+try:
+    from scripts import cohort, compile_data, ingest, sources
+except ImportError:  # run as a script
+    import cohort
+    import compile_data
+    import ingest
+    import sources
+
+
+CACHE_SIZE = 256
+SUMMARY_CACHE_SIZE = 16
+SUMMARY_SEED = 0
+MAX_RESAMPLES = 100000
+
+
+class CompileError(Exception):
+    """A participant's data failed to compile. `failure` is the failure
+    dict (see `compile_data.get_failure`).
+    """
+
+    def __init__(self, failure):
+        Exception.__init__(self, failure['error'])
+        self.failure = failure
+
+
+class MetricsService(object):
+    """Compile participants on demand and summarize the cohort, caching
+    results in memory. Caches are locked, so the service can be used from
+    several threads; compiling and summarizing happen outside the lock.
+    """
+
+    def __init__(self, data_dir=compile_data.DATA_DIR, compiled_path=None,
+                 cache_size=CACHE_SIZE, engine=compile_data.DEFAULT_ENGINE):
+        self.data_dir = data_dir
+        self.compiled_path = compiled_path or \
+            compile_data._get_default_output_path(data_dir)
+        self.engine = engine
+        self.participants = compile_data.LRUCache(cache_size)
+        self.summaries = compile_data.LRUCache(SUMMARY_CACHE_SIZE)
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def get_participant(self, participant_id):
+        """Take participant ID. Return compiled data dict (None if the
+        participant has no practice data file). Raise `CompileError` if the
+        participant's data fails to compile.
+        """
+        if not ingest.PARTICIPANT_ID_PATTERN.match(participant_id):
+            raise ValueError('Invalid participant ID: {}'.format(
+                participant_id))
+        raw_data_csvs = compile_data.find_raw_data_csvs(
+            self.data_dir, ids=[participant_id])
+        if not raw_data_csvs['practice']:
+            return None
+
+        # participants are recompiled when any of their files change
+        file_mtimes = tuple(sorted(
+            (path, sources.get_mtime(path))
+            for paths in raw_data_csvs.values() for path in paths))
+        key = (participant_id, file_mtimes)
+        with self._lock:
+            cached = self.participants.get(key)
+        if cached is None:
+            practice_csv = sorted(raw_data_csvs['practice'])[0]
+            try:
+                cached = (compile_data.compile_participant(
+                    practice_csv, raw_data_csvs, self.data_dir,
+                    engine=self.engine), None)
+            except Exception as e:
+                cached = (None, compile_data.get_failure(practice_csv, e))
+            with self._lock:
+                self.participants.set(key, cached)
+
+        participant, failure = cached
+        if failure is not None:
+            raise CompileError(failure)
+        return participant
+
+    def _get_compiled_dataframe(self):
+        """Return tuple of the compiled CSV's modification time and pandas
+        dataframe, read again only when the file changes (None if absent).
+        """
+        if not os.path.exists(self.compiled_path):
+            return None
+        mtime = os.path.getmtime(self.compiled_path)
+        if self._compiled is None or self._compiled[0] != mtime:
+            df = compile_data.pd.read_csv(
+                self.compiled_path, index_col=0, dtype={'id': str})
+            self._compiled = (mtime, df)
+        return self._compiled
+
+    def get_cohort_summary(self, num_resamples=cohort.NUM_RESAMPLES,
+                           seed=SUMMARY_SEED):
+        """Take number of bootstrap resamples and random seed. Return pandas
+        dataframe of the cohort summary (None without a compiled CSV).
+        """
+        if not 0 < num_resamples <= MAX_RESAMPLES:
+            raise ValueError('Number of resamples must be from 1 to {}'.format(
+                MAX_RESAMPLES))
+        with self._lock:
+            compiled = self._get_compiled_dataframe()
+            if compiled is None:
+                return None
+            key = (compiled[0], num_resamples, seed)
+            summary_df = self.summaries.get(key)
+        if summary_df is None:
+            summary_df = cohort.summarize_cohort(
+                compiled[1], num_resamples=num_resamples, seed=seed)
+            with self._lock:
+                self.summaries.set(key, summary_df)
+        return summary_df
+
+    def cache_info(self):
+        with self._lock:
+            return {
+                'participants': self.participants.info(),
+                'summaries': self.summaries.info(),
+            }
+
+
+def _without_nans(value):
+    """Take JSON-serializable value. Return it with NaNs replaced by None.
+    """
+    if isinstance(value, dict):
+        return dict((k, _without_nans(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_without_nans(v) for v in value]
+    if isinstance(value, (float, np.floating)) and np.isnan(value):
+        return None
+    return value
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the server's `MetricsService` (set as `service`) as JSON.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+        parts = [p for p in url.path.split('/') if p]
+        service = self.server.service
+        try:
+            if len(parts) == 2 and parts[0] == 'participants':
+                response = service.get_participant(parts[1])
+                if response is not None and query.get('vars'):
+                    names = [n for n in query['vars'].split(',') if n]
+                    response = dict(
+                        (n, response.get(n)) for n in ['id'] + names)
+            elif parts == ['cohort']:
+                summary_df = service.get_cohort_summary(
+                    int(query.get('resamples', cohort.NUM_RESAMPLES)),
+                    int(query.get('seed', SUMMARY_SEED)))
+                response = None if summary_df is None else \
+                    summary_df.to_dict(orient='records')
+            elif parts == ['cache']:
+                response = service.cache_info()
+            else:
+                self.send_error(404)
+                return
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        except CompileError as e:
+            self._send_json(500, dict(
+                (k, e.failure[k]) for k in ['id', 'error', 'source_csv']))
+            return
+        if response is None:
+            self.send_error(404)
+            return
+        self._send_json(200, response)
+
+    def _send_json(self, status, response):
+        body = ingest.dumps(_without_nans(response)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=3002):
+    """Take `MetricsService`, host and port. Return HTTP server (not yet
+    serving), handling each request in its own thread, so a slow compile
+    doesn't hold up other requests.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--data-dir', default=compile_data.DATA_DIR,
+        help='base data directory (default: %(default)s)')
+    parser.add_argument(
+        '--compiled', help='compiled CSV path, for cohort summaries '
+        '(default: compiled.csv in the data directory)')
+    parser.add_argument('--port', type=int, default=3002)
+    parser.add_argument(
+        '--cache-size', type=int, default=CACHE_SIZE,
+        help='number of compiled participants to cache (default: '
+        '%(default)s)')
+    parser.add_argument(
+        '--engine', choices=sorted(compile_data.ENGINES),
+        default=compile_data.DEFAULT_ENGINE,
+        help='scoring engine (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    service = MetricsService(
+        args.data_dir, args.compiled, args.cache_size, args.engine)
+    server = make_server(service, port=args.port)
+    print('Listening on port {}'.format(server.server_address[1]))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Size-aware scheduling of participants over worker processes.
+
+Participants' compile times vary with the size of their raw data (e.g.,
+experiment files of a few hundred to thousands of trials, practice files
+with repeated blocks, or no experiment file at all), and a pool that takes
+participants in path order can leave workers idle at the end of a run
+while one compiles the last large participant. Instead, each participant's
+cost is estimated from the sizes of its raw data files, found in the
+directory scan without reading them, and participants are dispatched
+longest-first. Workers take one participant at a time from the shared
+queue as they finish the last, so work is balanced dynamically whatever
+the estimates miss.
+
+Results are returned as they complete, with their tasks' positions (so
+callers can place them, without holding finished results back for earlier
+tasks), and each worker's busy time is recorded (see `ScheduleStats`), to
+report worker utilization.
+"""
+import os
+import time
+
+try:
+    from scripts import sources
+except ImportError:  # run as a script
+    import sources
+
+
+# approximate ratio of a compressed raw data CSV's data to its file size
+COMPRESSED_SIZE_FACTOR = 6
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+def estimate_cost(paths):
+    """Take list of a participant's raw data CSV paths. Return estimated
+    cost of compiling them: their (decompressed) size in bytes.
+    """
+    cost = 0
+    for path in paths:
+        size = sources.get_size(path)
+        if path.lower().endswith(COMPRESSED_SUFFIXES):
+            size *= COMPRESSED_SIZE_FACTOR
+        cost += size
+    return cost
+
+
+def order_longest_first(costs):
+    """Take list of estimated task costs. Return list of task positions, by
+    decreasing cost (ties in task order).
+    """
+    return sorted(range(len(costs)), key=lambda i: (-costs[i], i))
+
+
+def _run_task(args):
+    """Take tuple of task function, task position and task. Return tuple of
+    task position, worker process ID, start and end times and result.
+    """
+    func, position, task = args
+    start = time.time()
+    result = func(task)
+    return position, os.getpid(), start, time.time(), result
+
+
+def iter_scheduled(func, tasks, costs, pool=None, stats=None):
+    """Take (module-level) task function, list of tasks and their estimated
+    costs, and optionally a `multiprocessing.Pool` and `ScheduleStats`.
+    Run tasks longest-first, one at a time per worker (in this process, if
+    there is no pool, in task order). Yield tuples of task position and
+    result, as tasks complete.
+    """
+    order = order_longest_first(costs)
+    args = [(func, position, tasks[position]) for position in order]
+    if stats is not None:
+        stats.start()
+    if pool is None:
+        results = (_run_task(a) for a in sorted(args, key=lambda a: a[1]))
+    else:
+        results = pool.imap_unordered(_run_task, args, chunksize=1)
+
+    for position, worker, start, end, result in results:
+        if stats is not None:
+            stats.record(worker, start, end, costs[position])
+        yield position, result
+
+
+class ScheduleStats(object):
+    """Record the tasks run by each worker process, to report worker
+    utilization: the share of the run's wall time each worker was busy.
+    """
+
+    def __init__(self, num_workers=1):
+        self.num_workers = num_workers
+        self.start_time = None
+        self.end_time = None
+        self.workers = {}
+
+    def start(self):
+        self.start_time = time.time()
+
+    def record(self, worker, start, end, cost):
+        stats = self.workers.setdefault(worker, {
+            'worker': len(self.workers) + 1,
+            'num_tasks': 0,
+            'cost': 0,
+            'busy_s': 0.0,
+            'last_end': end,
+        })
+        stats['num_tasks'] += 1
+        stats['cost'] += cost
+        stats['busy_s'] += end - start
+        stats['last_end'] = max(stats['last_end'], end)
+        self.end_time = max(self.end_time, end) if self.end_time else end
+
+    @property
+    def wall_s(self):
+        if self.start_time is None or self.end_time is None:
+            return 0.0
+        return max(self.end_time - self.start_time, 0.0)
+
+    def summarize(self):
+        """Return dict of the run's wall time, overall utilization and
+        throughput (MB of raw data per busy second), and list of each
+        worker's number of tasks, estimated cost, busy time, utilization and
+        idle time at the end of the run (``tail_idle_s``).
+        """
+        wall_s = self.wall_s
+        workers = []
+        for stats in sorted(self.workers.values(),
+                            key=lambda stats: stats['worker']):
+            workers.append({
+                'worker': stats['worker'],
+                'num_tasks': stats['num_tasks'],
+                'cost_mb': stats['cost'] / 1024.0 / 1024.0,
+                'busy_s': stats['busy_s'],
+                'utilization': stats['busy_s'] / wall_s if wall_s else None,
+                'tail_idle_s': self.end_time - stats['last_end'],
+            })
+        busy_s = sum(stats['busy_s'] for stats in workers)
+        cost_mb = sum(stats['cost_mb'] for stats in workers)
+        return {
+            'num_workers': self.num_workers,
+            'wall_s': wall_s,
+            'utilization': busy_s / (wall_s * self.num_workers)
+            if wall_s else None,
+            'mb_per_s': cost_mb / busy_s if busy_s else None,
+            'workers': workers,
+        }
+
+    def report(self):
+        """Return a human-readable worker utilization report.
+        """
+        summary = self.summarize()
+
+        def format_share(share):
+            return 'n/a' if share is None else '{:.0%}'.format(share)
+
+        lines = ['Workers: {}, wall time: {:.1f}s, utilization: {}'.format(
+            summary['num_workers'], summary['wall_s'],
+            format_share(summary['utilization']))]
+        if summary['mb_per_s'] is not None:
+            lines.append('Throughput: {:.2f} MB of raw data per worker '
+                         'second'.format(summary['mb_per_s']))
+        for stats in summary['workers']:
+            lines.append(
+                '  worker {}: {} participant(s), {:.1f} MB, busy {:.1f}s '
+                '({}), idle at end {:.1f}s'.format(
+                    stats['worker'], stats['num_tasks'], stats['cost_mb'],
+                    stats['busy_s'], format_share(stats['utilization']),
+                    stats['tail_idle_s']))
+        return '\n'.join(lines)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Raw data sources: plain (``.csv``) and compressed (``.csv.gz``,
+``.csv.zst``) raw data CSVs, in a data directory or in a ``.tar`` (optionally
+compressed) or ``.zip`` archive of the data tree.
+
+An archive stands in for the data directory. Files inside it get virtual
+paths beneath the archive's path (e.g., ``study.tar/experiment/1.csv.gz``,
+whichever directory the stage directories sit in within the archive), so
+they pair up by participant just as files on disk do. Files are
+decompressed as they are read, one at a time; nothing is extracted to disk.
+
+Reading ``.csv.zst`` files requires the ``zstandard`` package.
+"""
+import os
+import glob
+import gzip
+import time
+import tarfile
+import zipfile
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.zst')
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.zip')
+
+# open archives, keyed by path (see `get_archive`)
+_ARCHIVES = {}
+
+
+def is_csv(path):
+    return path.lower().endswith(CSV_SUFFIXES)
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+class Archive(object):
+    """An open archive of raw data files, indexed by ``<stage>/<file name>``
+    (each CSV's parent directory and file name).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.pid = os.getpid()
+        self.is_zip = path.lower().endswith('.zip')
+        if self.is_zip:
+            self._archive = zipfile.ZipFile(path)
+            members = [(info.filename, info)
+                       for info in self._archive.infolist()
+                       if not info.filename.endswith('/')]
+        else:
+            self._archive = tarfile.open(path)
+            members = [(info.name, info)
+                       for info in self._archive.getmembers()
+                       if info.isfile()]
+
+        self.members = {}
+        for name, info in members:
+            parts = [p for p in name.replace('\\', '/').split('/')
+                     if p not in ('', '.')]
+            if len(parts) < 2 or not is_csv(parts[-1]):
+                continue
+            key = '/'.join(parts[-2:])
+            if key in self.members:
+                raise ValueError('Duplicate raw data file in {}: {}'.format(
+                    path, key))
+            self.members[key] = info
+
+    def listdir(self, subdir):
+        """Take stage directory name. Return sorted list of its file names.
+        """
+        prefix = subdir + '/'
+        return sorted(
+            key[len(prefix):] for key in self.members
+            if key.startswith(prefix))
+
+    def get_mtime(self, key):
+        info = self.members[key]
+        if self.is_zip:
+            return time.mktime(info.date_time + (0, 0, -1))
+        return info.mtime
+
+    def get_size(self, key):
+        info = self.members[key]
+        if self.is_zip:
+            return info.file_size
+        return info.size
+
+    def open(self, key):
+        """Take member key. Return binary file object of its (raw) data.
+        """
+        info = self.members[key]
+        if self.is_zip:
+            return self._archive.open(info)
+        return self._archive.extractfile(info)
+
+    def close(self):
+        self._archive.close()
+
+
+def get_archive(path):
+    """Take archive path. Return open `Archive`, reused until the archive
+    changes (and reopened in each process, as forked workers must not share
+    file offsets).
+    """
+    archive = _ARCHIVES.get(path)
+    if archive is not None and (archive.pid != os.getpid() or
+                                archive.mtime != os.path.getmtime(path)):
+        if archive.pid == os.getpid():
+            archive.close()
+        archive = None
+    if archive is None:
+        archive = _ARCHIVES[path] = Archive(path)
+    return archive
+
+
+def _split_path(path):
+    """Take raw data path. Return tuple of its `Archive` (None for files on
+    disk) and member key (or the path itself).
+    """
+    stage_dir, name = os.path.split(path)
+    archive_path, stage = os.path.split(stage_dir)
+    if archive_path and is_archive(archive_path):
+        return get_archive(archive_path), '{}/{}'.format(stage, name)
+    return None, path
+
+
+def list_csvs(basedir, subdir):
+    """Take base data directory (or archive) and stage directory name.
+    Return list of raw data CSV paths.
+    """
+    if is_archive(basedir):
+        return [os.path.join(basedir, subdir, name)
+                for name in get_archive(basedir).listdir(subdir)]
+    paths = []
+    for suffix in CSV_SUFFIXES:
+        paths.extend(glob.glob(os.path.join(basedir, subdir, '*' + suffix)))
+    return paths
+
+
+def exists(path):
+    archive, key = _split_path(path)
+    if archive is None:
+        return os.path.exists(path)
+    return key in archive.members
+
+
+def get_mtime(path):
+    archive, key = _split_path(path)
+    if archive is None:
+        return os.path.getmtime(path)
+    return archive.get_mtime(key)
+
+
+def get_size(path):
+    """Take raw data CSV path. Return its size in bytes, as stored (i.e.,
+    compressed, for compressed CSVs).
+    """
+    archive, key = _split_path(path)
+    if archive is None:
+        return os.path.getsize(path)
+    return archive.get_size(key)
+
+
+@contextmanager
+def open_csv(path):
+    """Take raw data CSV path. Return context manager giving a binary file
+    object of its decompressed data.
+    """
+    archive, key = _split_path(path)
+    f = archive.open(key) if archive is not None else open(path, 'rb')
+    try:
+        if path.lower().endswith('.gz'):
+            with gzip.GzipFile(fileobj=f, mode='rb') as gzip_file:
+                yield gzip_file
+        elif path.lower().endswith('.zst'):
+            if zstandard is None:
+                raise ImportError(
+                    'Reading {} requires the zstandard package'.format(path))
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+            try:
+                yield reader
+            finally:
+                reader.close()
+        else:
+            yield f
+    finally:
+        f.close()
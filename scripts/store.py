@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""An embedded SQLite store for compiled participant data, as an alternative
+to rewriting and re-reading ``compiled.csv``. Each participant's row is
+upserted by ``id``, so partial recompiles only touch the changed rows.
+"""
+import sqlite3
+
+import numpy as np
+
+try:
+    from scripts import compile_data
+except ImportError:  # run as a script
+    import compile_data
+
+
+TABLE_NAME = 'compiled'
+SQL_TYPES = {
+    'bool': 'INTEGER',
+    'int': 'INTEGER',
+    'float': 'REAL',
+    'str': 'TEXT',
+}
+INDEXES = [
+    ('idx_compiled_passed_practice', ['passed_practice']),
+    ('idx_compiled_condition', ['num_trials', 'trials_per_block']),
+]
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _to_sql_value(value):
+    """Take compiled value and return a value SQLite can store.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        value = float(value)
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class CompiledStore(object):
+    """SQLite-backed store of compiled participant data, with one row per
+    participant and one column per compiled variable (see
+    `compile_data.VariableRegistry`). Columns are added as new variables
+    (e.g., extra blocks) appear.
+    """
+
+    def __init__(self, path, registry=compile_data.VARIABLES):
+        self.path = path
+        self.registry = registry
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self._create_table()
+        self.columns = self._get_table_columns()
+        self._column_set = set(self.columns)
+
+    def _create_table(self):
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY)'.format(
+                    TABLE_NAME))
+            columns = self._get_table_columns()
+            for name, dtype in [('passed_practice', 'bool'),
+                                ('num_trials', 'int'),
+                                ('trials_per_block', 'int')]:
+                if name not in columns:
+                    self._add_column(name, dtype)
+            for index_name, index_columns in INDEXES:
+                self.connection.execute(
+                    'CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                        index_name, TABLE_NAME,
+                        ', '.join(_quote(c) for c in index_columns)))
+
+    def _get_table_columns(self):
+        cursor = self.connection.execute(
+            'PRAGMA table_info({})'.format(TABLE_NAME))
+        return [row[1] for row in cursor.fetchall()]
+
+    def _add_column(self, name, dtype):
+        self.connection.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(
+            TABLE_NAME, _quote(name), SQL_TYPES.get(dtype, 'TEXT')))
+
+    def _ensure_columns(self, participant):
+        for name, value in participant.items():
+            if name in self._column_set:
+                continue
+            variable = self.registry.get_variable(
+                self.registry.index(name, value))
+            self._add_column(name, variable.dtype)
+            self.columns.append(name)
+            self._column_set.add(name)
+
+    def _upsert_statement(self):
+        return 'INSERT OR REPLACE INTO {} ({}) VALUES ({})'.format(
+            TABLE_NAME, ', '.join(_quote(c) for c in self.columns),
+            ', '.join('?' for c in self.columns))
+
+    def _get_row_values(self, participant):
+        return [_to_sql_value(participant.get(c)) for c in self.columns]
+
+    def upsert(self, participant):
+        """Take compiled participant data dict and insert it, replacing any
+        previous row with the same ``id``.
+        """
+        with self.connection:
+            self._ensure_columns(participant)
+            self.connection.execute(
+                self._upsert_statement(), self._get_row_values(participant))
+
+    def upsert_many(self, participants):
+        """Take list of compiled participant data dicts and upsert them in a
+        single transaction.
+        """
+        participants = list(participants)
+        with self.connection:
+            for participant in participants:
+                self._ensure_columns(participant)
+            self.connection.executemany(
+                self._upsert_statement(),
+                [self._get_row_values(p) for p in participants])
+
+    def _row_to_dict(self, names, row):
+        participant = {}
+        for name, value in zip(names, row):
+            if value is None:
+                continue
+            variable = self.registry.get_variable(self.registry.index(name))
+            if variable.dtype == 'bool':
+                value = bool(value)
+            participant[name] = value
+        return participant
+
+    def select(self, **filters):
+        """Take column filters (e.g., ``passed_practice=True``). Return list
+        of compiled participant data dicts.
+        """
+        names = sorted(filters)
+        sql = 'SELECT * FROM {}'.format(TABLE_NAME)
+        if names:
+            sql += ' WHERE ' + ' AND '.join(
+                '{} = ?'.format(_quote(name)) for name in names)
+        cursor = self.connection.execute(
+            sql, [_to_sql_value(filters[name]) for name in names])
+        columns = [d[0] for d in cursor.description]
+        return [self._row_to_dict(columns, row) for row in cursor.fetchall()]
+
+    def get(self, participant_id):
+        """Take participant ID. Return compiled data dict (None if absent).
+        """
+        participants = self.select(id=str(participant_id))
+        return participants[0] if participants else None
+
+    def get_condition(self, num_trials, trials_per_block):
+        """Take trial condition. Return list of compiled data dicts.
+        """
+        return self.select(
+            num_trials=num_trials, trials_per_block=trials_per_block)
+
+    def delete(self, participant_id):
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM {} WHERE id = ?'.format(TABLE_NAME),
+                [str(participant_id)])
+
+    def __len__(self):
+        cursor = self.connection.execute(
+            'SELECT COUNT(*) FROM {}'.format(TABLE_NAME))
+        return cursor.fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Mock data shared by the test modules: its paths, the participants it
+holds, and data directories copied from it.
+"""
+import os
+import shutil
+
+import pytest
+
+from scripts import compile_data
+
+
+TESTS_DIR = os.path.abspath(os.path.join(__file__, '..'))
+MOCK_DATA_DIR = os.path.join(TESTS_DIR, 'mock_data')
+PID_FAIL = '401'
+PID_SUCCESS = '1'
+PID_SUCCESS_2 = '2'
+# (mock participant 2's experiment data fails to compile, so it's left out)
+PARTICIPANTS = {
+    'practice': [PID_SUCCESS, PID_FAIL],
+    'experiment': [PID_SUCCESS],
+    'follow_up': [PID_SUCCESS, PID_FAIL],
+}
+
+
+def mock_csv_path(exp_stage, pid):
+    return os.path.join(MOCK_DATA_DIR, exp_stage, '{}.csv'.format(pid))
+
+
+def make_data_dir(data_dir, participants=PARTICIPANTS, copy=shutil.copy):
+    """Take data directory (a py.path), dict of participant ID lists (keyed
+    by experiment stage) and optional function copying a mock CSV to a path
+    (e.g., compressing it). Copy mock data into it. Return its path.
+    """
+    for exp_stage in compile_data.EXP_STAGES:
+        stage_dir = data_dir.mkdir(exp_stage)
+        for pid in participants.get(exp_stage, []):
+            copy(mock_csv_path(exp_stage, pid),
+                 str(stage_dir.join('{}.csv'.format(pid))))
+    return str(data_dir)
+
+
+@pytest.fixture
+def data_dir(tmpdir):
+    """Path of a data directory holding the mock data of `PARTICIPANTS`.
+    """
+    return make_data_dir(tmpdir.mkdir('data'))
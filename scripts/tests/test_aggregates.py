@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts import aggregates, compile_data
+
+from conftest import PID_FAIL, PID_SUCCESS
+
+
+def test_running_stats_add_merge_and_remove():
+    values = np.random.RandomState(0).lognormal(6, 0.5, 1000)
+    stats = aggregates.RunningStats()
+    shard = aggregates.RunningStats()
+    for value in values[:600]:
+        stats.add(value)
+    for value in values[600:]:
+        shard.add(value)
+    stats.merge(shard)
+    stats.add(None)
+
+    assert stats.count == 1000
+    assert np.isclose(stats.mean, values.mean())
+    assert np.isclose(stats.sd, values.std(ddof=1))
+    assert (stats.min, stats.max) == (values.min(), values.max())
+    for q in [0.05, 0.25, 0.5, 0.75, 0.95]:
+        # quantiles are within the sketch's relative accuracy
+        expected = np.percentile(values, 100 * q, interpolation='lower')
+        assert abs(stats.sketch.quantile(q) / expected - 1) <= 0.01
+
+    for value in values[:500]:
+        stats.remove(value)
+    assert stats.count == 500
+    assert np.isclose(stats.mean, values[500:].mean())
+    assert np.isclose(stats.sd, values[500:].std(ddof=1))
+
+    # state survives a round trip
+    restored = aggregates.RunningStats.from_dict(stats.to_dict())
+    assert restored.to_dict() == stats.to_dict()
+    assert restored.sketch.quantile(0.5) == stats.sketch.quantile(0.5)
+
+
+def test_cohort_aggregates_by_condition():
+    random_state = np.random.RandomState(1)
+    df = pd.DataFrame({
+        'num_trials': random_state.choice([1125, 1350], 200),
+        'trials_per_block': 225,
+        'avg_accuracy': random_state.rand(200),
+    })
+    df.loc[:9, 'avg_accuracy'] = np.nan
+    df.loc[10, 'num_trials'] = np.nan
+
+    cohort_aggregates = aggregates.CohortAggregates.from_dataframe(
+        df[:100])
+    cohort_aggregates.merge(
+        aggregates.CohortAggregates.from_dataframe(df[100:]))
+    summary_df = cohort_aggregates.summarize()
+    assert list(summary_df.columns) == aggregates.SUMMARY_COLUMNS
+
+    expected_df = df.dropna().groupby('num_trials')['avg_accuracy'].agg(
+        ['count', 'mean', 'std'])
+    summary_df = summary_df[summary_df['variable'] == 'avg_accuracy'] \
+        .set_index('num_trials')
+    assert list(summary_df['n']) == list(expected_df['count'])
+    assert np.allclose(summary_df['mean'], expected_df['mean'])
+    assert np.allclose(summary_df['sd'], expected_df['std'])
+
+
+def test_main_updates_saved_aggregates(tmpdir, data_dir):
+    compiled_csv = os.path.join(data_dir, 'compiled.csv')
+    aggregates_path = os.path.join(data_dir, 'compiled-aggregates.json')
+    compile_data.main(data_dir)
+    expected = aggregates.CohortAggregates.load(aggregates_path).to_dict()
+
+    summary_df = aggregates.CohortAggregates.load(aggregates_path).summarize()
+    row = summary_df[summary_df['variable'] == 'avg_accuracy'].iloc[0]
+    assert (row['num_trials'], row['trials_per_block'], row['n']) == \
+        (1125, 225, 1)
+    assert row['mean'] == row['min'] == row['max'] == 0.934222222
+
+    # recompiling a participant replaces their values
+    compile_data.main(data_dir, ids=[PID_SUCCESS])
+    assert aggregates.CohortAggregates.load(aggregates_path).to_dict() == \
+        expected
+
+    # without saved aggregates, those of the existing output are used
+    os.remove(aggregates_path)
+    compile_data.main(data_dir, ids=[PID_FAIL])
+    assert aggregates.CohortAggregates.load(aggregates_path).to_dict() == \
+        expected
+
+    # shards' aggregates are merged
+    summary_csv = str(tmpdir.join('summary.csv'))
+    compile_data.cli(['--data-dir', data_dir, 'aggregates', aggregates_path,
+                      aggregates_path, '-o', summary_csv])
+    summary_df = pd.read_csv(summary_csv)
+    assert (summary_df['n'] == 2).all()
+    assert os.path.exists(compiled_csv)
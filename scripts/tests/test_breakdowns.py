@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts import breakdowns, compile_data
+
+from conftest import MOCK_DATA_DIR
+
+
+def test_code_digits_and_font_sizes():
+    assert list(breakdowns.code_digits(
+        ['3', ' 9', '0', '12', 'x', np.nan])) == [3, 9, 0, 0, 0, 0]
+
+    sizes = breakdowns.parse_font_sizes(
+        ['91.33px', '45.33px', np.nan, '91.33px', '12mm'])
+    assert np.array_equal(np.isnan(sizes), [False, False, True, False, False])
+    codes, distinct_sizes = breakdowns.code_font_sizes(sizes)
+    assert list(codes) == [3, 2, 0, 3, 1]
+    assert list(distinct_sizes) == [12, 45.33, 91.33]
+
+
+def test_reduce_groups_matches_groupby():
+    random_state = np.random.RandomState(0)
+    num_trials = 2000
+    df = pd.DataFrame({
+        'code': random_state.randint(0, 6, num_trials),
+        'block': np.sort(random_state.randint(0, 4, num_trials)),
+        'correct': random_state.rand(num_trials) < 0.8,
+        'commission': random_state.rand(num_trials) < 0.1,
+        'omission': random_state.rand(num_trials) < 0.1,
+        'rt': np.where(random_state.rand(num_trials) < 0.9,
+                       random_state.normal(400, 80, num_trials), np.nan),
+    })
+    # a group without trials in one block
+    df = df[~((df['block'] == 2) & (df['code'] == 5))]
+
+    reductions = breakdowns.reduce_groups(
+        df['code'].values, df['block'].values, 6, 4, df['correct'].values,
+        df['commission'].values, df['omission'].values, df['rt'].values)
+    for keys, rows in [(['block', 'code'], slice(0, 4)),
+                       (['code'], slice(4, 5))]:
+        grouped = df.groupby(keys)
+        expected = [
+            ('num_trials', grouped['correct'].count()),
+            ('accuracy', grouped['correct'].mean()),
+            ('commission_errors', grouped['commission'].sum()),
+            ('omission_errors', grouped['omission'].sum()),
+            ('rt_avg', grouped['rt'].mean()),
+        ]
+        has_trials = reductions['num_trials'][rows].ravel() > 0
+        for metric, expected_values in expected:
+            values = reductions[metric][rows].ravel()
+            assert np.allclose(values[has_trials], expected_values.values)
+    assert np.isnan(reductions['accuracy'][2, 5])
+
+
+def test_summarize_breakdowns_matches_block_totals():
+    df = compile_data.get_csv_as_dataframe(
+        os.path.join(MOCK_DATA_DIR, 'experiment', '1.csv'))
+    compiled = compile_data.compile_experiment_data(df, breakdowns=True)
+
+    for grouping, num_groups in [('digit', 9), ('font', 5)]:
+        names = ['{}{}_'.format(grouping, group)
+                 for group in range(1, num_groups + 1)]
+        assert sum(compiled[name + 'num_trials'] for name in names) == \
+            compiled['num_trials']
+        assert sum(compiled[name + 'commission_errors'] for name in names) \
+            == compiled['nogo_num_errors']
+        for i in range(1, compiled['num_blocks'] + 1):
+            assert sum(compiled['blk{}_{}num_trials'.format(i, name)]
+                       for name in names) == \
+                compiled['blk{}_num_trials'.format(i)]
+
+    # commissions are no-go errors, omissions go errors
+    assert compiled['digit3_omission_errors'] == 0
+    assert compiled['digit1_commission_errors'] == 0
+    assert compiled['font1_px'] < compiled['font5_px']
+    assert 'digit1_accuracy' not in compile_data.compile_experiment_data(df)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from scripts import cohort, compile_data
+
+from conftest import MOCK_DATA_DIR
+
+
+def _make_cohort(random_state, num_participants=600):
+    df = pd.DataFrame({
+        'num_trials': random_state.choice([1125, 1350], num_participants),
+        'trials_per_block': random_state.choice([225, 270], num_participants),
+    })
+    for variable in cohort.COHORT_VARIABLES:
+        df[variable] = random_state.normal(
+            df['num_trials'] / 1000.0, 1, num_participants)
+    df.loc[random_state.rand(num_participants) < 0.2, 'auc_boredom'] = np.nan
+    df.loc[df['num_trials'] == 1350, 'effort_slope'] = np.nan
+    return df
+
+
+def test_bootstrap_means_resample_within_groups():
+    values = np.array([[1.0, np.nan], [1.0, 2.0], [5.0, 4.0], [5.0, 6.0],
+                       [3.0, 3.0]])
+    groups = np.array(['b', 'a', 'b', 'a', 'c'])
+    unique_groups, means = cohort.bootstrap_means(
+        values, groups, 50, seed=0, chunk_size=7)
+    assert list(unique_groups) == ['a', 'b', 'c']
+    assert means.shape == (50, 3, 2)
+
+    # resampled means stay within each group's values
+    assert set(means[:, 0, 0]) <= set([1.0, 3.0, 5.0])
+    assert (means[:, 2] == 3.0).all()
+    # missing values are left out of the means
+    b_means = means[:, 1, 1]
+    assert np.isnan(b_means).any()
+    assert (b_means[~np.isnan(b_means)] == 4.0).all()
+
+
+def test_summarize_cohort():
+    df = _make_cohort(np.random.RandomState(0))
+    summary_df = cohort.summarize_cohort(df, num_resamples=2000, seed=1)
+    assert list(summary_df.columns) == cohort.SUMMARY_COLUMNS
+    assert len(summary_df.index) == 4 * len(cohort.COHORT_VARIABLES)
+
+    # the same seed gives the same intervals, with any number of workers
+    assert summary_df.equals(cohort.summarize_cohort(
+        df, num_resamples=2000, seed=1, workers=2))
+
+    for _, row in summary_df.iterrows():
+        is_condition = (df['num_trials'] == row['num_trials']) & \
+            (df['trials_per_block'] == row['trials_per_block'])
+        values = df.loc[is_condition, row['variable']].dropna()
+        assert row['n'] == len(values)
+        if not len(values):
+            assert np.isnan(row['ci_low'])
+            continue
+        assert row['mean'] == values.mean()
+        assert row['ci_low'] < row['mean'] < row['ci_high']
+        # close to the standard error of the mean
+        standard_error = values.std() / np.sqrt(len(values))
+        assert abs(row['se'] / standard_error - 1) < 0.1
+
+
+def test_cli_compile_with_cohort_summary(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    for exp_stage in compile_data.EXP_STAGES:
+        shutil.copytree(
+            os.path.join(MOCK_DATA_DIR, exp_stage),
+            str(data_dir.join(exp_stage)))
+    summary_path = str(tmpdir.join('cohort.csv'))
+
+    compile_data.cli([
+        '--data-dir', str(data_dir), 'compile', '--validate',
+        '--cohort-summary', summary_path, '--bootstrap-resamples', '200',
+        '--bootstrap-seed', '3'])
+    summary_df = pd.read_csv(summary_path)
+    assert set(summary_df['variable']) == set(cohort.COHORT_VARIABLES)
+    row = summary_df[summary_df['variable'] == 'avg_accuracy'].iloc[0]
+    assert (row['num_trials'], row['trials_per_block'], row['n']) == \
+        (1125, 225, 1)
+    assert row['mean'] == row['ci_low'] == row['ci_high'] == 0.934222222
+
+    # the standalone command summarizes the compiled CSV the same way
+    summary_path_2 = str(tmpdir.join('cohort_2.csv'))
+    compile_data.cli([
+        '--data-dir', str(data_dir), 'cohort', '-o', summary_path_2,
+        '--bootstrap-resamples', '200', '--bootstrap-seed', '3'])
+    assert pd.read_csv(summary_path_2).equals(summary_df)
@@ -1,31 +1,30 @@
 # -*- coding: utf-8 -*-
 import os
+import sys
+import json
+import gzip
+import time
+import shutil
+import subprocess
 
 import pytest
 
-from scripts import compile_data
+from scripts import compile_data, equivalence
 
-
-TESTS_DIR = os.path.abspath(os.path.join(__file__, '..'))
-MOCK_DATA_DIR = os.path.join(TESTS_DIR, 'mock_data')
-PID_FAIL = '401'
-PID_SUCCESS = '1'
-PID_SUCCESS_2 = '2'
-
-
-def _csv_path(stage, pid):
-    return os.path.join(MOCK_DATA_DIR, stage, '{}.csv'.format(pid))
+from conftest import (
+    MOCK_DATA_DIR, PID_FAIL, PID_SUCCESS, PID_SUCCESS_2, TESTS_DIR,
+    make_data_dir, mock_csv_path)
 
 
 def test_get_data_file_paths_returns_list_of_paths():
     mock_practice_csvs = compile_data.get_csv_paths(MOCK_DATA_DIR, 'practice')
     assert len(mock_practice_csvs) == 3
-    assert _csv_path('practice', PID_SUCCESS) in mock_practice_csvs
+    assert mock_csv_path('practice', PID_SUCCESS) in mock_practice_csvs
 
 
 def test_extract_sart_blocks_with_2_practice():
     # NOTE: tests out get_csv_as_dataframe() from compile_data
-    csv_path = _csv_path('practice', PID_SUCCESS)
+    csv_path = mock_csv_path('practice', PID_SUCCESS)
     df = compile_data.get_csv_as_dataframe(csv_path)
     blocks = compile_data.extract_sart_blocks(df)
     assert len(blocks) == 2
@@ -137,6 +136,43 @@ def test_get_response_from_json():
     assert resp1 == "2<br>Often or<br>very much"
 
 
+def test_lru_cache_evicts_least_recently_used():
+    cache = compile_data.LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    info = cache.info()
+    assert info['hits'] == 2
+    assert info['misses'] == 1
+    assert info['size'] == 2
+    assert round(info['hit_rate'], 2) == 0.67
+
+
+def test_get_responses_from_json_decodes_column():
+    compile_data.RESPONSE_CACHE.clear()
+    responses = compile_data.pd.Series(
+        ['{"Q0":"3"}', None, '{"Q0":"3"}', '{"Q0":"5"}'], index=[4, 5, 6, 7])
+    answers = compile_data.get_responses_from_json(responses)
+    assert list(answers.index) == [4, 5, 6, 7]
+    assert list(answers.values) == ['3', None, '3', '5']
+
+    # each distinct string is decoded once, then served from the cache
+    compile_data.get_response_from_json('{"Q0":"5"}')
+    info = compile_data.response_cache_info()
+    assert info['misses'] == 2
+    assert info['hits'] == 1
+
+
+def test_get_responses_by_node_id():
+    df = get_csv_as_df('follow_up', PID_SUCCESS)
+    responses = compile_data.get_responses_by_node_id(df)
+    assert responses['0.0-1.0-0.0'] == '28'
+    assert responses['0.0-2.0-0.0'] == 'Female'
+
+
 def test_get_response_via_node_id():
     df = get_csv_as_df('follow_up', PID_SUCCESS)
     resp1 = compile_data.get_response_via_node_id(df, '0.0-1.0-0.0')
@@ -180,6 +216,18 @@ def test__is_anticipation_error():
     assert not compile_data._is_anticipation_error('[-1]')
 
 
+def test__is_anticipation_error_with_threshold():
+    assert compile_data._is_anticipation_error('[120]', threshold=150)
+    assert not compile_data._is_anticipation_error('[150]', threshold=150)
+    assert not compile_data._is_anticipation_error('[-1]', threshold=150)
+
+
+def test__parse_rts():
+    rts = compile_data._parse_rts(['[667]', '[-1]', '[-1,250]', '6724'])
+    assert list(rts[[0, 2, 3]]) == [667.0, 250.0, 6724.0]
+    assert compile_data.np.isnan(rts[1])
+
+
 def test__add_anticipation_errors_to_df():
     pid = PID_SUCCESS
     df = _get_sart_experiment_block(pid, 2)
@@ -271,6 +319,8 @@ def test_summarize_block_performance_blk4():
     assert p['nogo_num_errors'] == 0
     assert p['nogo_errors'] == 0.0
     assert p['accuracy'] == 0.862222222  # 194/225
+    assert p['rt_sd'] == 218.674300519
+    assert p['rt_cv'] == 0.540998152
     total_error_prop = (p['anticipated'] + p['go_errors'] + p['nogo_errors'])
 
     # average RTs before and after no-go errors
@@ -318,6 +368,41 @@ def test_summarize_sart_chunk():
     assert b4s['nogo_next4_avg'] == 407.105263158
 
 
+def test_summarize_anticipation_thresholds_matches_block_summary():
+    sart_block = _get_sart_experiment_block(PID_SUCCESS, 4)
+    thresholds = [100, 150, 200]
+    by_threshold = compile_data.summarize_anticipation_thresholds(
+        sart_block, thresholds)
+
+    for threshold in thresholds:
+        p = compile_data.summarize_block_performance(
+            sart_block.copy(), anticipation_threshold=threshold)
+        t = by_threshold[threshold]
+        assert t['anticipated'] == p['anticipated']
+        assert t['anticipated_num_errors'] == p['anticipated_num_errors']
+        assert t['accuracy'] == p['accuracy']
+        assert t['go_num_errors'] == p['go_num_errors']
+        assert t['nogo_num_errors'] == p['nogo_num_errors']
+
+    assert by_threshold[100]['anticipated_num_errors'] == 25
+    assert by_threshold[200]['anticipated_num_errors'] >= 25
+
+
+def test_compile_anticipation_thresholds():
+    df = get_csv_as_df('experiment', PID_SUCCESS)
+    compiled = compile_data.compile_anticipation_thresholds(df, [100, 150])
+    ed = compile_data.compile_experiment_data(df)
+    for key, value in compiled[100].items():
+        assert ed[key] == value
+
+    ed_150 = compile_data.compile_experiment_data(
+        df, anticipation_threshold=150)
+    for key, value in compiled[150].items():
+        assert ed_150[key] == value
+    for key in ['avg_go_errors', 'avg_nogo_errors']:
+        assert compiled[150][key] == ed_150[key]
+
+
 def test__calculate_ratings_proportions():
     ratings = [5, 2, 3, 7, 6, 4, 3, 3]  # 8 ratings, 7 possible changes
     # ratings proportions
@@ -348,12 +433,12 @@ def test_complete_compile_experiment_data():
     blk_summary_keys = [
         'anticipated', 'nogo_next4_avg', 'nogo_prev4_avg', 'go_errors',
         'effort', 'num_trials', 'discomfort', 'rt_avg', 'nogo_errors',
-        'accuracy'
+        'accuracy', 'rt_sd', 'rt_cv'
         ]
     for i in range(1, (ed['num_blocks'] + 1)):
         blk_key_prefix = "blk{}".format(i)
         blk_keys = [k for k in ed.keys() if k.startswith(blk_key_prefix)]
-        assert len(blk_keys) == 16
+        assert len(blk_keys) == 18
         for k in blk_summary_keys:
             expected_blk_key = "{}_{}".format(blk_key_prefix, k)
             assert expected_blk_key in blk_keys
@@ -428,6 +513,43 @@ def test_complete_compile_experiment_data():
 
     assert ed['time_experiment_ms'] == 1475020
 
+    # RT variability and vigilance (50-trial rolling windows)
+    assert ed['rt_avg'] == 383.318965517
+    assert ed['rt_sd'] == 143.630327349
+    assert ed['rt_cv'] == 0.374701855
+    assert ed['rolling_accuracy_start'] == 1.0
+    assert ed['rolling_accuracy_end'] == 0.84
+    assert ed['rolling_accuracy_slope'] == -0.006974754
+    assert ed['rolling_rt_start'] == 368.102040816
+    assert ed['rolling_rt_end'] == 335.023809524
+    assert ed['rolling_rt_cv_slope'] == 0.024385141
+
+
+def test_get_vigilance_curves_matches_window_by_window():
+    df = get_csv_as_df('experiment', PID_SUCCESS)
+    blocks = compile_data.extract_sart_blocks(df)
+    trials = compile_data.pd.concat(blocks)
+    window = 40
+    curves = compile_data.get_vigilance_curves(trials, window)
+    assert len(curves.index) == len(trials.index) - window + 1
+
+    for start in [0, 200, 500, len(trials.index) - window]:
+        window_df = trials.iloc[start:start + window]
+        rts = compile_data.np.array(
+            compile_data._get_correct_rts(
+                compile_data._add_anticipation_errors(window_df.copy())))
+        row = curves.iloc[start]
+        assert round(row['rt_avg'], 6) == round(rts.mean(), 6)
+        assert round(row['rt_cv'], 6) == \
+            round(rts.std(ddof=1) / rts.mean(), 6)
+        assert row['time_elapsed_min'] == \
+            window_df['time_elapsed'].iloc[-1] / 1000 / 60.0
+
+    # fewer trials than a window
+    assert compile_data.get_vigilance_curves(trials.iloc[:10], 50).empty
+    with pytest.raises(ValueError):
+        compile_data.get_vigilance_curves(trials, 0)
+
 
 def test_compile_demographics_data_after_practice_failure():
     pid = PID_FAIL
@@ -547,3 +669,544 @@ def test_compile_retrospective_data_after_practice_success():
     ]
     for label, answer in expected_answers:
         assert data[label] == answer
+
+
+def test_get_scoring_variants():
+    variants = compile_data.get_scoring_variants({
+        'anticipation_threshold': [100, 150, 200],
+        'max_adjacent_rows': [2, 4],
+    })
+    assert len(variants) == 6
+    for v in variants:
+        assert v['num_survey_questions'] == 3
+        assert v['nogo_stimulus'] == '3'
+
+    with pytest.raises(ValueError):
+        compile_data.get_scoring_variants({'not_a_parameter': [1]})
+
+
+def test_sweep_experiment_data():
+    df = get_csv_as_df('experiment', PID_SUCCESS)
+    variants = compile_data.get_scoring_variants({
+        'max_adjacent_rows': [4, 2],
+        'nogo_stimulus': ['3', '5'],
+    })
+    compiled = compile_data.sweep_experiment_data(df, variants)
+    assert len(compiled) == 4
+
+    # default parameters reproduce the standard compile
+    ed = compile_data.compile_experiment_data(df)
+    default_idx = variants.index(compile_data.SCORING_DEFAULTS)
+    assert compiled[default_idx] == ed
+
+    for params, data in zip(variants, compiled):
+        if params['max_adjacent_rows'] == 2 and params['nogo_stimulus'] == '3':
+            assert data['nogo_num_errors'] == ed['nogo_num_errors']
+            assert data['blk3_nogo_num_prev4_rts'] == 6
+        if params['nogo_stimulus'] == '5':
+            assert data['nogo_num_errors'] != ed['nogo_num_errors']
+
+
+def test_sweep_experiment_data_matches_compiling_each_variant():
+    df = get_csv_as_df('experiment', PID_SUCCESS)
+    variants = compile_data.get_scoring_variants({
+        'anticipation_threshold': [100, 150],
+        'max_adjacent_rows': [4, 2],
+        'nogo_stimulus': ['3', '5'],
+        'rolling_window': [20, 10],
+        'event_window_prev': [4, 2],
+    })
+    compiled = compile_data.sweep_experiment_data(df, variants, 'fast')
+    for params, data in zip(variants, compiled):
+        assert data == compile_data.compile_experiment_data(
+            df, engine='fast', **params)
+
+
+def test_get_step_scoring_params():
+    step_params = compile_data.get_step_scoring_params(
+        compile_data.get_variable_graphs()['experiment'])
+    # ratings are only extracted again for another block segmentation
+    assert step_params['rating_regressions'] == ['num_survey_questions']
+    assert step_params['conditions'] == []
+    assert step_params['vigilance'] == [
+        'anticipation_threshold', 'num_survey_questions', 'rolling_window']
+    assert 'rolling_window' not in step_params['regressions']
+
+
+def test_compile_sweep(tmpdir):
+    # NOTE: mock participant 2's experiment data lacks a forecast question
+    experiment_dir = tmpdir.mkdir('experiment')
+    for pid in [PID_SUCCESS, PID_SUCCESS_2]:
+        shutil.copy(mock_csv_path('experiment', pid), str(experiment_dir))
+
+    sweep_df, failures = compile_data.compile_sweep(
+        str(tmpdir), {'anticipation_threshold': [100, 150]})
+    assert len(sweep_df.index) == 2
+    assert list(sweep_df.columns[:9]) == [
+        'variant', 'anticipation_threshold', 'event_window_next',
+        'event_window_prev', 'max_adjacent_rows', 'nogo_stimulus',
+        'num_survey_questions', 'rolling_window', 'id']
+    pid_rows = sweep_df[sweep_df['id'] == PID_SUCCESS]
+    assert list(pid_rows['avg_accuracy']) == [0.934222222, 0.906666667]
+
+    # the failing participant is left out, with its failure
+    assert [f['id'] for f in failures] == [PID_SUCCESS_2]
+    assert failures[0]['source_csv'] == str(experiment_dir.join('2.csv'))
+    assert failures[0]['error'].startswith('IndexError')
+
+    # compressed raw data, worker processes and other engines agree
+    with open(str(experiment_dir.join('1.csv')), 'rb') as f, \
+            gzip.open(str(experiment_dir.join('1.csv.gz')), 'wb') as g:
+        g.write(f.read())
+    experiment_dir.join('1.csv').remove()
+    parallel_df, parallel_failures = compile_data.compile_sweep(
+        str(tmpdir), {'anticipation_threshold': [100, 150]}, 'fast', 2)
+    assert parallel_df.equals(sweep_df)
+    assert [f['id'] for f in parallel_failures] == [PID_SUCCESS_2]
+
+
+def test_compile_sweep_accuracy_only(tmpdir):
+    experiment_dir = tmpdir.mkdir('experiment')
+    shutil.copy(mock_csv_path('experiment', PID_SUCCESS), str(experiment_dir))
+    grid = {'anticipation_threshold': [150, 100]}
+
+    sweep_df, _ = compile_data.compile_sweep(str(tmpdir), grid)
+    accuracy_df, _ = compile_data.compile_sweep(
+        str(tmpdir), grid, accuracy_only=True)
+    assert len(accuracy_df.index) == 2
+    assert 'avg_go_errors' in accuracy_df.columns
+    assert 'rt_avg' not in accuracy_df.columns
+    for column in accuracy_df.columns:
+        assert list(accuracy_df[column]) == list(sweep_df[column])
+
+    with pytest.raises(ValueError):
+        compile_data.compile_sweep(
+            str(tmpdir), {'max_adjacent_rows': [2]}, accuracy_only=True)
+
+
+def test_cli_sweep(tmpdir, capsys):
+    experiment_dir = tmpdir.mkdir('experiment')
+    for pid in [PID_SUCCESS, PID_SUCCESS_2]:
+        shutil.copy(mock_csv_path('experiment', pid), str(experiment_dir))
+
+    assert compile_data.cli([
+        '--data-dir', str(tmpdir), 'sweep', 'max_adjacent_rows=2,4',
+        'nogo_stimulus=3']) == 0
+    sweep_df = compile_data.pd.read_csv(
+        str(tmpdir.join('compiled_sweep.csv')))
+    assert list(sweep_df['max_adjacent_rows']) == [2, 4]
+    with open(str(tmpdir.join('compiled_sweep-failures.json'))) as f:
+        assert [f['id'] for f in json.load(f)['failures']] == [
+            PID_SUCCESS_2]
+    assert 'failed to compile' in capsys.readouterr()[1]
+
+    # bad parameters are reported as usage errors
+    for params in [['not_a_parameter=1'], ['max_adjacent_rows=two'],
+                   ['max_adjacent_rows=0'], ['rolling_window'],
+                   ['anticipation_threshold=100,'],
+                   ['nogo_stimulus=3', 'nogo_stimulus=5'],
+                   ['--accuracy-only', 'max_adjacent_rows=2']]:
+        with pytest.raises(SystemExit):
+            compile_data.cli(['--data-dir', str(tmpdir), 'sweep'] + params)
+        assert 'error:' in capsys.readouterr()[1]
+
+
+def test_main_with_memory_budget_spills_and_matches(data_dir, monkeypatch):
+    compiled_csv = os.path.join(data_dir, 'compiled.csv')
+
+    compile_data.main(data_dir)
+    with open(compiled_csv) as f:
+        expected = f.read()
+
+    num_spills = []
+    spill = compile_data.CompiledResults.spill
+
+    def record_spill(results, *args):
+        spill(results, *args)
+        num_spills.append(len(results.spill_paths))
+    monkeypatch.setattr(compile_data.CompiledResults, 'spill', record_spill)
+
+    # over budget, rows are spilled once enough are held in memory
+    compile_data.main(data_dir, memory_budget_mb=0.001)
+    assert num_spills == [0, 0]
+    monkeypatch.setattr(compile_data, 'SPILL_MIN_ROWS', 1)
+    del num_spills[:]
+    compile_data.main(data_dir, memory_budget_mb=0.001)
+    assert num_spills == [1, 2]
+    with open(compiled_csv) as f:
+        assert f.read() == expected
+
+    df = compile_data.pd.read_csv(compiled_csv, index_col=0)
+    assert list(df.columns[:4]) == [
+        'id', 'passed_practice', 'num_practice_blk2s', 'missing_data']
+    assert sorted(df['id']) == [1, 401]
+
+
+def test_memory_monitor_reports_heaviest_participants():
+    monitor = compile_data.MemoryMonitor(budget_mb=0.001)
+    for pid in [PID_SUCCESS, PID_FAIL]:
+        monitor.start_participant()
+        get_csv_as_df('practice', pid)
+        monitor.end_participant(pid, [mock_csv_path('practice', pid)],
+                                monitor.measure_participant())
+
+    assert monitor.is_over_budget()
+    heaviest = monitor.get_heaviest_participants(1)
+    assert len(heaviest) == 1
+    assert 'Heaviest participants' in monitor.report()
+
+
+def test_main_measures_memory_in_workers(data_dir, capsys):
+    compile_data.main(data_dir, workers=2, memory_report=True)
+    out, _ = capsys.readouterr()
+    # participants compiled by worker processes are measured there
+    heaviest = out.split('Heaviest participants:\n')[1].splitlines()
+    assert sorted(line.split(':')[0].strip() for line in heaviest
+                  if line.startswith('  ')) == [PID_SUCCESS, PID_FAIL]
+
+
+def test_main_with_workers_and_subset_merge(data_dir):
+    compiled_csv = os.path.join(data_dir, 'compiled.csv')
+
+    compile_data.main(data_dir)
+    with open(compiled_csv) as f:
+        expected = f.read()
+
+    compile_data.main(data_dir, workers=2)
+    with open(compiled_csv) as f:
+        assert f.read() == expected
+
+    # recompiling a subset replaces only those participants' rows, in place,
+    # leaving the others as they were written
+    expected_df = compile_data.pd.read_csv(compiled_csv, index_col=0)
+    assert compile_data.main(data_dir, ids=[PID_FAIL]) == 1
+    with open(compiled_csv) as f:
+        lines = f.read().splitlines()
+    assert lines == expected.splitlines()
+    assert compile_data.main(data_dir, since=time.time() + 60) == 0
+    df = compile_data.pd.read_csv(compiled_csv, index_col=0)
+    assert list(df.columns) == list(expected_df.columns)
+    assert sorted(df['id']) == [1, 401]
+    df = df.sort_values('id').reset_index(drop=True)
+    expected_df = expected_df.sort_values('id').reset_index(drop=True)
+    assert df.equals(expected_df)
+
+
+def test_cli_studies_compiles_on_one_pool(tmpdir):
+    study_a = make_data_dir(tmpdir.mkdir('a'))
+    study_b = make_data_dir(
+        tmpdir.mkdir('b'), {'practice': [PID_FAIL], 'follow_up': [PID_FAIL]})
+    empty_study = make_data_dir(tmpdir.mkdir('empty'), {})
+    compile_data.main(study_a)
+    with open(os.path.join(study_a, 'compiled.csv')) as f:
+        expected = f.read()
+
+    combined_csv = str(tmpdir.join('combined.csv'))
+    assert compile_data.cli([
+        'studies', study_a, 'second=' + study_b, empty_study,
+        '--output-dir', str(tmpdir), '--combined', combined_csv,
+        '--workers', '2']) == 0
+    for name in ['a', 'second', 'empty']:
+        assert tmpdir.join('{}-compiled.csv'.format(name)).check()
+    with tmpdir.join('a-compiled.csv').open() as f:
+        assert f.read() == expected
+
+    df = compile_data.pd.read_csv(combined_csv, index_col=0, dtype={'id': str})
+    assert list(df.columns[:2]) == ['study', 'id']
+    assert list(zip(df['study'], df['id'])) == [
+        ('a', PID_SUCCESS), ('a', PID_FAIL), ('second', PID_FAIL)]
+
+    # each study's values are copied as they were written
+    combined_df = compile_data.read_compiled_csv_as_text(combined_csv)
+    study_df = compile_data.read_compiled_csv_as_text(
+        str(tmpdir.join('a-compiled.csv')))
+    study_rows = combined_df[combined_df['study'] == 'a']
+    for column in study_df.columns:
+        assert list(study_rows[column].fillna('')) == list(study_df[column])
+    assert list(study_df['age']) == ['28', '23']
+
+    with pytest.raises(ValueError):
+        compile_data.compile_studies([('a', study_a), ('a', study_b)])
+
+
+def test_save_json_replaces_file(tmpdir, monkeypatch):
+    path = str(tmpdir.join('data.json'))
+    compile_data.save_json({'a': 1}, path)
+
+    # the file is replaced by renaming, never removed first
+    def remove(path):
+        raise AssertionError('removed {}'.format(path))
+    monkeypatch.setattr(compile_data.os, 'remove', remove)
+    compile_data.save_json({'a': 2}, path)
+    with open(path) as f:
+        assert json.load(f) == {'a': 2}
+    assert [p.basename for p in tmpdir.listdir()] == ['data.json']
+
+
+def test_cli_compile_isolates_failures_and_retries_them(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    for exp_stage in compile_data.EXP_STAGES:
+        shutil.copytree(os.path.join(MOCK_DATA_DIR, exp_stage),
+                        str(data_dir.join(exp_stage)))
+    data_dir = str(data_dir)
+    compiled_csv = os.path.join(data_dir, 'compiled.csv')
+    manifest_path = os.path.join(data_dir, 'compiled-failures.json')
+
+    # participant 2's experiment data can't be compiled; the others can
+    assert compile_data.cli(['--data-dir', data_dir, 'compile']) == 1
+    df = compile_data.pd.read_csv(compiled_csv, index_col=0, dtype={'id': str})
+    assert sorted(df['id']) == [PID_SUCCESS, PID_FAIL]
+    failures = compile_data.read_failure_manifest(manifest_path)
+    assert [f['id'] for f in failures] == ['2']
+    assert failures[0]['source_csv'] == os.path.join(
+        data_dir, 'experiment', '2.csv')
+    assert 'Traceback' in failures[0]['traceback']
+
+    # once fixed, only the failed participant is compiled again (and the
+    # others' rows are left as they were)
+    with open(compiled_csv) as f:
+        compiled_lines = f.read().splitlines()
+    os.remove(failures[0]['source_csv'])
+    assert compile_data.main(data_dir, retry_failed=True) == 1
+    with open(compiled_csv) as f:
+        assert f.read().splitlines()[:3] == compiled_lines
+    df = compile_data.pd.read_csv(compiled_csv, index_col=0, dtype={'id': str})
+    assert sorted(df['id']) == [PID_SUCCESS, '2', PID_FAIL]
+    assert df[df['id'] == '2']['missing_data'].all()
+    assert not os.path.exists(manifest_path)
+    assert compile_data.main(data_dir, retry_failed=True) == 0
+
+
+def test_cli_compile_with_exgauss_fits(data_dir):
+    compiled_csv = os.path.join(data_dir, 'compiled.csv')
+    compile_data.cli(['--data-dir', data_dir, 'compile', '--exgauss',
+                      '--workers', '2'])
+    df = compile_data.pd.read_csv(compiled_csv, index_col=0, dtype={'id': str})
+    exg_columns = [c for c in df.columns if c.startswith('exg_')]
+    assert len(exg_columns) == 3 * (1 + 5)
+
+    ed = compile_data.compile_experiment_data(
+        get_csv_as_df('experiment', PID_SUCCESS), exgauss=True)
+    row = df[df['id'] == PID_SUCCESS].iloc[0]
+    for column in exg_columns:
+        assert round(row[column], 6) == round(ed[column], 6)
+    # the RT distribution's tail grows over the experiment
+    assert ed['exg_blk5_tau'] > ed['exg_blk1_tau']
+    assert df[df['id'] == PID_FAIL][exg_columns].isnull().all(axis=1).all()
+
+
+def test_find_raw_data_csvs(data_dir):
+    raw_data_csvs = compile_data.find_raw_data_csvs(data_dir, ids=[PID_FAIL])
+    assert [len(raw_data_csvs[s]) for s in compile_data.EXP_STAGES] == \
+        [1, 0, 1]
+
+    # participants are included by their most recently modified file
+    old_csv = os.path.join(data_dir, 'practice', '{}.csv'.format(PID_FAIL))
+    os.utime(old_csv, (0, 0))
+    raw_data_csvs = compile_data.find_raw_data_csvs(data_dir, since=60)
+    assert old_csv in raw_data_csvs['practice']
+
+    os.utime(os.path.join(
+        data_dir, 'follow_up', '{}.csv'.format(PID_FAIL)), (0, 0))
+    raw_data_csvs = compile_data.find_raw_data_csvs(data_dir, since=60)
+    assert old_csv not in raw_data_csvs['practice']
+    assert len(raw_data_csvs['practice']) == 1
+
+    assert compile_data.find_missing_data(data_dir) == [
+        (PID_FAIL, ['experiment'])]
+
+
+def test_cli_inserts_default_command():
+    insert = compile_data._insert_default_command
+    assert insert([]) == ['compile']
+    assert insert(['--ids', '1']) == ['compile', '--ids', '1']
+    assert insert(['--data-dir', 'diff', '--ids', '1']) == [
+        '--data-dir', 'diff', 'compile', '--ids', '1']
+    assert insert(['--data-dir=data', '-j', '2']) == [
+        '--data-dir=data', 'compile', '-j', '2']
+    assert insert(['--data-dir', 'data', 'status']) == [
+        '--data-dir', 'data', 'status']
+    assert insert(['--help']) == ['--help']
+    assert insert(['--ids', 'diff']) == ['compile', '--ids', 'diff']
+
+
+def test_cli_status_does_not_import_pandas(data_dir):
+    code = (
+        'import sys; from scripts import compile_data; '
+        'compile_data.cli(["--data-dir", {!r}, "status"]); '
+        'assert "pandas" not in sys.modules'.format(data_dir))
+    output = subprocess.check_output(
+        [sys.executable, '-c', code],
+        cwd=os.path.join(TESTS_DIR, '..', '..')).decode('utf-8')
+    assert 'practice: 2 file(s)' in output
+    assert 'Compiled output: none' in output
+
+
+def test_cli_validate(data_dir, capsys):
+    assert compile_data.cli(['--data-dir', data_dir, 'validate']) == 0
+
+    with open(os.path.join(data_dir, 'experiment', '3.csv'), 'w') as f:
+        f.write('rt,key_press\n')
+    assert compile_data.cli(['--data-dir', data_dir, 'validate']) == 1
+    out, err = capsys.readouterr()
+    assert '3.csv\tcolumns\tmissing column(s): ' in out
+
+
+def test_fast_engine_matches_reference_engine():
+    for pid in [PID_SUCCESS, PID_SUCCESS_2, PID_FAIL]:
+        df = get_csv_as_df('practice', pid)
+        assert compile_data.compile_practice_data(df, engine='fast') == \
+            compile_data.compile_practice_data(df)
+
+    df = get_csv_as_df('experiment', PID_SUCCESS)
+    fast_blocks = compile_data.extract_sart_blocks_fast(df, with_survey=True)
+    blocks = compile_data.extract_sart_blocks(df, with_survey=True)
+    assert [list(b.index) for b in fast_blocks] == \
+        [list(b.index) for b in blocks]
+
+    fast_data = compile_data.compile_experiment_data(df, engine='fast')
+    assert equivalence.compare_compiled_data(
+        compile_data.compile_experiment_data(df), fast_data) == []
+    assert 'anticipate_error' not in df  # left unchanged
+
+
+def test_get_engine():
+    assert compile_data.get_engine('fast') is compile_data.ENGINES['fast']
+    with pytest.raises(ValueError):
+        compile_data.get_engine('nope')
+
+
+def test_cli_fuzz_and_benchmark(capsys):
+    assert compile_data.cli(['fuzz', '--cases', '20', '--seed', '0']) == 0
+    assert '20 case(s), 0 difference(s)' in capsys.readouterr()[0]
+
+    assert compile_data.cli([
+        'benchmark', '--trials', '50', '--blocks', '5', '--repeat', '1']) == 0
+    assert 'summarize_block_performance' in capsys.readouterr()[0]
+
+
+def test_main_with_fast_engine_verifies_against_reference(
+        data_dir, capsys, monkeypatch):
+    compiled_csv = os.path.join(data_dir, 'compiled.csv')
+
+    compile_data.main(data_dir)
+    with open(compiled_csv) as f:
+        expected = f.read()
+
+    compile_data.main(data_dir, engine='fast', verify=1.0)
+    with open(compiled_csv) as f:
+        assert f.read() == expected
+    out, err = capsys.readouterr()
+    assert 'Verified 2 participant(s) against other engines: 0 differ' in err
+
+    # an engine that drifts is reported
+    def summarize_block_performance_drift(df, **scoring):
+        performance = compile_data.summarize_block_performance_fast(
+            df, **scoring)
+        performance['rt_avg'] += 1e-6
+        return performance
+    monkeypatch.setitem(
+        compile_data.ENGINES, 'drift', compile_data.ENGINES['fast']._replace(
+            summarize_block_performance=summarize_block_performance_drift))
+    compile_data.main(data_dir, engine='fast', verify=1.0)
+    out, err = capsys.readouterr()
+    # the participant who failed practice has no experiment data
+    assert 'Verified 2 participant(s) against other engines: 1 differ' in err
+    assert '{}\tblk1_rt_avg\tfast='.format(PID_SUCCESS) in err
+    assert '\tdrift=' in err
+    assert '\treference=' not in err
+
+
+def test_variable_registry_orders_columns():
+    registry = compile_data.VARIABLES
+    names = ['sex', 'blk2_accuracy', 'auc_effort', 'missing_data', 'id',
+             'blk10_accuracy', 'age', 'time_practice_blk2_3_ms']
+    assert compile_data.get_ordered_columns(names) == [
+        'id', 'missing_data', 'auc_effort', 'blk10_accuracy',
+        'blk2_accuracy', 'time_practice_blk2_3_ms', 'age', 'sex']
+
+    blk_names = registry.get_family_names('blk', 7)
+    assert blk_names['rt_avg'] == 'blk7_rt_avg'
+    rt_avg = registry.get_variable(registry.index('blk7_rt_avg'))
+    assert rt_avg.dtype == 'float'
+
+    # unregistered variables infer their dtype
+    new_var = registry.get_variable(registry.index('a_new_variable', 3))
+    assert new_var.dtype == 'int'
+
+
+def test_row_buffer_writes_typed_columns():
+    registry = compile_data.VARIABLES
+    buf = compile_data.RowBuffer(3)
+    buf.set_row(0, {'id': '1', 'num_blocks': 5, 'passed_practice': True})
+    buf.set_row(1, {'id': '2', 'num_blocks': None, 'passed_practice': False})
+    buf.set_row(2, {'id': '3', 'num_blocks': 4, 'passed_practice': True})
+
+    # integers stay integers when some rows are missing
+    num_blocks = registry.index('num_blocks')
+    column = buf.get_column(num_blocks, 3, is_complete=False)
+    assert list(column) == [5, None, 4]
+    assert isinstance(column[0], int)
+
+    passed = registry.index('passed_practice')
+    assert list(buf.get_column(passed, 3, True)) == [True, False, True]
+    complete_buf = compile_data.RowBuffer(2)
+    complete_buf.set_row(0, {'num_blocks': 5})
+    complete_buf.set_row(1, {'num_blocks': 4})
+    complete = complete_buf.get_column(num_blocks, 2, is_complete=True)
+    assert complete.dtype == compile_data.np.int64
+    assert list(complete) == [5, 4]
+
+    # a non-numeric value turns a numeric column into objects
+    buf.set_row(0, {'avg_accuracy': 0.5, 'num_blocks': 'n/a'})
+    buf.set_row(1, {'avg_accuracy': 'n/a', 'num_blocks': 2.5})
+    avg_accuracy = registry.index('avg_accuracy')
+    assert list(buf.get_column(avg_accuracy, 2, True)) == [0.5, 'n/a']
+    assert list(buf.get_column(num_blocks, 2, True)) == ['n/a', 2.5]
+
+
+def test_compiled_results_type_columns_across_chunks(tmpdir):
+    participants = [
+        {'id': '1', 'num_blocks': 5, 'avg_accuracy': 0.5},
+        {'id': '2', 'num_blocks': None, 'avg_accuracy': 0.75},
+        {'id': '3', 'num_blocks': 4.5, 'avg_accuracy': 'n/a'},
+    ]
+    for spill in [False, True]:
+        results = compile_data.CompiledResults(len(participants))
+        for participant in participants:
+            results.append(participant)
+            if spill:
+                results.spill()
+        path = str(tmpdir.join('compiled.csv'))
+        results.to_csv(path)
+        results.close()
+        with open(path) as f:
+            assert f.read().splitlines() == [
+                ',id,num_blocks,avg_accuracy',
+                '0,1,5.0,0.5', '1,2,,0.75', '2,3,4.5,n/a']
+
+
+def test_compiled_results_place_rows_by_position(tmpdir):
+    participants = [
+        {'id': str(i), 'num_blocks': 5, 'avg_accuracy': 0.9 - i / 100.0,
+         'sex': 'Female, "other"' if i == 2 else 'Male'}
+        for i in range(6)]
+    expected_results = compile_data.CompiledResults(len(participants))
+    for participant in participants:
+        expected_results.append(participant)
+    expected_path = str(tmpdir.join('expected.csv'))
+    expected_results.to_csv(expected_path)
+
+    # rows arriving out of order, with spills, are written in order
+    results = compile_data.CompiledResults(len(participants))
+    for i, position in enumerate([3, 0, 5, 1, 4, 2]):
+        results.append(participants[position], position)
+        if i % 2:
+            results.spill()
+    output_path = str(tmpdir.join('compiled.csv'))
+    try:
+        results.to_csv(output_path)
+    finally:
+        results.close()
+    with open(expected_path) as f, open(output_path) as g:
+        assert g.read() == f.read()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import os
+import csv
+import gzip
+import json
+import shutil
+
+from scripts import compile_data, dedup
+
+from conftest import (
+    MOCK_DATA_DIR, PID_FAIL, PID_SUCCESS, make_data_dir, mock_csv_path)
+
+
+def _rewrite_csv(path, new_path, participant_id=None, num_rows=None,
+                 time_offset=0):
+    """Copy raw data CSV, changing its participant ID, keeping only its
+    first rows and shifting its elapsed times.
+    """
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    with open(path) as f:
+        columns = next(csv.reader(f))
+    with open(new_path, 'w') as f:
+        writer = csv.DictWriter(f, columns, lineterminator='\n')
+        writer.writeheader()
+        for row in rows[:num_rows]:
+            if participant_id is not None:
+                row['participant_id'] = participant_id
+            row['time_elapsed'] = int(row['time_elapsed']) + time_offset
+            writer.writerow(row)
+
+
+def _copy_old(path, new_path):
+    shutil.copy(path, new_path)
+    os.utime(new_path, (0, 0))
+
+
+def _add_resubmissions(data_dir):
+    """Add duplicated, resubmitted and mismatched files to a data directory.
+    Return dict of their paths.
+    """
+    paths = {
+        'copy': os.path.join(data_dir, 'practice', '1.csv.gz'),
+        'reused_trials': os.path.join(data_dir, 'practice', '5.csv'),
+        'truncated': os.path.join(data_dir, 'experiment', '7.csv'),
+        'mismatch': os.path.join(data_dir, 'follow_up', '6.csv'),
+    }
+    with open(mock_csv_path('practice', PID_SUCCESS), 'rb') as f, \
+            gzip.open(paths['copy'], 'wb') as g:
+        g.write(f.read())
+    _rewrite_csv(mock_csv_path('practice', PID_FAIL), paths['reused_trials'],
+                 participant_id='5', time_offset=1000)
+    with open(mock_csv_path('experiment', PID_SUCCESS)) as f:
+        num_rows = len(f.readlines()) - 1
+    _rewrite_csv(mock_csv_path('experiment', PID_SUCCESS), paths['truncated'],
+                 participant_id='7', num_rows=int(num_rows * 0.95))
+    _rewrite_csv(mock_csv_path('follow_up', '2'), paths['mismatch'],
+                 participant_id=PID_SUCCESS)
+    return paths
+
+
+def _get_findings(findings, check):
+    return [f for f in findings if f['check'] == check]
+
+
+def test_find_duplicate_files_mock_data():
+    raw_data_csvs = compile_data.find_raw_data_csvs(MOCK_DATA_DIR)
+    assert dedup.find_duplicate_files(raw_data_csvs) == []
+
+
+def test_find_duplicate_files(tmpdir):
+    data_dir = make_data_dir(tmpdir.mkdir('data'), copy=_copy_old)
+    paths = _add_resubmissions(data_dir)
+    practice_1 = os.path.join(data_dir, 'practice', '1.csv')
+    practice_401 = os.path.join(data_dir, 'practice', '401.csv')
+
+    findings = dedup.find_data_dir_duplicates(data_dir, workers=2)
+    duplicates = _get_findings(findings, 'duplicate')
+    assert [(f['paths'], f['exact']) for f in duplicates] == [
+        ([practice_1, paths['copy']], True),
+        ([practice_401, paths['reused_trials']], False)]
+
+    near_duplicates = _get_findings(findings, 'near_duplicate')
+    assert [f['paths'] for f in near_duplicates] == [[
+        os.path.join(data_dir, 'experiment', '1.csv'), paths['truncated']]]
+    # (the truncated file's trials are all in the complete one)
+    assert near_duplicates[0]['overlap'] == 1
+
+    assert [f['paths'] for f in _get_findings(findings, 'id_mismatch')] == [
+        [paths['mismatch']]]
+    collisions = _get_findings(findings, 'id_collision')
+    assert [f['participant_ids'] for f in collisions] == [[PID_SUCCESS]]
+    assert sorted(set(collisions[0]['ids'])) == [PID_SUCCESS, '6']
+
+    # the later copies of duplicates are redundant
+    assert dedup.get_redundant_paths(findings) == set(
+        [paths['copy'], paths['reused_trials']])
+    report = json.loads(dedup.dumps(findings))
+    assert report['summary']['num_redundant'] == 2
+
+
+def test_cli_dedup_and_compile(tmpdir):
+    data_dir = make_data_dir(tmpdir.mkdir('data'), copy=_copy_old)
+    report_path = str(tmpdir.join('duplicates.json'))
+    assert compile_data.cli(
+        ['--data-dir', data_dir, 'dedup', '--report', report_path]) == 0
+    _add_resubmissions(data_dir)
+    assert compile_data.cli(
+        ['--data-dir', data_dir, 'dedup', '--report', report_path]) == 1
+
+    compile_data.cli(['--data-dir', data_dir, 'compile', '--dedup'])
+    df = compile_data.pd.read_csv(
+        os.path.join(data_dir, 'compiled.csv'), index_col=0,
+        dtype={'id': str})
+    # participant 1's compressed copy and 401's resubmission are left out
+    assert sorted(df['id']) == [PID_SUCCESS, PID_FAIL]
+    assert os.path.exists(os.path.join(data_dir, 'duplicates.json'))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from scripts import compile_data, equivalence, kernels
+
+
+def test_compare_compiled_data():
+    expected = {'a': 0.1234567891, 'b': float('nan'), 'c': 'x', 'd': 1}
+    actual = {'a': 0.1234567894, 'b': float('nan'), 'c': 'y', 'e': 2}
+    assert [name for name, _, _ in equivalence.compare_compiled_data(
+        expected, actual)] == ['c', 'd', 'e']
+    assert equivalence.compare_compiled_data(expected, dict(expected)) == []
+
+
+def test_sample_paths():
+    paths = ['{}.csv'.format(i) for i in range(10)]
+    assert equivalence.sample_paths(paths, 0.0) == set()
+    assert len(equivalence.sample_paths(paths, 0.01)) == 1
+    assert equivalence.sample_paths(paths, 0.3, seed=1) == \
+        equivalence.sample_paths(list(reversed(paths)), 0.3, seed=1)
+    assert equivalence.sample_paths(paths, 1.0) == set(paths)
+
+
+def test_generate_sart_trials():
+    df = equivalence.generate_sart_trials(
+        np.random.RandomState(0), 40, first_index=5)
+    assert len(df.index) == 40
+    assert df.index[0] == 5
+    assert (df['trial_type'] == compile_data.SART_TRIAL_TYPE).all()
+    assert np.diff(df.index.values).min() >= 1
+
+
+def test_fuzz_engines():
+    assert equivalence.fuzz_engines(200, seed=0) == []
+
+
+def test_benchmark_engines():
+    timings = equivalence.benchmark_engines(
+        num_trials=50, num_blocks=5, num_ratings=10, repeat=1)
+    implementations = set(implementation for _, implementation, _ in timings)
+    assert 'reference' in implementations
+    assert 'fast/numpy' in implementations
+    assert len(timings) == 3 * (1 + len(kernels.BACKENDS))
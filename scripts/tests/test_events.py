@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from scripts import compile_data, equivalence, events
+
+
+def _get_window_rts_loop(indices, rts_ms, events_mask, offsets, segments):
+    """Look up each event's window trial by trial."""
+    window_rts = []
+    for position in np.flatnonzero(events_mask):
+        in_segment = np.flatnonzero(segments == segments[position])
+        rts = []
+        for offset in offsets:
+            matches = [i for i in in_segment
+                       if indices[i] == indices[position] + offset]
+            rts.append(rts_ms[matches[0]] if matches else np.nan)
+        window_rts.append(rts)
+    return np.array(window_rts).reshape(-1, len(offsets))
+
+
+def _get_trials(random_state):
+    """Return arrays of trial indices (with gaps), RTs (some missing),
+    events and segments of several blocks.
+    """
+    num_trials = 300
+    indices = np.cumsum(random_state.randint(1, 3, num_trials))
+    rts_ms = random_state.normal(400, 80, num_trials)
+    rts_ms[random_state.rand(num_trials) < 0.1] = np.nan
+    segments = np.sort(random_state.randint(0, 12, num_trials))
+    return indices, rts_ms, random_state.rand(num_trials) < 0.15, segments
+
+
+def test_get_event_locked_rts_matches_loop():
+    random_state = np.random.RandomState(0)
+    for _ in range(10):
+        indices, rts_ms, events_mask, segments = _get_trials(random_state)
+        for offsets in events.get_window_offsets(4, 3, include_event=True):
+            window_rts = events.get_event_locked_rts(
+                indices, rts_ms, events_mask, offsets, segments)
+            expected = _get_window_rts_loop(
+                indices, rts_ms, events_mask, offsets, segments)
+            assert window_rts.shape == (events_mask.sum(), len(offsets))
+            assert np.array_equal(np.isnan(window_rts), np.isnan(expected))
+            assert np.allclose(window_rts[~np.isnan(window_rts)],
+                               expected[~np.isnan(expected)])
+
+
+def test_summarize_event_windows():
+    indices, rts_ms, events_mask, segments = _get_trials(
+        np.random.RandomState(1))
+    summary = events.summarize_event_windows(
+        indices, rts_ms, events_mask, 4, 2, segments)
+
+    assert summary['num_events'] == events_mask.sum()
+    prev_offsets, next_offsets = events.get_window_offsets(4, 2)
+    for name, offsets in [('prev', prev_offsets), ('next', next_offsets)]:
+        rts = _get_window_rts_loop(
+            indices, rts_ms, events_mask, offsets, segments)
+        rts = rts[~np.isnan(rts)]
+        assert summary['num_{}_rts'.format(name)] == len(rts)
+        assert np.isclose(summary['{}_rt_avg'.format(name)], rts.mean())
+
+    no_events = events.summarize_event_windows(
+        indices, rts_ms, np.zeros(len(indices), bool), 4, 4, segments)
+    assert no_events['num_events'] == 0
+    assert np.isnan(no_events['prev_rt_avg'])
+
+
+def test_summarize_event_locked_rts():
+    df = equivalence.generate_sart_trials(np.random.RandomState(2), 20)
+    df.index = np.arange(len(df))
+    df['correct'] = True
+    df['stimulus'] = '1'
+    df['rt_ms'] = 300.0
+    # a go error, its previous trials slower and next ones faster
+    df.loc[4, 'correct'] = False
+    df.loc[2:3, 'rt_ms'] = 500.0
+    df.loc[5:6, 'rt_ms'] = 200.0
+    # slower trials just after the probe between blocks
+    df.loc[10:11, 'rt_ms'] = 600.0
+    blocks = [df.iloc[:10], df.iloc[10:]]
+
+    summary = compile_data.summarize_event_locked_rts(
+        blocks, num_prev=2, num_next=2)
+    assert summary['go_error_prev_rt_avg'] == 500
+    assert summary['go_error_next_rt_avg'] == 200
+    assert summary['probe_prev_rt_avg'] == 300
+    assert summary['probe_next_rt_avg'] == 600
+    assert summary['anticipation_error_prev_rt_avg'] is None
+    assert summary['anticipation_error_next_rt_avg'] is None
+
+    # windows before and after events are sized separately
+    summary = compile_data.summarize_event_locked_rts(
+        blocks, num_prev=4, num_next=1)
+    assert summary['go_error_prev_rt_avg'] == 400
+    assert summary['go_error_next_rt_avg'] == 200
+    assert summary['probe_next_rt_avg'] == 600
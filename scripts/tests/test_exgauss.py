@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from scipy import optimize, stats
+
+from scripts import exgauss
+
+
+def _simulate_rts(random_state, num_rts, mu=400, sigma=40, tau=100):
+    return random_state.normal(mu, sigma, num_rts) + \
+        random_state.exponential(tau, num_rts)
+
+
+def test_log_likelihoods_match_scipy():
+    random_state = np.random.RandomState(0)
+    samples = [_simulate_rts(random_state, n) for n in [20, 100, 300]]
+    rts, weights = exgauss._pad_samples(samples)
+    params = exgauss.estimate_moments(rts, weights)
+
+    mu, sigma, tau = params[:, 0], np.exp(params[:, 1]), np.exp(params[:, 2])
+    expected = (stats.exponnorm.logpdf(
+        rts, (tau / sigma)[:, np.newaxis], mu[:, np.newaxis],
+        sigma[:, np.newaxis]) * weights).sum(axis=1)
+    actual = exgauss._log_likelihoods(rts, weights, params)
+    assert np.allclose(actual, expected, rtol=1e-9)
+
+    # parameters far from the data (very negative z scores) stay finite
+    far_params = np.array([[900, np.log(200), np.log(5)]] * 3)
+    far = exgauss._log_likelihoods(rts, weights, far_params)
+    assert np.isfinite(far).all()
+    assert (far < actual).all()
+
+
+def test_fit_exgauss_recovers_parameters():
+    random_state = np.random.RandomState(1)
+    fits = exgauss.fit_exgauss([_simulate_rts(random_state, 20000)])
+    assert np.allclose(fits[0], [400, 40, 100], rtol=0.05)
+
+
+def test_fit_exgauss_batch_matches_single_fits_and_optimizer():
+    random_state = np.random.RandomState(2)
+    samples = [_simulate_rts(random_state, n)
+               for n in random_state.randint(30, 300, 20)]
+    fits = exgauss.fit_exgauss(samples)
+
+    for sample, fit in zip(samples, fits):
+        assert np.allclose(exgauss.fit_exgauss([sample])[0], fit, rtol=1e-5)
+
+        # a general-purpose optimizer finds no better fit
+        rts, weights = exgauss._pad_samples([sample])
+        params = np.array([fit[0], np.log(fit[1]), np.log(fit[2])])
+
+        def negative_log_likelihood(x):
+            return -exgauss._log_likelihoods(rts, weights, x[np.newaxis])[0]
+
+        result = optimize.minimize(negative_log_likelihood, params)
+        assert negative_log_likelihood(params) - result.fun < 1e-4
+
+
+def test_fit_exgauss_skips_small_samples():
+    fits = exgauss.fit_exgauss([[350] * 20, [300, 400, 500], []])
+    assert np.isnan(fits).all()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pandas as pd
+import pytest
+
+from scripts import compile_data, graph
+
+from conftest import MOCK_DATA_DIR
+
+
+def test_variable_graph_evaluates_only_required_nodes():
+    calls = []
+
+    def node(name, value):
+        def func(*args):
+            calls.append(name)
+            return value(*args)
+        return func
+
+    variable_graph = graph.VariableGraph(inputs=['x'])
+    variable_graph.add('double', node('double', lambda x: 2 * x), ['x'])
+    variable_graph.add(
+        'sums', node('sums', lambda x, d: {'sum': x + d}), ['x', 'double'],
+        ['sum'])
+    variable_graph.add(
+        'powers', node('powers', lambda d: {
+            'square_{}'.format(d): d ** 2, 'cube': d ** 3}),
+        ['double'], [r'square_\d+', 'cube'])
+    variable_graph.add(
+        'other', node('other', lambda x: {'negative': -x}), ['x'],
+        ['negative'])
+
+    assert variable_graph.get_provider('square_4') == 'powers'
+    assert variable_graph.get_provider('square_x') is None
+    assert variable_graph.resolve(['cube', 'sum']) == [
+        'double', 'sums', 'powers']
+    assert variable_graph.provides_any(['negative', 'unknown'])
+    assert not variable_graph.provides_any(['unknown'])
+
+    # shared intermediates are computed once
+    assert variable_graph.evaluate({'x': 2}, ['sum', 'cube']) == {
+        'sum': 6, 'square_4': 16, 'cube': 64}
+    assert calls == ['double', 'sums', 'powers']
+
+    # nodes given as inputs aren't evaluated
+    del calls[:]
+    assert variable_graph.evaluate({'x': 2, 'double': 10}, ['sum']) == {
+        'sum': 12}
+    assert calls == ['sums']
+
+    # node values may be kept, to pass in to later evaluations
+    values = {}
+    variable_graph.evaluate({'x': 2}, ['sum'], values)
+    assert values == {'x': 2, 'double': 4, 'sums': {'sum': 6}}
+    assert variable_graph.evaluate({'x': 1}) == {
+        'sum': 3, 'square_2': 4, 'cube': 8, 'negative': -1}
+
+    with pytest.raises(ValueError):
+        variable_graph.add('bad', lambda y: y, ['y'])
+
+
+def test_compile_experiment_data_subset_matches_full():
+    df = compile_data.get_csv_as_dataframe(
+        os.path.join(MOCK_DATA_DIR, 'experiment', '1.csv'))
+    compiled = compile_data.compile_experiment_data(df)
+
+    variables = ['accuracy_slope', 'blk2_accuracy', 'rt_avg', 'exg_mu',
+                 'digit3_accuracy']
+    subset = compile_data.compile_experiment_data(df, variables=variables)
+    for name in ['accuracy_slope', 'blk2_accuracy', 'rt_avg']:
+        assert subset[name] == compiled[name]
+    # asking for ex-Gaussian or breakdown variables turns their steps on
+    assert subset['exg_mu'] == compile_data.compile_experiment_data(
+        df, exgauss=True)['exg_mu']
+    assert 'digit3_accuracy' in subset
+    assert 'arousal_post_feeling' not in subset
+    assert 'start_effort' not in subset
+
+
+def test_compile_participant_skips_unneeded_stages(monkeypatch):
+    raw_data_csvs = compile_data.find_raw_data_csvs(MOCK_DATA_DIR)
+    practice_csv = os.path.join(MOCK_DATA_DIR, 'practice', '1.csv')
+    compiled = compile_data.compile_participant(
+        practice_csv, raw_data_csvs, MOCK_DATA_DIR)
+
+    read_paths = []
+    get_csv_as_dataframe = compile_data.get_csv_as_dataframe
+
+    def record_read(path):
+        read_paths.append(path)
+        return get_csv_as_dataframe(path)
+
+    monkeypatch.setattr(compile_data, 'get_csv_as_dataframe', record_read)
+    participant = compile_data.compile_participant(
+        practice_csv, raw_data_csvs, MOCK_DATA_DIR,
+        variables=['avg_accuracy', 'missing_data'])
+    assert participant == dict(
+        (k, compiled[k]) for k in ['id', 'avg_accuracy', 'missing_data'])
+    assert [os.path.basename(os.path.dirname(p)) for p in read_paths] == [
+        'practice', 'experiment']
+
+    participant = compile_data.compile_participant(
+        practice_csv, raw_data_csvs, MOCK_DATA_DIR,
+        variables=['tlx_scale_1', 'passed_practice'])
+    assert participant == dict(
+        (k, compiled[k]) for k in ['id', 'tlx_scale_1', 'passed_practice'])
+
+
+def test_main_compiles_variables(tmpdir):
+    output_path = str(tmpdir.join('vars.csv'))
+    with pytest.raises(ValueError):
+        compile_data.main(
+            MOCK_DATA_DIR, output_path, variables=['avg_accuracy', 'nope'])
+    with pytest.raises(ValueError):
+        compile_data.main(MOCK_DATA_DIR, variables=['avg_accuracy'])
+
+    compile_data.cli([
+        '--data-dir', MOCK_DATA_DIR, 'compile', '-o', output_path,
+        '--vars', 'avg_accuracy,sms_1'])
+    compiled_df = pd.read_csv(output_path, index_col=0)
+    assert set(compiled_df.columns) == set(['id', 'avg_accuracy', 'sms_1'])
+    assert not os.path.exists(str(tmpdir.join('vars-aggregates.json')))
+
+    with pytest.raises(ValueError):
+        compile_data.main(
+            MOCK_DATA_DIR, output_path, ids=['1'], variables=['avg_accuracy'])
+    with pytest.raises(ValueError):
+        compile_data.main(
+            MOCK_DATA_DIR, output_path, variables=['avg_accuracy'],
+            sqlite_path=str(tmpdir.join('compiled.db')))
+
+    # a subset of variables can be compiled again, but can't overwrite an
+    # output holding other variables (e.g., a complete compile)
+    compile_data.main(
+        MOCK_DATA_DIR, output_path, variables=['sms_1', 'avg_accuracy'])
+    with pytest.raises(ValueError):
+        compile_data.main(MOCK_DATA_DIR, output_path, variables=['sms_1'])
+
+
+def test_cli_rejects_variables_options(tmpdir):
+    complete_path = str(tmpdir.join('compiled.csv'))
+    compile_data.main(MOCK_DATA_DIR, complete_path)
+    with open(complete_path) as f:
+        complete_csv = f.read()
+
+    for args in [[], ['-o', complete_path],
+                 ['-o', str(tmpdir.join('vars.csv')), '--sqlite',
+                  str(tmpdir.join('compiled.db'))]]:
+        with pytest.raises(SystemExit):
+            compile_data.cli([
+                '--data-dir', MOCK_DATA_DIR, 'compile', '--vars',
+                'avg_accuracy'] + args)
+    with open(complete_path) as f:
+        assert f.read() == complete_csv
+    assert not os.path.exists(str(tmpdir.join('compiled.db')))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from scripts import compile_data, hashes
+
+from conftest import MOCK_DATA_DIR
+
+
+def test_format_value():
+    assert hashes.format_value(3) == hashes.format_value(3.0) == '3.0'
+    assert hashes.format_value(np.int64(3)) == '3.0'
+    assert hashes.format_value(np.bool_(True)) == 'True'
+    assert hashes.format_value(0.1 + 0.2) == repr(0.1 + 0.2)
+    assert hashes.format_value(None) is None
+    assert hashes.format_value(np.nan) is None
+    assert hashes.format_value(u'3') == '3.0'
+    assert hashes.format_value(u'1990-01-01') == u'1990-01-01'
+
+
+def test_diff_hashes():
+    participants = [
+        {'id': '1', 'avg_accuracy': 0.9, 'sex': 'f'},
+        {'id': '2', 'avg_accuracy': 0.8, 'sex': None},
+    ]
+    old = hashes.hash_participants(participants)
+    assert hashes.hash_participants(reversed(participants)) == old
+    assert set(old['columns']) == set(['id', 'avg_accuracy', 'sex'])
+    assert not hashes.has_differences(hashes.diff_hashes(old, old))
+
+    # swapping values between participants changes the column checksum
+    swapped = hashes.hash_participants([
+        {'id': '1', 'avg_accuracy': 0.8, 'sex': 'f'},
+        {'id': '2', 'avg_accuracy': 0.9},
+    ])
+    diff = hashes.diff_hashes(old, swapped)
+    assert diff['participants']['changed'] == ['1', '2']
+    assert diff['variables']['changed'] == ['avg_accuracy']
+
+    new = hashes.hash_participants([
+        {'id': '2', 'avg_accuracy': 0.8},
+        {'id': '3', 'avg_accuracy': 0.7, 'rolling_rt_slope': 1.5},
+    ])
+    diff = hashes.diff_hashes(old, new)
+    assert diff['participants'] == {
+        'added': ['3'], 'removed': ['1'], 'changed': []}
+    assert diff['variables'] == {
+        'added': ['rolling_rt_slope'], 'removed': ['sex'],
+        'changed': ['avg_accuracy', 'id']}
+    assert 'added\tparticipant\t3' in hashes.format_diff(diff)
+
+
+def test_compile_saves_hashes(tmpdir, capsys):
+    output_path = str(tmpdir.join('compiled.csv'))
+    compile_data.main(MOCK_DATA_DIR, output_path)
+    hashes_path = hashes.get_hashes_path(output_path)
+    assert hashes.load_hashes(output_path) == \
+        hashes.hash_compiled_csv(output_path)
+    assert not os.path.exists(hashes.get_previous_hashes_path(output_path))
+
+    # compiled data hashes the same as its CSV
+    raw_data_csvs = compile_data.find_raw_data_csvs(MOCK_DATA_DIR)
+    participant = compile_data.compile_participant(
+        os.path.join(MOCK_DATA_DIR, 'practice', '1.csv'), raw_data_csvs,
+        MOCK_DATA_DIR)
+    with open(hashes_path) as f:
+        saved_hashes = json.load(f)
+    assert hashes.hash_participant(participant)[0] == \
+        saved_hashes['participants']['1']
+
+    # recompiling unchanged data keeps the same hashes
+    compile_data.main(MOCK_DATA_DIR, output_path)
+    assert compile_data.cli([
+        'diff', hashes.get_previous_hashes_path(output_path),
+        output_path]) == 0
+
+    # a changed value is reported by participant and variable
+    changed_path = str(tmpdir.join('changed.csv'))
+    compiled_df = pd.read_csv(output_path, index_col=0, dtype={'id': str},
+                              float_precision='round_trip')
+    compiled_df.loc[compiled_df['id'] == '1', 'avg_accuracy'] += 0.01
+    compiled_df.to_csv(changed_path)
+    capsys.readouterr()
+    assert compile_data.cli(['diff', output_path, changed_path]) == 1
+    out, _ = capsys.readouterr()
+    assert out.split('\n')[:2] == [
+        'changed\tparticipant\t1', 'changed\tvariable\tavg_accuracy']
+    assert compile_data.cli(
+        ['diff', '--ids', output_path, changed_path]) == 1
+    out, _ = capsys.readouterr()
+    assert out == '1\n'
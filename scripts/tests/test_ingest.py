@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+
+try:
+    from urllib2 import urlopen, Request, HTTPError
+except ImportError:  # Python 3
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
+
+import pytest
+
+from scripts import compile_data, ingest
+
+from conftest import PID_FAIL, PID_SUCCESS, mock_csv_path
+
+# columns holding text in jsPsych data, even when numeric-looking
+TEXT_COLUMNS = [
+    'internal_node_id', 'trial_type', 'participant_id', 'practice_condition',
+    'stimulus', 'font_size', 'responses']
+
+
+def _get_csv_as_records(stage, pid):
+    """Take an experiment stage and participant ID and return mock data as
+    jsPsych trial data records, as posted to the server.
+    """
+    records = []
+    with open(mock_csv_path(stage, pid)) as f:
+        for row in csv.DictReader(f):
+            record = {}
+            for key, value in row.items():
+                if value == '':
+                    continue
+                elif value in ('true', 'false'):
+                    record[key] = (value == 'true')
+                elif key in TEXT_COLUMNS:
+                    record[key] = value
+                else:
+                    try:
+                        record[key] = int(value)
+                    except ValueError:
+                        record[key] = value
+            records.append(record)
+    return records
+
+
+def _get_payload(stage, pid):
+    return {
+        'pathname': stage,
+        'filename': pid,
+        'data': _get_csv_as_records(stage, pid),
+    }
+
+
+@pytest.mark.parametrize('stage,pid', [
+    ('practice', PID_SUCCESS),
+    ('practice', PID_FAIL),
+    ('experiment', PID_SUCCESS),
+    ('follow_up', PID_SUCCESS),
+])
+def test_get_records_as_dataframe_matches_csv(stage, pid):
+    csv_df = compile_data.get_csv_as_dataframe(mock_csv_path(stage, pid))
+    records_df = compile_data.get_records_as_dataframe(
+        _get_csv_as_records(stage, pid))
+    assert list(records_df.dtypes) == list(csv_df.dtypes)
+    assert records_df.equals(csv_df)
+
+
+def test_compile_payload_experiment():
+    compiled = ingest.compile_payload(_get_payload('experiment', PID_SUCCESS))
+    df = compile_data.get_csv_as_dataframe(
+        mock_csv_path('experiment', PID_SUCCESS))
+    assert compiled == compile_data.compile_experiment_data(df)
+
+
+def test_compile_payload_follow_up_after_practice_failure():
+    payload = _get_payload('follow_up', PID_FAIL)
+    compiled = ingest.compile_payload(payload, passed_practice=False)
+    assert compiled['age'] == '23'
+    assert 'tlx_scale_1' not in compiled
+
+
+def test_read_payload_requires_keys(tmpdir):
+    path = tmpdir.join('payload.json')
+    path.write(json.dumps({'pathname': 'practice', 'data': []}))
+    with pytest.raises(ValueError):
+        ingest.read_payload(path.open())
+
+    path.write(json.dumps({'pathname': 'nope', 'filename': '1', 'data': []}))
+    with pytest.raises(ValueError):
+        ingest.read_payload(path.open())
+
+    for filename in ['../1', '1.csv', '']:
+        path.write(json.dumps(
+            {'pathname': 'practice', 'filename': filename, 'data': []}))
+        with pytest.raises(ValueError):
+            ingest.read_payload(path.open())
+
+
+def test_write_payload_csv_rejects_paths(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    data_dir.mkdir('practice')
+    payload = _get_payload('practice', PID_SUCCESS)
+    for key, value in [('filename', '../../1'), ('pathname', '..')]:
+        with pytest.raises(ValueError):
+            ingest.write_payload_csv(dict(payload, **{key: value}),
+                                     str(data_dir))
+    assert tmpdir.listdir() == [data_dir]
+    assert data_dir.join('practice').listdir() == []
+
+
+def test_main_compiles_payload_file(tmpdir, capsys):
+    path = tmpdir.join('payload.json')
+    path.write(json.dumps(_get_payload('practice', PID_SUCCESS)))
+    ingest.main([str(path)])
+    out, err = capsys.readouterr()
+    compiled = json.loads(out)
+    assert compiled['id'] == PID_SUCCESS
+    assert compiled['time_practice_ms'] == 134626
+
+
+def test_stand_in_server_compiles_and_saves_payload(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    data_dir.mkdir('practice')
+    server = ingest.make_server(port=0, data_dir=str(data_dir))
+    ingest.serve_in_thread(server)
+    url = 'http://127.0.0.1:{}/experiment-data'.format(
+        server.server_address[1])
+
+    try:
+        body = json.dumps(_get_payload('practice', PID_FAIL))
+        request = Request(url, body.encode('utf-8'),
+                          {'Content-Type': 'application/json'})
+        compiled = json.loads(urlopen(request).read().decode('utf-8'))
+        assert compiled['id'] == PID_FAIL
+        assert compiled['num_practice_blk2s'] == 3
+
+        with pytest.raises(HTTPError):
+            urlopen(Request(url, b'{}'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # saved CSV compiles as the server's own would
+    saved_df = compile_data.get_csv_as_dataframe(
+        str(data_dir.join('practice', '{}.csv'.format(PID_FAIL))))
+    mock_df = compile_data.get_csv_as_dataframe(
+        mock_csv_path('practice', PID_FAIL))
+    assert compile_data.compile_practice_data(saved_df) == \
+        compile_data.compile_practice_data(mock_df)
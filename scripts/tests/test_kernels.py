@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from scripts import compile_data, equivalence, kernels
+
+
+def _get_segmentation_args(random_state):
+    df = equivalence.generate_trial_sequence(random_state)
+    trial_types = df['trial_type'].values.astype(object)
+    is_mc_trial = (trial_types == compile_data.SURVEY_TRIAL_TYPE)
+    is_block_trial = is_mc_trial | (
+        trial_types == compile_data.SART_TRIAL_TYPE)
+    return (df.index.values.astype(np.int64), is_mc_trial, is_block_trial,
+            random_state.randint(1, 5))
+
+
+def _get_nogo_args(random_state):
+    df = equivalence.generate_sart_trials(random_state)
+    rts_ms = df['rt_ms'].values
+    error_positions = np.flatnonzero(random_state.rand(len(rts_ms)) < 0.2)
+    return (df.index.values.astype(np.int64), rts_ms, error_positions,
+            random_state.randint(1, 7))
+
+
+def _assert_kernels_match(backend, other_backend, seed=0):
+    random_state = np.random.RandomState(seed)
+    for _ in range(100):
+        args = _get_segmentation_args(random_state)
+        for result, other_result in zip(backend.segment_blocks(*args),
+                                        other_backend.segment_blocks(*args)):
+            assert list(result) == list(other_result)
+
+        args = _get_nogo_args(random_state)
+        for rts, other_rts in zip(backend.get_nogo_adjacent_rts(*args),
+                                  other_backend.get_nogo_adjacent_rts(*args)):
+            assert list(rts) == list(other_rts)
+
+        ratings = random_state.randint(0, 5, 8).astype(float)
+        assert backend.count_rating_changes(ratings) == \
+            other_backend.count_rating_changes(ratings)
+
+
+def test_numpy_kernels_match_loops():
+    loops = kernels.Backend(
+        kernels._segment_blocks_loop, kernels._get_nogo_adjacent_rts_loop,
+        kernels._count_rating_changes_loop)
+    _assert_kernels_match(kernels.get_backend('numpy'), loops)
+
+
+@pytest.mark.skipif(kernels.numba is None, reason='requires numba')
+def test_numba_kernels_match_numpy_kernels():
+    _assert_kernels_match(
+        kernels.get_backend('numba'), kernels.get_backend('numpy'))
+
+
+def test_count_rating_changes():
+    # changes from a 0 rating are skipped
+    assert kernels.get_backend('numpy').count_rating_changes(
+        [3, 4, 4, 0, 2, 1]) == (1, 2, 1)
+
+
+def test_get_backend():
+    assert kernels.get_backend() is kernels.BACKENDS[kernels.BACKEND]
+    with pytest.raises(ValueError):
+        kernels.get_backend('nope')
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+
+try:
+    from urllib2 import urlopen, HTTPError
+except ImportError:  # Python 3
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+
+import pytest
+
+from scripts import cohort, compile_data, ingest, query
+
+from conftest import PID_SUCCESS, PID_SUCCESS_2, mock_csv_path
+
+
+def _add_failing_participant(data_dir):
+    """Copy mock participant 2, whose experiment data fails to compile, into
+    a data directory. Return the path of the failing CSV.
+    """
+    for exp_stage in compile_data.EXP_STAGES:
+        shutil.copy(mock_csv_path(exp_stage, PID_SUCCESS_2),
+                    os.path.join(data_dir, exp_stage))
+    return os.path.join(
+        data_dir, 'experiment', '{}.csv'.format(PID_SUCCESS_2))
+
+
+def _get_json(server, path):
+    url = 'http://127.0.0.1:{}{}'.format(server.server_address[1], path)
+    return json.loads(urlopen(url).read().decode('utf-8'))
+
+
+@pytest.fixture
+def service(data_dir):
+    return query.MetricsService(data_dir, cache_size=2)
+
+
+@pytest.fixture
+def server(request, service):
+    server = query.make_server(service, port=0)
+    ingest.serve_in_thread(server)
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    request.addfinalizer(stop)
+    return server
+
+
+def test_get_participant_compiles_on_demand_and_caches(service):
+    participant = service.get_participant(PID_SUCCESS)
+    assert participant['passed_practice']
+    assert participant['blk1_accuracy'] == 0.982222222
+    assert service.get_participant(PID_SUCCESS) is participant
+    assert service.participants.info()['hits'] == 1
+
+    assert service.get_participant('999') is None
+    with pytest.raises(ValueError):
+        service.get_participant('../1')
+
+
+def test_get_participant_recompiles_changed_files(service):
+    follow_up_csv = os.path.join(
+        service.data_dir, 'follow_up', '{}.csv'.format(PID_SUCCESS))
+    os.remove(follow_up_csv)
+    participant = service.get_participant(PID_SUCCESS)
+    assert participant['missing_data']
+
+    # the missing stage file arrives (and an existing file is touched) later
+    shutil.copy(mock_csv_path('follow_up', PID_SUCCESS), follow_up_csv)
+    practice_csv = os.path.join(
+        service.data_dir, 'practice', '{}.csv'.format(PID_SUCCESS))
+    mtime = os.path.getmtime(practice_csv) + 10
+    os.utime(practice_csv, (mtime, mtime))
+
+    recompiled = service.get_participant(PID_SUCCESS)
+    assert recompiled is not participant
+    assert not recompiled['missing_data']
+    assert service.participants.info()['misses'] == 2
+
+
+def test_get_participant_caches_failures(service):
+    experiment_csv = _add_failing_participant(service.data_dir)
+    with pytest.raises(query.CompileError) as e:
+        service.get_participant(PID_SUCCESS_2)
+    assert e.value.failure['source_csv'] == experiment_csv
+    assert e.value.failure['error'].startswith('IndexError')
+
+    # the failure isn't compiled again until the participant's files change
+    with pytest.raises(query.CompileError):
+        service.get_participant(PID_SUCCESS_2)
+    assert service.participants.info()['hits'] == 1
+
+
+def test_get_cohort_summary_from_memory(service):
+    assert service.get_cohort_summary() is None
+    compile_data.main(service.data_dir)
+
+    summary_df = service.get_cohort_summary(num_resamples=100)
+    assert service.get_cohort_summary(num_resamples=100) is summary_df
+    row = summary_df[summary_df['variable'] == 'avg_accuracy'].iloc[0]
+    assert row['mean'] == 0.934222222
+    with pytest.raises(ValueError):
+        service.get_cohort_summary(num_resamples=0)
+
+
+def test_server_routes(service, server):
+    participant = _get_json(server, '/participants/{}'.format(PID_SUCCESS))
+    assert participant['id'] == PID_SUCCESS
+    assert participant['passed_practice'] is True
+
+    slopes = _get_json(
+        server, '/participants/{}?vars=accuracy_slope,effort_slope'.format(
+            PID_SUCCESS))
+    assert slopes == {
+        'id': PID_SUCCESS, 'accuracy_slope': -0.007162023,
+        'effort_slope': 0.04296334}
+
+    for path, status in [('/participants/999', 404), ('/cohort', 404),
+                         ('/cohort?resamples=x', 400), ('/nope', 404)]:
+        with pytest.raises(HTTPError) as e:
+            _get_json(server, path)
+        assert e.value.code == status
+
+    # a participant failing to compile is a JSON error
+    experiment_csv = _add_failing_participant(service.data_dir)
+    with pytest.raises(HTTPError) as e:
+        _get_json(server, '/participants/{}'.format(PID_SUCCESS_2))
+    assert e.value.code == 500
+    error = json.loads(e.value.read().decode('utf-8'))
+    assert error['id'] == PID_SUCCESS_2
+    assert error['source_csv'] == experiment_csv
+    assert error['error'].startswith('IndexError')
+    os.remove(experiment_csv)
+
+    compile_data.main(service.data_dir)
+    summary = _get_json(server, '/cohort?resamples=100&seed=1')
+    assert len(summary) == len(cohort.COHORT_VARIABLES)
+    assert all(row['n'] == 1 for row in summary)
+    row = [r for r in summary if r['variable'] == 'avg_accuracy'][0]
+    assert row['mean'] == row['ci_low'] == row['ci_high'] == 0.934222222
+    # missing values are JSON nulls
+    assert query._without_nans({'a': [float('nan'), 1.0]}) == {
+        'a': [None, 1.0]}
+    assert _get_json(server, '/cache')['participants']['hits'] == 1
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import time
+import multiprocessing
+
+from scripts import compile_data, scheduling
+
+from conftest import MOCK_DATA_DIR
+
+
+def _sleep_task(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_estimate_cost(tmpdir):
+    path = os.path.join(MOCK_DATA_DIR, 'experiment', '1.csv')
+    gzip_path = str(tmpdir.join('1.csv.gz'))
+    with open(path, 'rb') as f, gzip.open(gzip_path, 'wb') as g:
+        g.write(f.read())
+
+    size = os.path.getsize(path)
+    assert scheduling.estimate_cost([path]) == size
+    assert scheduling.estimate_cost([path, gzip_path]) == \
+        size + os.path.getsize(gzip_path) * scheduling.COMPRESSED_SIZE_FACTOR
+
+
+def test_participant_costs_follow_raw_data():
+    raw_data_csvs = compile_data.find_raw_data_csvs(MOCK_DATA_DIR)
+    costs = dict(
+        (compile_data._get_participant_id(practice_csv),
+         scheduling.estimate_cost(compile_data.get_participant_csvs(
+             practice_csv, raw_data_csvs, MOCK_DATA_DIR)))
+        for practice_csv in raw_data_csvs['practice'])
+    # participant 401 has no experiment file
+    assert costs['401'] < costs['1']
+
+
+def test_order_longest_first():
+    assert scheduling.order_longest_first([1, 5, 3, 5, 0]) == [1, 3, 2, 0, 4]
+    assert scheduling.order_longest_first([]) == []
+
+
+def test_iter_scheduled_as_completed():
+    durations = [0.01, 0.2, 0.05, 0.01, 0.1, 0.01]
+    stats = scheduling.ScheduleStats(2)
+    pool = multiprocessing.Pool(2)
+    try:
+        results = list(scheduling.iter_scheduled(
+            _sleep_task, durations, durations, pool, stats))
+    finally:
+        pool.terminate()
+        pool.join()
+    assert sorted(results) == list(enumerate(durations))
+    # a long task isn't held back for the short tasks before it (which are
+    # dispatched last)
+    assert results.index((4, 0.1)) < results.index((0, 0.01))
+
+    summary = stats.summarize()
+    assert sum(w['num_tasks'] for w in summary['workers']) == len(durations)
+    assert 0 < summary['utilization'] <= 1
+    assert sum(w['busy_s'] for w in summary['workers']) >= sum(durations)
+    assert 'worker 1' in stats.report()
+
+    # without a pool, tasks run in order
+    stats = scheduling.ScheduleStats()
+    assert list(scheduling.iter_scheduled(
+        _sleep_task, durations, durations, stats=stats)) == \
+        list(enumerate(durations))
+    assert [w['num_tasks'] for w in stats.summarize()['workers']] == [6]
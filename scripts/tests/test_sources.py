@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import tarfile
+import zipfile
+
+import pytest
+
+from scripts import compile_data, sources
+
+from conftest import PARTICIPANTS, make_data_dir, mock_csv_path
+
+
+def _iter_mock_csvs():
+    for exp_stage, participant_ids in sorted(PARTICIPANTS.items()):
+        for participant_id in participant_ids:
+            yield exp_stage, mock_csv_path(exp_stage, participant_id)
+
+
+def _gzip(path, new_path):
+    with open(path, 'rb') as f, gzip.open(new_path + '.gz', 'wb') as g:
+        g.write(f.read())
+
+
+def _zstd(path, new_path):
+    with open(path, 'rb') as f, open(new_path + '.zst', 'wb') as z:
+        z.write(sources.zstandard.ZstdCompressor().compress(f.read()))
+
+
+def _compile(data_dir, tmpdir, workers=1):
+    output_path = str(tmpdir.join('compiled.csv'))
+    compile_data.main(data_dir, output_path=output_path, workers=workers)
+    with open(output_path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def expected(tmpdir):
+    return _compile(make_data_dir(tmpdir.mkdir('plain')), tmpdir)
+
+
+def test_compile_gzip_data_dir(tmpdir, expected):
+    data_dir = make_data_dir(tmpdir.mkdir('data'), copy=_gzip)
+    assert sorted(os.path.basename(p) for p in compile_data.get_csv_paths(
+        data_dir, 'practice')) == ['1.csv.gz', '401.csv.gz']
+    assert _compile(data_dir, tmpdir) == expected
+
+    raw_data_csvs = compile_data.find_raw_data_csvs(data_dir, ids=['1'])
+    assert raw_data_csvs['experiment'] == set(
+        [os.path.join(data_dir, 'experiment', '1.csv.gz')])
+
+
+@pytest.mark.skipif(sources.zstandard is None, reason='requires zstandard')
+def test_compile_zstd_data_dir(tmpdir, expected):
+    data_dir = make_data_dir(tmpdir.mkdir('data'), copy=_zstd)
+    assert _compile(data_dir, tmpdir) == expected
+
+
+def test_compile_tar_archive(tmpdir, expected):
+    data_dir = make_data_dir(tmpdir.mkdir('data'), copy=_gzip)
+    archive_path = str(tmpdir.join('study.tar.gz'))
+    with tarfile.open(archive_path, 'w:gz') as archive:
+        archive.add(data_dir, arcname='study/data')
+
+    assert _compile(archive_path, tmpdir, workers=2) == expected
+    assert compile_data.find_missing_data(archive_path) == [
+        ('401', ['experiment'])]
+
+    # by default, output is written beside the archive
+    compile_data.main(archive_path)
+    with tmpdir.join('study-compiled.csv').open() as f:
+        assert f.read() == expected
+
+
+def test_compile_zip_archive(tmpdir, expected):
+    archive_path = str(tmpdir.join('study.zip'))
+    with zipfile.ZipFile(archive_path, 'w') as archive:
+        for exp_stage, path in _iter_mock_csvs():
+            archive.write(path, os.path.join(
+                exp_stage, os.path.basename(path)))
+
+    assert sources.exists(os.path.join(archive_path, 'experiment', '1.csv'))
+    assert not sources.exists(
+        os.path.join(archive_path, 'experiment', '401.csv'))
+    assert _compile(archive_path, tmpdir) == expected
+
+    reports = compile_data._import_script('validate').validate_data_dir(
+        archive_path)
+    assert all(report['valid'] for report in reports)
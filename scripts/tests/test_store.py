@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from scripts import compile_data, store
+
+from conftest import MOCK_DATA_DIR, PID_FAIL, PID_SUCCESS, mock_csv_path
+
+
+def _compile_participant(pid):
+    raw_data_csvs = {}
+    for exp_stage in ['practice', 'experiment', 'follow_up']:
+        raw_data_csvs[exp_stage] = compile_data.get_csv_paths(
+            MOCK_DATA_DIR, exp_stage)
+    return compile_data.compile_participant(
+        mock_csv_path('practice', pid), raw_data_csvs, MOCK_DATA_DIR)
+
+
+def test_upsert_and_get_participant(tmpdir):
+    compiled_store = store.CompiledStore(str(tmpdir.join('compiled.db')))
+    participant = _compile_participant(PID_SUCCESS)
+    compiled_store.upsert(participant)
+
+    stored = compiled_store.get(PID_SUCCESS)
+    assert stored['passed_practice'] is True
+    assert stored['num_trials'] == 1125
+    assert stored['avg_accuracy'] == participant['avg_accuracy']
+    assert stored['blk5_rt_avg'] == participant['blk5_rt_avg']
+    assert stored['sex'] == 'Female'
+    assert 'blk5_nogo_prev4_avg' not in stored  # no no-go errors
+
+    # upserting again replaces the row
+    participant['avg_accuracy'] = 0.5
+    compiled_store.upsert(participant)
+    assert len(compiled_store) == 1
+    assert compiled_store.get(PID_SUCCESS)['avg_accuracy'] == 0.5
+    compiled_store.close()
+
+
+def test_upsert_many_and_query(tmpdir):
+    path = str(tmpdir.join('compiled.db'))
+    compiled_store = store.CompiledStore(path)
+    compiled_store.upsert_many([
+        _compile_participant(PID_SUCCESS),
+        _compile_participant(PID_FAIL),
+    ])
+    compiled_store.close()
+
+    # reopen existing store
+    compiled_store = store.CompiledStore(path)
+    assert len(compiled_store) == 2
+    failed = compiled_store.select(passed_practice=False)
+    assert [p['id'] for p in failed] == [PID_FAIL]
+    condition = compiled_store.get_condition(1125, 225)
+    assert [p['id'] for p in condition] == [PID_SUCCESS]
+    assert compiled_store.get('nobody') is None
+
+    index_names = [row[1] for row in compiled_store.connection.execute(
+        "PRAGMA index_list('compiled')").fetchall()]
+    assert 'idx_compiled_passed_practice' in index_names
+    assert 'idx_compiled_condition' in index_names
+    compiled_store.close()
+
+
+def test_main_upserts_into_store(tmpdir, data_dir):
+    sqlite_path = str(tmpdir.join('compiled.db'))
+
+    compile_data.main(data_dir, sqlite_path=sqlite_path)
+    compiled_store = store.CompiledStore(sqlite_path)
+    assert sorted(p['id'] for p in compiled_store.select()) == \
+        [PID_SUCCESS, PID_FAIL]
+    compiled_store.close()
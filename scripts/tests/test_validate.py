@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+
+from scripts import compile_data, validate
+
+from conftest import (
+    MOCK_DATA_DIR, PID_FAIL, PID_SUCCESS, PID_SUCCESS_2, mock_csv_path)
+
+
+def _get_checks(report):
+    return sorted(p['check'] for p in report['problems'])
+
+
+def test_validate_csv_mock_data():
+    for exp_stage in compile_data.EXP_STAGES:
+        for path in compile_data.get_csv_paths(MOCK_DATA_DIR, exp_stage):
+            report = validate.validate_csv(path, exp_stage)
+            pid = report['id']
+            if exp_stage == 'experiment' and pid == PID_SUCCESS_2:
+                # lacks a forecast question; only two ratings per block
+                assert _get_checks(report) == ['block_surveys', 'node_ids']
+                assert report['problems'][0]['message'] == \
+                    'missing trial(s): 0.0-1.0-6.0'
+            else:
+                assert report['valid'], report['problems']
+
+
+def test_validate_csv_truncated_upload(tmpdir):
+    with open(mock_csv_path('experiment', PID_SUCCESS)) as f:
+        lines = f.readlines()
+    path = tmpdir.join('{}.csv'.format(PID_SUCCESS))
+    path.write(''.join(lines[:600]))
+
+    report = validate.validate_csv(str(path), 'experiment')
+    assert _get_checks(report) == ['block_surveys', 'num_blocks', 'num_trials']
+
+
+def test_validate_dataframe_finds_bad_values():
+    df = validate.read_raw_csv(mock_csv_path('experiment', PID_SUCCESS))
+    df.loc[10, 'rt'] = '[12,'
+    df.loc[1, 'responses'] = '{"Q0":'
+    df.loc[20, 'time_elapsed'] = 0
+    df.loc[30, 'participant_id'] = '2'
+
+    problems = validate.validate_dataframe(df, 'experiment', PID_SUCCESS)
+    problems = dict((p['check'], p) for p in problems)
+    assert sorted(problems) == [
+        'participant_id', 'responses', 'rt', 'time_elapsed']
+    assert problems['rt']['rows'] == [10]
+    assert problems['responses']['rows'] == [1]
+    assert problems['time_elapsed']['rows'] == [20]
+
+
+def test_validate_raw_data_csvs_in_parallel():
+    raw_data_csvs = compile_data.find_raw_data_csvs(MOCK_DATA_DIR)
+    reports = validate.validate_raw_data_csvs(raw_data_csvs)
+    assert validate.validate_raw_data_csvs(raw_data_csvs, workers=2) == \
+        reports
+
+    assert validate.get_invalid_paths(reports) == set(
+        [mock_csv_path('experiment', PID_SUCCESS_2)])
+    summary = json.loads(validate.dumps(reports))['summary']
+    assert summary == {
+        'num_files': 8,
+        'num_invalid': 1,
+        'problem_counts': {'block_surveys': 1, 'node_ids': 1},
+    }
+
+
+def test_main_with_validate_leaves_out_invalid_files(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    for exp_stage in compile_data.EXP_STAGES:
+        shutil.copytree(
+            os.path.join(MOCK_DATA_DIR, exp_stage), str(data_dir.join(
+                exp_stage)))
+
+    compile_data.main(str(data_dir), validate=True)
+    df = compile_data.pd.read_csv(
+        str(data_dir.join('compiled.csv')), index_col=0, dtype={'id': str})
+    missing_data = dict(zip(df['id'], df['missing_data']))
+    assert missing_data == {
+        PID_SUCCESS: False, PID_SUCCESS_2: True, PID_FAIL: False}
+
+    with data_dir.join('validation.json').open() as f:
+        report = json.load(f)
+    assert report['summary']['num_invalid'] == 1
+
+
+def test_cli_validate_quarantines_invalid_files(tmpdir, capsys):
+    data_dir = tmpdir.mkdir('data')
+    for exp_stage in compile_data.EXP_STAGES:
+        shutil.copytree(
+            os.path.join(MOCK_DATA_DIR, exp_stage), str(data_dir.join(
+                exp_stage)))
+    quarantine_dir = str(tmpdir.join('quarantine'))
+
+    args = ['--data-dir', str(data_dir), 'validate', '--json',
+            '--quarantine', quarantine_dir]
+    assert compile_data.cli(args) == 1
+    out, err = capsys.readouterr()
+    assert json.loads(out)['summary']['num_invalid'] == 1
+    assert os.listdir(os.path.join(quarantine_dir, 'experiment')) == [
+        '{}.csv'.format(PID_SUCCESS_2)]
+
+    assert compile_data.cli(['--data-dir', str(data_dir), 'validate']) == 0
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""Check raw jsSART data files before compiling them.
+
+Truncated or otherwise broken uploads otherwise only surface as errors deep
+inside the compile functions. Each file is read once and checked with
+column-wise (vectorized) checks; the result is a JSON-serializable report per
+file, and invalid files can be excluded from a compile or moved to a
+quarantine directory (see the ``validate`` command of ``compile_data.py``).
+"""
+import os
+import json
+import shutil
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts import compile_data, sources
+except ImportError:  # run as a script
+    import compile_data
+    import sources
+
+
+SART_TRIAL_TYPE = compile_data.SART_TRIAL_TYPE
+SURVEY_TRIAL_TYPE = compile_data.SURVEY_TRIAL_TYPE
+REQUIRED_COLUMNS = [
+    'internal_node_id', 'trial_index', 'trial_type', 'time_elapsed',
+    'participant_id', 'rt', 'responses']
+REQUIRED_STAGE_COLUMNS = {
+    'experiment': ['num_trials', 'trials_per_block', 'stimulus'],
+}
+REQUIRED_NODE_IDS = {
+    'experiment': [
+        node_id for _, node_id in compile_data.ANTICIPATED_QUESTIONS_INDEX],
+}
+TEXT_COLUMNS = [
+    'internal_node_id', 'trial_type', 'participant_id', 'rt', 'responses']
+
+# a reaction time, or JSON array of reaction times
+RT_PATTERN = r'^\[?\s*-?\d+(\.\d*)?(\s*,\s*-?\d+(\.\d*)?)*\s*\]?$'
+# maximum number of example trial indices listed per problem
+MAX_EXAMPLE_ROWS = 5
+
+
+def _problem(check, message, rows=None):
+    problem = {'check': check, 'message': message}
+    if rows is not None:
+        problem['rows'] = [int(r) for r in rows[:MAX_EXAMPLE_ROWS]]
+    return problem
+
+
+def _get_runs(is_true):
+    """Take boolean array. Return arrays of start and end positions
+    (inclusive) of each run of True values.
+    """
+    padded = np.concatenate([[False], is_true, [False]]).astype(int)
+    changes = np.diff(padded)
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1) - 1
+
+
+def check_columns(df, exp_stage):
+    """Take raw data frame and experiment stage. Return list of problems.
+    """
+    required = REQUIRED_COLUMNS + REQUIRED_STAGE_COLUMNS.get(exp_stage, [])
+    missing_columns = [c for c in required if c not in df.columns]
+    if missing_columns:
+        return [_problem('columns', 'missing column(s): {}'.format(
+            ', '.join(missing_columns)))]
+    if not len(df.index):
+        return [_problem('columns', 'no data')]
+    return []
+
+
+def check_order(df):
+    """Take raw data frame. Check that trial indices and elapsed times are
+    present and increasing. Return list of problems.
+    """
+    problems = []
+    trial_index = df['trial_index'].values
+    for column, strict in [('trial_index', True), ('time_elapsed', False)]:
+        values = pd.to_numeric(df[column], errors='coerce').values
+        is_missing = np.isnan(values)
+        if is_missing.any():
+            rows = None if column == 'trial_index' else trial_index[is_missing]
+            problems.append(_problem(
+                column, 'missing or non-numeric {}'.format(column), rows))
+            continue
+        steps = np.diff(values)
+        is_unordered = (steps <= 0) if strict else (steps < 0)
+        if is_unordered.any():
+            problems.append(_problem(
+                column, '{} decreases'.format(column),
+                trial_index[1:][is_unordered]))
+    return problems
+
+
+def check_participant_id(df, participant_id):
+    """Take raw data frame and the participant ID given by its file name.
+    Return list of problems.
+    """
+    participant_ids = df['participant_id'].dropna().unique()
+    if len(participant_ids) != 1 or participant_ids[0] != participant_id:
+        return [_problem(
+            'participant_id', 'participant ID(s) {} do not match file '
+            'name'.format(', '.join(sorted(participant_ids)) or 'missing'))]
+    return []
+
+
+def check_rts(df):
+    """Take raw data frame. Check that reaction times parse. Return list of
+    problems.
+    """
+    rts = df['rt'].dropna()
+    is_invalid = ~rts.str.match(RT_PATTERN).values.astype(bool)
+    if is_invalid.any():
+        return [_problem(
+            'rt', 'unparseable reaction time(s)',
+            df.loc[rts.index[is_invalid], 'trial_index'].values)]
+    return []
+
+
+def check_responses(df):
+    """Take raw data frame. Check that survey responses decode to JSON
+    objects. Return list of problems.
+    """
+    responses = df['responses'].dropna()
+    invalid_responses = set()
+    for response in responses.unique():
+        try:
+            decoded = compile_data.decode_response(response)
+        except ValueError:
+            decoded = None
+        if not isinstance(decoded, dict):
+            invalid_responses.add(response)
+    if invalid_responses:
+        is_invalid = responses.isin(invalid_responses).values
+        return [_problem(
+            'responses', 'unparseable survey response(s)',
+            df.loc[responses.index[is_invalid], 'trial_index'].values)]
+    return []
+
+
+def check_node_ids(df, exp_stage):
+    """Take raw data frame and experiment stage. Check that the stage's
+    required trials are present. Return list of problems.
+    """
+    required = REQUIRED_NODE_IDS.get(exp_stage, [])
+    node_ids = set(df['internal_node_id'].dropna().unique())
+    missing_node_ids = [n for n in required if n not in node_ids]
+    if missing_node_ids:
+        return [_problem('node_ids', 'missing trial(s): {}'.format(
+            ', '.join(missing_node_ids)))]
+    return []
+
+
+def check_blocks(df, num_survey_questions=compile_data.NUM_SURVEY_QUESTIONS):
+    """Take raw experiment data frame. Check its SART blocks against the
+    trial condition (`num_trials` and `trials_per_block`), and that each
+    block is followed by its survey questions. Return list of problems.
+    """
+    conditions = {}
+    for column in ['num_trials', 'trials_per_block']:
+        values = pd.to_numeric(df[column], errors='coerce').dropna().unique()
+        if len(values) != 1 or values[0] <= 0 or values[0] % 1:
+            return [_problem(column, 'invalid {}: {}'.format(
+                column, ', '.join(str(v) for v in values) or 'missing'))]
+        conditions[column] = int(values[0])
+
+    problems = []
+    num_trials = conditions['num_trials']
+    trials_per_block = conditions['trials_per_block']
+    if num_trials % trials_per_block:
+        problems.append(_problem(
+            'num_blocks', 'num_trials is not a multiple of trials_per_block'))
+
+    trial_types = df['trial_type'].values
+    is_sart = (trial_types == SART_TRIAL_TYPE)
+    starts, ends = _get_runs(is_sart)
+    expected_num_blocks = num_trials // trials_per_block
+    if len(starts) != expected_num_blocks:
+        message = '{} block(s), expected {}'.format(
+            len(starts), expected_num_blocks)
+        problems.append(_problem('num_blocks', message))
+    if is_sart.sum() != num_trials:
+        message = '{} SART trial(s), expected {}'.format(
+            is_sart.sum(), num_trials)
+        problems.append(_problem('num_trials', message))
+
+    # each block's survey questions follow its last trial
+    is_survey = np.append(trial_types == SURVEY_TRIAL_TYPE, False)
+    has_survey = np.ones(len(ends), dtype=bool)
+    for offset in range(1, num_survey_questions + 1):
+        positions = np.minimum(ends + offset, len(trial_types))
+        has_survey &= is_survey[positions]
+    if not has_survey.all():
+        problems.append(_problem(
+            'block_surveys', 'block(s) without {} survey questions'.format(
+                num_survey_questions),
+            df['trial_index'].values[ends[~has_survey]]))
+
+    return problems
+
+
+def read_raw_csv(path):
+    """Take CSV path (possibly compressed or archived; see ``sources.py``).
+    Return pandas dataframe of raw (unparsed) data.
+    """
+    dtypes = dict((c, object) for c in TEXT_COLUMNS)
+    with sources.open_csv(path) as f:
+        return pd.read_csv(f, dtype=dtypes)
+
+
+def validate_dataframe(df, exp_stage, participant_id=None):
+    """Take raw data frame (see `read_raw_csv`), experiment stage and
+    (optionally) the participant ID given by its file name. Return list of
+    problems, as dicts with ``check`` and ``message`` keys (and ``rows``, a
+    few of the affected trial indices, where applicable).
+    """
+    problems = check_columns(df, exp_stage)
+    if problems:
+        return problems
+
+    problems.extend(check_order(df))
+    if participant_id is not None:
+        problems.extend(check_participant_id(df, participant_id))
+    problems.extend(check_rts(df))
+    problems.extend(check_responses(df))
+    problems.extend(check_node_ids(df, exp_stage))
+    if exp_stage == 'experiment':
+        problems.extend(check_blocks(df))
+    return problems
+
+
+def validate_csv(path, exp_stage):
+    """Take CSV path and experiment stage. Return report dict, with the
+    file's ``path``, ``stage``, participant ``id``, whether it is ``valid``
+    and a list of ``problems``.
+    """
+    participant_id = os.path.basename(path).split('.')[0]
+    try:
+        df = read_raw_csv(path)
+    except (ValueError, IOError, EOFError, pd.errors.ParserError) as e:
+        problems = [_problem('read', 'unreadable: {}'.format(e))]
+    else:
+        problems = validate_dataframe(df, exp_stage, participant_id)
+    return {
+        'path': path,
+        'stage': exp_stage,
+        'id': participant_id,
+        'valid': not problems,
+        'problems': problems,
+    }
+
+
+def _validate_csv_task(args):
+    return validate_csv(*args)
+
+
+def validate_raw_data_csvs(raw_data_csvs, workers=1):
+    """Take dict of raw data CSV paths (keyed by experiment stage) and number
+    of worker processes. Return list of report dicts (see `validate_csv`),
+    ordered by stage and path.
+    """
+    tasks = [
+        (path, exp_stage) for exp_stage in compile_data.EXP_STAGES
+        for path in sorted(raw_data_csvs.get(exp_stage, []))]
+    if workers <= 1 or len(tasks) <= 1:
+        return [validate_csv(*task) for task in tasks]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        reports = pool.map(_validate_csv_task, tasks, chunksize=1)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return reports
+
+
+def validate_data_dir(data_dir=compile_data.DATA_DIR, ids=None, since=None,
+                      workers=1):
+    """Take base data directory (and optionally participant IDs or a
+    modification time; see `compile_data.find_raw_data_csvs`). Return list
+    of report dicts.
+    """
+    raw_data_csvs = compile_data.find_raw_data_csvs(data_dir, ids, since)
+    return validate_raw_data_csvs(raw_data_csvs, workers)
+
+
+def get_invalid_paths(reports):
+    """Take list of report dicts. Return set of invalid file paths.
+    """
+    return set(r['path'] for r in reports if not r['valid'])
+
+
+def summarize_reports(reports):
+    """Take list of report dicts. Return dict of file counts and problem
+    counts (keyed by check).
+    """
+    problem_counts = {}
+    for report in reports:
+        for problem in report['problems']:
+            check = problem['check']
+            problem_counts[check] = problem_counts.get(check, 0) + 1
+    num_invalid = len(get_invalid_paths(reports))
+    return {
+        'num_files': len(reports),
+        'num_invalid': num_invalid,
+        'problem_counts': problem_counts,
+    }
+
+
+def dumps(reports):
+    """Take list of report dicts. Return JSON string of the reports, with a
+    summary.
+    """
+    return json.dumps({'summary': summarize_reports(reports),
+                       'files': reports}, indent=2, sort_keys=True)
+
+
+def write_report(reports, path):
+    """Take list of report dicts and write them, with a summary, as JSON.
+    """
+    with open(path, 'w') as f:
+        f.write(dumps(reports))
+
+
+def quarantine_files(reports, quarantine_dir):
+    """Take list of report dicts and quarantine directory. Move invalid files
+    into the directory (by experiment stage), so that compiling skips them;
+    files inside archives are left in place. Return list of (old path, new
+    path) tuples.
+    """
+    moved = []
+    for report in reports:
+        if report['valid'] or not os.path.isfile(report['path']):
+            continue
+        stage_dir = os.path.join(quarantine_dir, report['stage'])
+        if not os.path.isdir(stage_dir):
+            os.makedirs(stage_dir)
+        new_path = os.path.join(stage_dir, os.path.basename(report['path']))
+        shutil.move(report['path'], new_path)
+        moved.append((report['path'], new_path))
+    return moved
+
+
+def format_report(report):
+    """Take report dict. Return one line per problem, tab-separated.
+    """
+    lines = []
+    for problem in report['problems']:
+        line = '{}\t{}\t{}'.format(
+            report['path'], problem['check'], problem['message'])
+        if problem.get('rows'):
+            line += ' (trial_index {})'.format(
+                ', '.join(str(r) for r in problem['rows']))
+        lines.append(line)
+    return '\n'.join(lines)